@@ -0,0 +1,215 @@
+"""Load test of the ``serve`` engines with many concurrent viewers.
+
+Usage:
+
+    python -m benchmarks.serve_load --viewers=200 --seeks=20 [--cpu=0]
+
+Each viewer opens the landing page of a video (html, css, js, vtt and a
+thumbnail), then seeks the video with ``--window`` MiB Range requests.
+A viewer keeps its connection alive when the server allows it (like
+browsers do), else reconnects for each request.
+
+The server runs in a subprocess, pinned to ``--cpu`` (when supported)
+so both engines get the same CPU. Reports requests per second, latency
+percentiles and the number of connections opened.
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+MiB = 1024 * 1024
+
+ASSETS = {
+    "video.html": 4 * 1024,
+    "index.css": 8 * 1024,
+    "default.js": 16 * 1024,
+    "video.vtt": 64 * 1024,
+    "video.jpg": 32 * 1024,
+}
+VIDEO = "video.mp4"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _start_server(
+    directory: str, engine: str, cpu: Optional[int]
+) -> tuple[subprocess.Popen, int]:
+    port = _free_port()
+    args = [sys.executable, "-m", "pf_video_transcribe", "--log=WARNING", "serve"]
+    args.extend(("--engine", engine, "--port", str(port), directory))
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(proc.pid, {cpu})
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class _Viewer:
+    port: int
+    connections: int
+    reader: Optional[asyncio.StreamReader]
+    writer: Optional[asyncio.StreamWriter]
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.connections = 0
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path: str, range_header: Optional[str] = None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                "127.0.0.1", self.port
+            )
+            self.connections += 1
+        assert self.reader is not None
+        request = f"GET /{path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        if range_header:
+            request += f"Range: {range_header}\r\n"
+        self.writer.write((request + "\r\n").encode("latin-1"))
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        version, status = lines[0].split()[:2]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        await self.reader.readexactly(length)
+
+        if version == "HTTP/1.0" or headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+
+async def _view(
+    port: int,
+    seeks: list[int],
+    window: int,
+    latencies: list[float],
+    errors: list[int],
+) -> int:
+    viewer = _Viewer(port)
+    requests: list[tuple[str, Optional[str]]] = [(name, None) for name in ASSETS]
+    requests.extend((VIDEO, f"bytes={s}-{s + window - 1}") for s in seeks)
+    try:
+        for path, range_header in requests:
+            start = time.perf_counter()
+            try:
+                status = await viewer.get(path, range_header)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # eg: reset as the listen backlog overflows
+                await viewer.close()
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            if not 200 <= status < 400:
+                errors.append(status)
+    finally:
+        await viewer.close()
+    return viewer.connections
+
+
+async def _run_viewers(
+    port: int,
+    viewers: int,
+    seeks: int,
+    window: int,
+    size: int,
+) -> tuple[float, list[float], int, int]:
+    rng = random.Random(1234)  # same seeks for both engines
+    latencies: list[float] = []
+    errors: list[int] = []
+    start = time.perf_counter()
+    connections = await asyncio.gather(
+        *(
+            _view(
+                port,
+                [rng.randrange(0, size - window) for _ in range(seeks)],
+                window,
+                latencies,
+                errors,
+            )
+            for _ in range(viewers)
+        )
+    )
+    return time.perf_counter() - start, latencies, sum(connections), len(errors)
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main() -> None:
+    ap = ArgumentParser(description=__doc__)
+    ap.add_argument("--viewers", type=int, default=200)
+    ap.add_argument("--seeks", type=int, default=20, help="per viewer")
+    ap.add_argument("--window", type=float, default=0.5, help="MiB per seek")
+    ap.add_argument("--size", type=int, default=256, help="MiB of the video")
+    ap.add_argument("--cpu", type=int, default=0, help="CPU of the server")
+    args = ap.parse_args()
+
+    window = int(args.window * MiB)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, size in ASSETS.items():
+            with open(os.path.join(tmpdir, name), "wb") as f:
+                f.write(os.urandom(size))
+        with open(os.path.join(tmpdir, VIDEO), "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(MiB))
+
+        print(
+            f"{'engine':>8} {'requests':>8} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p99 ms':>8} {'conns':>6} {'errors':>6}"
+        )
+        for engine in ("thread", "asyncio"):
+            proc, port = _start_server(tmpdir, engine, args.cpu)
+            try:
+                elapsed, latencies, connections, errors = asyncio.run(
+                    _run_viewers(
+                        port, args.viewers, args.seeks, window, args.size * MiB
+                    )
+                )
+            finally:
+                proc.terminate()
+                proc.wait()
+            print(
+                f"{engine:>8} {len(latencies):8d} {len(latencies) / elapsed:8.1f} "
+                f"{_percentile(latencies, 0.5) * 1000:8.1f} "
+                f"{_percentile(latencies, 0.99) * 1000:8.1f} "
+                f"{connections:6d} {errors:6d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Compare how ``serve`` answers video seeks (Range requests).
+
+Usage:
+
+    python -m benchmarks.serve_ranges --seeks=200 --window=2 [big-video.mp4]
+
+Modes:
+
+* ``open-ended``: every seek is ``bytes=N-`` and the whole remainder is
+  read, as the previous handler always answered with it;
+* ``copy``: bounded ``bytes=N-M`` windows, copied through Python
+  (``serve --no-sendfile``);
+* ``sendfile``: bounded windows sent with ``sendfile(2)``;
+* ``full-copy`` and ``full-sendfile``: whole file downloads.
+
+The server runs in a subprocess. If no file is given, a temporary one of
+``--size`` MiB is created.
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+import urllib.parse
+
+from pf_video_transcribe.utils import check_file_exists
+
+MiB = 1024 * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _start_server(directory: str, use_sendfile: bool) -> tuple[subprocess.Popen, int]:
+    port = _free_port()
+    args = [sys.executable, "-m", "pf_video_transcribe", "--log=WARNING", "serve"]
+    if not use_sendfile:
+        args.append("--no-sendfile")
+    args.extend(("--port", str(port), directory))
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def _get(port: int, path: str, range_header: Optional[str]) -> int:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        headers = {"Range": range_header} if range_header else {}
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        received = 0
+        while data := response.read(MiB):
+            received += len(data)
+        return received
+    finally:
+        conn.close()
+
+
+def run(
+    filename: str,
+    mode: str,
+    seeks: int,
+    window: int,
+    concurrency: int,
+) -> tuple[float, int, int]:
+    size = os.path.getsize(filename)
+    directory, name = os.path.split(os.path.abspath(filename))
+    path = "/" + urllib.parse.quote(name)
+    rng = random.Random(1234)  # same seeks for all modes
+    if mode.startswith("full"):
+        ranges: list[Optional[str]] = [None] * max(1, seeks // 50)
+    else:
+        starts = [rng.randrange(0, max(1, size - window)) for _ in range(seeks)]
+        if mode == "open-ended":
+            ranges = [f"bytes={s}-" for s in starts]
+        else:
+            ranges = [f"bytes={s}-{s + window - 1}" for s in starts]
+
+    proc, port = _start_server(directory, mode.endswith("sendfile"))
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            received = sum(pool.map(lambda r: _get(port, path, r), ranges))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+    return elapsed, len(ranges), received
+
+
+def main() -> None:
+    ap = ArgumentParser(description=__doc__)
+    ap.add_argument("--size", type=int, default=512, help="MiB of the temp file")
+    ap.add_argument("--seeks", type=int, default=200)
+    ap.add_argument("--window", type=int, default=2, help="MiB per seek")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("file", nargs="?", type=check_file_exists)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = args.file
+        if filename is None:
+            filename = os.path.join(tmpdir, "video.bin")
+            with open(filename, "wb") as f:
+                for _ in range(args.size):
+                    f.write(os.urandom(MiB))
+
+        print(f"{'mode':>14} {'requests':>8} {'req/s':>8} {'MiB':>9} {'MiB/s':>8}")
+        for mode in ("open-ended", "copy", "sendfile", "full-copy", "full-sendfile"):
+            elapsed, requests, received = run(
+                filename, mode, args.seeks, args.window * MiB, args.concurrency
+            )
+            print(
+                f"{mode:>14} {requests:8d} {requests / elapsed:8.1f} "
+                f"{received / MiB:9.1f} {received / MiB / elapsed:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
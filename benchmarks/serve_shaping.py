@@ -0,0 +1,219 @@
+"""Share of the bandwidth of ``serve`` between greedy and polite clients.
+
+Usage:
+
+    python -m benchmarks.serve_shaping --greedy=2 --polite=6 --duration=10
+
+Greedy clients seek the video with ``--greedy-streams`` Range requests
+at once, polite ones with a single one. Each client has its own IP
+address (``127.0.0.N``, Linux routes all of ``127.0.0.0/8`` to the
+loopback), as the limits are per address. Clients told to retry later
+(503) wait ``Retry-After`` seconds.
+
+The server (``--engine``) runs in a subprocess, first unlimited, then
+with ``--max-rate``, ``--max-client-rate`` and ``--max-client-streams``.
+Reports the throughput of each kind of client and Jain's fairness index
+of all of them (1.0 is an even share).
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+MiB = 1024 * 1024
+VIDEO = "video.mp4"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _start_server(
+    directory: str, engine: str, limits: list[str]
+) -> tuple[subprocess.Popen, int]:
+    port = _free_port()
+    args = [sys.executable, "-m", "pf_video_transcribe", "--log=WARNING", "serve"]
+    args.extend(("--engine", engine, "--port", str(port), *limits, directory))
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class _Client:
+    address: str
+    received: int
+    refused: int
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.received = 0
+        self.refused = 0
+
+
+async def _stream(
+    client: _Client,
+    port: int,
+    window: int,
+    size: int,
+    deadline: float,
+    rng: random.Random,
+) -> None:
+    reader: Optional[asyncio.StreamReader] = None
+    writer: Optional[asyncio.StreamWriter] = None
+    try:
+        while time.monotonic() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port, local_addr=(client.address, 0)
+                )
+            assert reader is not None
+            start = rng.randrange(0, size - window)
+            request = (
+                f"GET /{VIDEO} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                f"Range: bytes={start}-{start + window - 1}\r\n\r\n"
+            )
+            writer.write(request.encode("latin-1"))
+
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            version, status = lines[0].split()[:2]
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            remaining = int(headers.get("content-length", "0"))
+            while remaining > 0:
+                data = await reader.read(min(remaining, 256 * 1024))
+                if not data:
+                    raise ConnectionError("closed")
+                remaining -= len(data)
+                if status == "206":
+                    client.received += len(data)
+
+            if version == "HTTP/1.0" or headers.get("connection") == "close":
+                writer.close()
+                reader = writer = None
+            if status == "503":
+                client.refused += 1
+                await asyncio.sleep(float(headers.get("retry-after", "1")))
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def _run_clients(
+    port: int,
+    greedy: int,
+    greedy_streams: int,
+    polite: int,
+    window: int,
+    size: int,
+    duration: float,
+) -> tuple[list[_Client], list[_Client]]:
+    greedy_clients = [_Client(f"127.0.0.{2 + i}") for i in range(greedy)]
+    polite_clients = [_Client(f"127.0.0.{2 + greedy + i}") for i in range(polite)]
+    rng = random.Random(1234)
+    deadline = time.monotonic() + duration
+    tasks = [
+        asyncio.wait_for(
+            _stream(client, port, window, size, deadline, rng), duration + 1
+        )
+        for clients, streams in (
+            (greedy_clients, greedy_streams),
+            (polite_clients, 1),
+        )
+        for client in clients
+        for _ in range(streams)
+    ]
+    # the streams still sending at the deadline are cancelled
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return greedy_clients, polite_clients
+
+
+def _fairness(values: list[float]) -> float:
+    # Jain's index: 1/n (all to a single client) .. 1 (even share)
+    total = sum(values)
+    squares = sum(v * v for v in values)
+    return total * total / (len(values) * squares) if squares else 1.0
+
+
+def main() -> None:
+    ap = ArgumentParser(description=__doc__)
+    ap.add_argument("--engine", choices=("thread", "asyncio"), default="asyncio")
+    ap.add_argument("--greedy", type=int, default=2, help="clients")
+    ap.add_argument("--greedy-streams", type=int, default=8, help="per client")
+    ap.add_argument("--polite", type=int, default=6, help="clients")
+    ap.add_argument("--window", type=float, default=4, help="MiB per seek")
+    ap.add_argument("--size", type=int, default=256, help="MiB of the video")
+    ap.add_argument("--duration", type=float, default=10, help="seconds")
+    ap.add_argument("--max-rate", type=float, default=64, help="MiB/s")
+    ap.add_argument("--max-client-streams", type=int, default=2)
+    args = ap.parse_args()
+
+    clients = args.greedy + args.polite
+    client_rate = args.max_rate / clients
+    scenarios = {
+        "unlimited": [],
+        "limited": [
+            f"--max-rate={args.max_rate * 1024:g}",
+            f"--max-client-rate={client_rate * 1024:g}",
+            f"--max-client-streams={args.max_client_streams}",
+        ],
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, VIDEO), "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(MiB))
+
+        print(
+            f"{'scenario':>10} {'greedy MiB/s':>13} {'polite MiB/s':>13} "
+            f"{'total MiB/s':>12} {'fairness':>8} {'503':>6}"
+        )
+        for scenario, limits in scenarios.items():
+            proc, port = _start_server(tmpdir, args.engine, limits)
+            try:
+                greedy, polite = asyncio.run(
+                    _run_clients(
+                        port,
+                        args.greedy,
+                        args.greedy_streams,
+                        args.polite,
+                        int(args.window * MiB),
+                        args.size * MiB,
+                        args.duration,
+                    )
+                )
+            finally:
+                proc.terminate()
+                proc.wait()
+            rates = [c.received / MiB / args.duration for c in greedy + polite]
+            greedy_rate = sum(rates[: len(greedy)]) / max(1, len(greedy))
+            polite_rate = sum(rates[len(greedy) :]) / max(1, len(polite))
+            refused = sum(c.refused for c in greedy + polite)
+            print(
+                f"{scenario:>10} {greedy_rate:13.1f} {polite_rate:13.1f} "
+                f"{sum(rates):12.1f} {_fairness(rates):8.3f} {refused:6d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare the thumbnail generation modes on real media files.
+
+Usage:
+
+    python -m benchmarks.thumbnail --repeat=3 long-4k-video.mp4 ...
+
+The media files are symlinked into a temporary directory, so the existing
+thumbnails are not touched. Prefer long and high resolution files, ideally
+stored where they will be used (ie: network disks), as that is where the
+full decode is the slowest.
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import os
+import statistics
+import tempfile
+import time
+
+from pf_video_transcribe.thumbnail.converter import ThumbnailConverter
+from pf_video_transcribe.types import Size
+from pf_video_transcribe.utils import check_file_exists
+from pf_video_transcribe.utils import parse_size
+
+
+def measure(filename: str, size: Size, fast_seek: int, repeat: int) -> list[float]:
+    timings = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        link = os.path.join(tmpdir, os.path.basename(filename))
+        os.symlink(os.path.abspath(filename), link)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ThumbnailConverter(link, True, size, fast_seek)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    ap = ArgumentParser(description=__doc__)
+    ap.add_argument("--size", type=parse_size, default=Size(320, -1))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument(
+        "--candidates",
+        type=int,
+        default=5,
+        help="fast seek candidates (default: %(default)s)",
+    )
+    ap.add_argument("file", nargs="+", type=check_file_exists)
+    args = ap.parse_args()
+
+    print(f"{'file':40} {'mode':>10} {'best':>8} {'median':>8}")
+    for filename in args.file:
+        for mode, fast_seek in (("full", 0), ("fast-seek", args.candidates)):
+            timings = measure(filename, args.size, fast_seek, args.repeat)
+            print(
+                f"{os.path.basename(filename)[-40:]:40} {mode:>10} "
+                f"{min(timings):7.2f}s {statistics.median(timings):7.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
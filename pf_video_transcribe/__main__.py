@@ -1,10 +1,16 @@
 import argparse
 
 from . import log
+from .align import cli as align
+from .catalog import cli as catalog
 from .html import cli as html
 from .index_html import cli as index_html
+from .optimize import cli as optimize
+from .pipeline import cli as pipeline
+from .search import cli as search
 from .serve import cli as serve
 from .srt import cli as srt
+from .storyboard import cli as storyboard
 from .thumbnail import cli as thumbnail
 from .transcribe import cli as transcribe
 from .vtt import cli as vtt
@@ -16,11 +22,17 @@ def create_arg_parser() -> argparse.ArgumentParser:
 
     sub = ap.add_subparsers()
     transcribe.add_sub_parser(sub)
+    align.add_sub_parser(sub)
     html.add_sub_parser(sub)
     vtt.add_sub_parser(sub)
     srt.add_sub_parser(sub)
     thumbnail.add_sub_parser(sub)
+    storyboard.add_sub_parser(sub)
+    optimize.add_sub_parser(sub)
     index_html.add_sub_parser(sub)
+    pipeline.add_sub_parser(sub)
+    catalog.add_sub_parser(sub)
+    search.add_sub_parser(sub)
     serve.add_sub_parser(sub)
 
     return ap
@@ -1,6 +1,7 @@
 from argparse import ArgumentParser
 import textwrap
 
+from .. import compress
 from ..utils import check_file_exists
 
 
@@ -33,6 +34,7 @@ def add_arguments(ap: ArgumentParser, add_files: bool) -> None:
         """
         ),
     )
+    compress.add_arguments(ap)
 
     if add_files:
         ap.add_argument(
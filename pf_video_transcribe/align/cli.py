@@ -0,0 +1,95 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import textwrap
+
+from .. import compress
+from .. import log
+from ..transcribe import cli as transcribe_cli
+from ..utils import check_file_exists
+
+description = """\
+Adds the timing of each word to transcriptions ('.jsonl') made with
+'transcribe --no-word-timestamps', replacing them.
+
+Words are needed by the HTML to follow the video word by word and to split
+long segments in subtitles; SRT and WebVTT of short segments don't need
+them. Transcribing without words and aligning only the transcriptions that
+need them is faster than transcribing everything with words.
+
+Use the same VAD options as the transcription, so its cached speech regions
+are used. Transcriptions that already have their words are skipped.
+"""
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .work import align_batch
+
+    align_batch(
+        args.file,
+        args.language,
+        args.merge_threshold,
+        args.local,
+        args.acceleration_device,
+        args.precompress,
+        args.vad_threshold,
+        args.vad_min_speech_duration,
+        args.vad_min_silence_duration,
+        args.vad_speech_pad,
+        args.jobs,
+    )
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    transcribe_cli.add_model_arguments(ap)
+    ap.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=2,
+        help=textwrap.dedent(
+            """\
+            Number of files aligned in parallel, sharing a single model.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    compress.add_arguments(ap)
+    ap.add_argument(
+        "file",
+        nargs="+",
+        help="'.jsonl' file to be aligned",
+        type=check_file_exists,
+    )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "align",
+        help="Add the words to '.jsonl' transcribed without them",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+import os
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+import uuid
+
+from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import merge_punctuations
+from faster_whisper.vad import collect_chunks
+from faster_whisper.vad import SpeechTimestampsMap
+from faster_whisper.vad import VadOptions
+import numpy as np
+from termcolor import colored
+
+from ..compress import write_compressed
+from ..jsonl.reader import Reader
+from ..jsonl.writer import Writer
+from ..transcribe.vad import create_vad_options
+from ..transcribe.vad import get_speech_map
+from ..transcribe.vad import SAMPLING_RATE
+from ..transcribe.work import get_model_loader
+from ..types import SegmentPayloadJson
+from ..types import WordJson
+from ..utils import format_timestamp
+
+_logger = logging.getLogger(__name__.replace(".work", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_inf = functools.partial(_logger.log, logging.INFO)
+_wrn = functools.partial(_logger.log, logging.WARNING)
+
+# seconds of speech kept around the segments, their timestamps are not
+# as precise as the words'
+ALIGN_PAD = 0.5
+
+# same as WhisperModel.transcribe()
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+Chunk = dict[str, int]  # "start" and "end" samples, as faster_whisper
+
+
+def needs_align(segments: Sequence[SegmentPayloadJson]) -> bool:
+    return any(s["text"].strip() and not s["words"] for s in segments)
+
+
+def _clip_chunks(
+    chunks: Sequence[Chunk],
+    ends: Sequence[int],
+    start: float,
+    end: float,
+) -> list[Chunk]:
+    start_sample = max(0, int(start * SAMPLING_RATE))
+    end_sample = int(end * SAMPLING_RATE)
+    clipped = []
+    for i in range(bisect.bisect_right(ends, start_sample), len(chunks)):
+        chunk = chunks[i]
+        if chunk["start"] >= end_sample:
+            break
+        clipped.append(
+            {
+                "start": max(chunk["start"], start_sample),
+                "end": min(chunk["end"], end_sample),
+            }
+        )
+    return clipped
+
+
+def _count_samples(chunks: Sequence[Chunk]) -> int:
+    return sum(chunk["end"] - chunk["start"] for chunk in chunks)
+
+
+def iter_windows(
+    segments: Sequence[SegmentPayloadJson],
+    chunks: Sequence[Chunk],
+    max_samples: int,
+) -> Iterator[tuple[range, list[Chunk]]]:
+    """Consecutive segments whose speech fits a window of the model.
+
+    Yields the indexes of the segments and their speech chunks, clipped
+    to the segments (``ALIGN_PAD`` around them). Segments with more
+    speech than a window are not aligned, as the model could not.
+    """
+    ends = [chunk["end"] for chunk in chunks]
+    first = 0
+    clipped: list[Chunk] = []
+    for i, segment in enumerate(segments):
+        candidate = _clip_chunks(
+            chunks,
+            ends,
+            segments[first]["start"] - ALIGN_PAD,
+            segment["end"] + ALIGN_PAD,
+        )
+        if _count_samples(candidate) <= max_samples:
+            clipped = candidate
+            continue
+
+        if clipped:
+            yield range(first, i), clipped
+        first = i
+        clipped = _clip_chunks(
+            chunks, ends, segment["start"] - ALIGN_PAD, segment["end"] + ALIGN_PAD
+        )
+        if _count_samples(clipped) > max_samples:
+            _wrn(
+                "Segment too long to be aligned: "
+                + colored(format_timestamp(segment["start"]), "yellow")
+                + " -> "
+                + colored(format_timestamp(segment["end"]), "yellow")
+            )
+            first = i + 1
+            clipped = []
+
+    if clipped:
+        yield range(first, len(segments)), clipped
+
+
+def _align_window(
+    model: WhisperModel,
+    tokenizer: Tokenizer,
+    audio: np.ndarray,
+    segments: Sequence[SegmentPayloadJson],
+    chunks: list[Chunk],
+) -> None:
+    # as WhisperModel.add_word_timestamps(), in a single window
+    feature_extractor = model.feature_extractor
+    features = feature_extractor(collect_chunks(audio, chunks))
+    nb_max_frames = feature_extractor.nb_max_frames
+    num_frames = min(nb_max_frames, features.shape[-1] - nb_max_frames)
+    encoder_output = model.encode(features[:, :nb_max_frames])
+
+    tokens_per_segment = [tokenizer.encode(s["text"]) for s in segments]
+    alignment = model.find_alignment(
+        tokenizer,
+        [token for tokens in tokens_per_segment for token in tokens],
+        encoder_output,
+        num_frames,
+    )
+    merge_punctuations(alignment, PREPEND_PUNCTUATIONS, APPEND_PUNCTUATIONS)
+
+    # times in the collected speech, back to the media
+    speech_map = SpeechTimestampsMap(chunks, SAMPLING_RATE)
+    word_index = 0
+    for segment, tokens in zip(segments, tokens_per_segment):
+        saved_tokens = 0
+        words: list[WordJson] = []
+        while word_index < len(alignment) and saved_tokens < len(tokens):
+            timing = alignment[word_index]
+            if timing["word"]:
+                chunk_index = speech_map.get_chunk_index(
+                    (timing["start"] + timing["end"]) / 2
+                )
+                words.append(
+                    {
+                        "start": speech_map.get_original_time(
+                            timing["start"], chunk_index
+                        ),
+                        "end": speech_map.get_original_time(timing["end"], chunk_index),
+                        "text": timing["word"],
+                        "probability": timing["probability"],
+                    }
+                )
+            saved_tokens += len(timing["tokens"])
+            word_index += 1
+
+        if words:
+            segment["start"] = words[0]["start"]
+            segment["end"] = words[-1]["end"]
+        segment["words"] = words
+
+
+def _write(
+    reader: Reader,
+    segments: Sequence[SegmentPayloadJson],
+    merge_threshold: float,
+) -> None:
+    # readers (serve) see either the old or the new transcript
+    dirname, basename = os.path.split(reader.filename)
+    tmp_filename = os.path.join(dirname, f".{basename}.{uuid.uuid4().hex}.tmp")
+    try:
+        with Writer(
+            reader.media_filename, reader.info, merge_threshold, tmp_filename
+        ) as writer:
+            for segment in segments:
+                writer.add(segment)
+        os.replace(tmp_filename, reader.filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def align(
+    get_model: Callable[[], WhisperModel],
+    jsonl_filename: str,
+    language: Optional[str],
+    merge_threshold: float,
+    precompress: Sequence[str],
+    vad_options: VadOptions,
+) -> None:
+    """Add the words to the segments of a ``.jsonl``, replacing it.
+
+    Transcripts that are not finished, or already have their words, are
+    left as they are.
+    """
+    with Reader(jsonl_filename) as reader:
+        segments = list(reader)
+    if not reader.finished or not reader.finished["ok"]:
+        _wrn("Skipping (not finished): " + colored(jsonl_filename, "yellow"))
+        return
+    if not needs_align(segments):
+        _inf("Up to date: " + colored(jsonl_filename, "green"))
+    else:
+        _align(get_model, reader, segments, language, merge_threshold, vad_options)
+
+    if precompress:
+        write_compressed(jsonl_filename, precompress)
+
+
+def _align(
+    get_model: Callable[[], WhisperModel],
+    reader: Reader,
+    segments: Sequence[SegmentPayloadJson],
+    language: Optional[str],
+    merge_threshold: float,
+    vad_options: VadOptions,
+) -> None:
+    media_filename = reader.media_filename
+    speech_map, audio = get_speech_map(media_filename, vad_options)
+    model = get_model()
+    language = language or reader.language or None
+    _inf(
+        colored("align: ", "blue")
+        + colored(reader.filename, "cyan")
+        + f" ({len(segments)} segments), language="
+        + colored(language or "auto", "cyan")
+    )
+
+    if audio is None:
+        audio = decode_audio(media_filename, sampling_rate=SAMPLING_RATE)
+    tokenizer = Tokenizer(
+        model.hf_tokenizer,
+        model.model.is_multilingual,
+        task="transcribe",
+        language=language,
+    )
+    windows = iter_windows(
+        segments, speech_map.chunks, model.feature_extractor.n_samples
+    )
+    for indexes, chunks in windows:
+        _dbg(
+            f"[{segments[indexes[0]]['start']:.2f}s -> "
+            f"{segments[indexes[-1]]['end']:.2f}s] {len(indexes)} segments"
+        )
+        window_segments = segments[indexes.start : indexes.stop]
+        _align_window(model, tokenizer, audio, window_segments, chunks)
+    del audio
+
+    _write(reader, segments, merge_threshold)
+    _inf("Saved: " + colored(reader.filename, "cyan") + f" (from: {media_filename})")
+
+
+def align_batch(
+    files: Sequence[str],
+    language: Optional[str],
+    merge_threshold: float,
+    local: bool,
+    acceleration_device: str,
+    precompress: Sequence[str],
+    vad_threshold: float,
+    vad_min_speech_duration: float,
+    vad_min_silence_duration: float,
+    vad_speech_pad: float,
+    jobs: int,
+) -> None:
+    vad_options = create_vad_options(
+        vad_threshold, vad_min_speech_duration, vad_min_silence_duration, vad_speech_pad
+    )
+    # a single model, used by all the jobs at once
+    get_model = get_model_loader(local, acceleration_device, jobs)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="align") as pool:
+        futures = [
+            pool.submit(
+                align,
+                get_model,
+                filename,
+                language,
+                merge_threshold,
+                precompress,
+                vad_options,
+            )
+            for filename in files
+        ]
+        for future in futures:
+            future.result()
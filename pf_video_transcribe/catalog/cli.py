@@ -0,0 +1,129 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import os.path
+import textwrap
+
+from .. import log
+
+description = """\
+Adds the transcriptions ('.jsonl') to a SQLite database with full text
+search (FTS5) of the segments and the timing of each word, used by the
+'search' command and 'serve --catalog'.
+
+Directories are recursively scanned. Files are only read again if their
+size or modification time changed, and only updated if their contents
+changed. Transcriptions removed from the scanned directories are removed
+from the database.
+"""
+
+DEFAULT_DATABASE = "pf-video-transcribe.sqlite3"
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .work import catalog
+
+    catalog(
+        args.database,
+        args.path,
+        args.force,
+        args.jobs,
+        args.batch_size,
+    )
+
+
+def check_path_exists(s: str) -> str:
+    if not os.path.exists(s):
+        raise ValueError(f"does not exist: {s}")
+    return s
+
+
+def add_database_argument(ap: ArgumentParser) -> None:
+    ap.add_argument(
+        "-d",
+        "--database",
+        default=DEFAULT_DATABASE,
+        help=textwrap.dedent(
+            """\
+            SQLite database file. Paths are stored relative to its
+            directory.
+
+            Default: %(default)s
+        """
+        ),
+    )
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    add_database_argument(ap)
+    ap.add_argument(
+        "-f",
+        "--force",
+        default=False,
+        action="store_true",
+        help="Update all transcriptions, even if they didn't change",
+    )
+    ap.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help=textwrap.dedent(
+            """\
+            Number of files to be read in parallel while the database
+            is written.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help=textwrap.dedent(
+            """\
+            Number of files added in a single transaction. Larger
+            batches are faster, smaller batches are saved more often.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "path",
+        nargs="+",
+        type=check_path_exists,
+        help="'.jsonl' file or directory to scan",
+    )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "catalog",
+        help="Add '.jsonl' to a full text search database",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+
+# PRAGMA user_version, the database is recreated if it doesn't match
+SCHEMA_VERSION = 1
+
+_schema = """\
+CREATE TABLE transcripts (
+    id INTEGER PRIMARY KEY,
+    jsonl TEXT NOT NULL UNIQUE,
+    media TEXT NOT NULL,
+    language TEXT NOT NULL,
+    duration REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+
+CREATE TABLE segments (
+    id INTEGER PRIMARY KEY,
+    transcript_id INTEGER NOT NULL REFERENCES transcripts (id),
+    number INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX segments_transcript ON segments (transcript_id, number);
+
+CREATE TABLE words (
+    segment_id INTEGER NOT NULL REFERENCES segments (id),
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL,
+    probability REAL NOT NULL
+);
+CREATE INDEX words_segment ON words (segment_id);
+
+-- external content, the text is only stored in segments
+CREATE VIRTUAL TABLE segments_fts USING fts5 (
+    text,
+    content='segments',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def connect(filename: str, readonly: bool = False) -> sqlite3.Connection:
+    """Open the catalog, creating (or recreating) the schema if needed.
+
+    Read only connections are used by ``search`` and ``serve``, they
+    never change the file and can be used concurrently with ``catalog``.
+    """
+    if readonly:
+        uri = "file:" + os.path.abspath(filename) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.close()
+            raise ValueError(
+                f"{filename}: unsupported catalog version {version},"
+                " run the 'catalog' command again"
+            )
+        return conn
+
+    conn = sqlite3.connect(filename, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        _recreate_schema(conn)
+    return conn
+
+
+def _recreate_schema(conn: sqlite3.Connection) -> None:
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+        " AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'segments_fts_%'"
+    ).fetchall()
+    drop = "".join(f'DROP TABLE IF EXISTS "{name}";\n' for (name,) in tables)
+    conn.executescript(
+        f"BEGIN;\n{drop}{_schema}PRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;"
+    )
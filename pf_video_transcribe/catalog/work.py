@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+from termcolor import colored
+
+from .database import connect
+from ..jsonl.reader import Reader
+from ..types import HeaderInfoJson
+from ..types import SegmentPayloadJson
+
+_logger = logging.getLogger(__name__.replace(".work", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_inf = functools.partial(_logger.log, logging.INFO)
+_wrn = functools.partial(_logger.log, logging.WARNING)
+
+
+class _Stored(NamedTuple):
+    id: int
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+class _Transcript(NamedTuple):
+    jsonl: str  # relative to the database directory
+    media: str
+    info: HeaderInfoJson
+    sha256: str
+    st: os.stat_result
+    segments: list[SegmentPayloadJson]
+
+
+def _iter_jsonl_files(paths: Sequence[str]) -> Iterator[str]:
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for fname in sorted(files):
+                if fname.endswith(".jsonl") and not fname.startswith("."):
+                    yield os.path.join(root, fname)
+
+
+def _hash_file(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load(
+    filename: str,
+    root: str,
+    stored: Optional[_Stored],
+    force: bool,
+) -> Optional[Union[_Transcript, _Stored]]:
+    """Read the transcript if it changed since it was stored.
+
+    Returns the stored entry with the new stat if only the stat changed
+    (ie: touched or copied), or None if nothing changed.
+    """
+    st = os.stat(filename)
+    if not force and stored is not None:
+        if stored.size == st.st_size and stored.mtime_ns == st.st_mtime_ns:
+            return None
+
+    sha256 = _hash_file(filename)
+    if not force and stored is not None and stored.sha256 == sha256:
+        return stored._replace(size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    with Reader(filename) as reader:
+        segments = list(reader)
+        return _Transcript(
+            jsonl=os.path.relpath(filename, root),
+            media=os.path.relpath(reader.media_filename, root),
+            info=reader.info,
+            sha256=sha256,
+            st=st,
+            segments=segments,
+        )
+
+
+class _Loader:
+    """Insert transcripts, with all rows of a batch in a single transaction.
+
+    Row ids are assigned here so segments and words are inserted with
+    ``executemany()`` instead of one statement per segment.
+    """
+
+    conn: sqlite3.Connection
+    next_segment_id: int
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.next_segment_id = 0
+
+    def begin(self) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+        row = self.conn.execute("SELECT max(id) FROM segments").fetchone()
+        self.next_segment_id = (row[0] or 0) + 1
+
+    def commit(self) -> None:
+        self.conn.execute("COMMIT")
+
+    def delete(self, transcript_id: int) -> None:
+        self.conn.execute(
+            "DELETE FROM words WHERE segment_id IN"
+            " (SELECT id FROM segments WHERE transcript_id = ?)",
+            (transcript_id,),
+        )
+        self.conn.execute(
+            "DELETE FROM segments WHERE transcript_id = ?", (transcript_id,)
+        )
+        self.conn.execute("DELETE FROM transcripts WHERE id = ?", (transcript_id,))
+
+    def update_stat(self, stored: _Stored) -> None:
+        self.conn.execute(
+            "UPDATE transcripts SET size = ?, mtime_ns = ? WHERE id = ?",
+            (stored.size, stored.mtime_ns, stored.id),
+        )
+
+    def insert(self, transcript: _Transcript, stored: Optional[_Stored]) -> None:
+        if stored is not None:
+            self.delete(stored.id)
+
+        cursor = self.conn.execute(
+            "INSERT INTO transcripts"
+            " (jsonl, media, language, duration, sha256, size, mtime_ns)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                transcript.jsonl,
+                transcript.media,
+                transcript.info["language"],
+                transcript.info["duration"],
+                transcript.sha256,
+                transcript.st.st_size,
+                transcript.st.st_mtime_ns,
+            ),
+        )
+        transcript_id = cursor.lastrowid
+        first_id = self.next_segment_id
+        self.next_segment_id += len(transcript.segments)
+        self.conn.executemany(
+            "INSERT INTO segments (id, transcript_id, number, start, end, text)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (first_id + i, transcript_id, i + 1, s["start"], s["end"], s["text"])
+                for i, s in enumerate(transcript.segments)
+            ),
+        )
+        self.conn.executemany(
+            "INSERT INTO words (segment_id, start, end, text, probability)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (first_id + i, w["start"], w["end"], w["text"], w["probability"])
+                for i, s in enumerate(transcript.segments)
+                for w in s["words"]
+            ),
+        )
+
+
+def _get_stored(conn: sqlite3.Connection) -> dict[str, _Stored]:
+    rows = conn.execute("SELECT jsonl, id, sha256, size, mtime_ns FROM transcripts")
+    return {jsonl: _Stored(*values) for jsonl, *values in rows}
+
+
+def _is_inside(path: str, directories: Sequence[str]) -> bool:
+    return any(
+        d == os.curdir or path == d or path.startswith(d + os.sep) for d in directories
+    )
+
+
+def catalog(
+    database: str,
+    paths: Sequence[str],
+    force: bool,
+    jobs: int,
+    batch_size: int,
+) -> None:
+    """Add or update the transcripts found in ``paths`` to the database.
+
+    Files are only read if their size or modification time changed, and
+    only inserted again if their contents (SHA-256) changed. Each batch of
+    ``batch_size`` files is inserted in a single transaction, while the
+    next batch is read by ``jobs`` threads. Transcripts removed from the
+    scanned directories are removed from the database.
+    """
+    root = os.path.dirname(os.path.abspath(database))
+    conn = connect(database)
+    stored_by_jsonl = _get_stored(conn)
+    filenames = list(_iter_jsonl_files(paths))
+    relnames = [os.path.relpath(os.path.abspath(f), root) for f in filenames]
+    batches = [
+        range(i, min(i + batch_size, len(filenames)))
+        for i in range(0, len(filenames), batch_size)
+    ]
+
+    loader = _Loader(conn)
+    added = unchanged = removed = failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="read") as pool:
+
+            def submit(batch: range) -> list[Future]:
+                return [
+                    pool.submit(
+                        _load,
+                        filenames[i],
+                        root,
+                        stored_by_jsonl.get(relnames[i]),
+                        force,
+                    )
+                    for i in batch
+                ]
+
+            next_futures = submit(batches[0]) if batches else []
+            for batch_index, batch in enumerate(batches):
+                futures = next_futures
+                if batch_index + 1 < len(batches):
+                    # read the next batch while this one is inserted
+                    next_futures = submit(batches[batch_index + 1])
+
+                loader.begin()
+                for i, future in zip(batch, futures):
+                    try:
+                        result = future.result()
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        _wrn(
+                            "Could not read " + colored(filenames[i], "red") + f": {e}"
+                        )
+                        failed += 1
+                    else:
+                        if isinstance(result, _Transcript):
+                            _dbg("Adding: " + colored(filenames[i], "cyan"))
+                            loader.insert(result, stored_by_jsonl.get(relnames[i]))
+                            added += 1
+                        else:
+                            if result is not None:
+                                # touched or copied, same contents
+                                loader.update_stat(result)
+                            unchanged += 1
+                loader.commit()
+                _dbg(f"Committed {len(batch)} transcripts")
+
+        # directories relative to the database directory
+        scanned = [
+            os.path.relpath(os.path.abspath(p), root) for p in paths if os.path.isdir(p)
+        ]
+        found = set(relnames)
+        loader.begin()
+        for relname, stored in stored_by_jsonl.items():
+            if relname not in found and _is_inside(relname, scanned):
+                _dbg("Removing: " + colored(relname, "yellow"))
+                loader.delete(stored.id)
+                removed += 1
+        loader.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    _inf(
+        "Catalog "
+        + colored(database, "cyan")
+        + f": {added} added or updated, {unchanged} unchanged,"
+        + f" {removed} removed, {failed} failed"
+    )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import functools
+import gzip
+import importlib.util
+import logging
+import os.path
+import textwrap
+from typing import Sequence
+
+from termcolor import colored
+
+from .utils import needs_generate
+from .utils import write_atomic
+
+_logger = logging.getLogger(__name__)
+_inf = functools.partial(_logger.log, logging.INFO)
+
+# Content-Encoding => file extension, in order of preference
+ENCODING_EXTENSIONS = {
+    "br": "br",
+    "gzip": "gz",
+}
+
+
+def get_compressed_filename(filename: str, encoding: str) -> str:
+    return filename + os.path.extsep + ENCODING_EXTENSIONS[encoding]
+
+
+def parse_encodings(s: str) -> list[str]:
+    encodings = [e.strip() for e in s.split(",") if e.strip()]
+    for encoding in encodings:
+        if encoding not in ENCODING_EXTENSIONS:
+            raise ValueError(f"unsupported encoding: {encoding}")
+        if encoding == "br" and importlib.util.find_spec("brotli") is None:
+            raise ValueError("brotli is not installed")
+    return encodings
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    elif encoding == "br":
+        import brotli  # type: ignore
+
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"unsupported encoding: {encoding}")
+
+
+def write_compressed(
+    filename: str,
+    encodings: Sequence[str],
+    force: bool = False,
+) -> list[str]:
+    """Write the missing or outdated compressed siblings of ``filename``.
+
+    Each encoding is saved next to the original file, such as
+    ``video.html.gz`` and ``video.html.br``. They are written to temporary
+    files and then renamed, so servers never see partial files.
+    """
+    pending = [
+        encoding
+        for encoding in encodings
+        if force
+        or needs_generate(filename, get_compressed_filename(filename, encoding))
+    ]
+    if not pending:
+        return []
+
+    with open(filename, "rb") as file:
+        data = file.read()
+
+    saved = []
+    for encoding in pending:
+        compressed_filename = get_compressed_filename(filename, encoding)
+        write_atomic(compressed_filename, compress(data, encoding))
+        _inf(
+            "Saved: "
+            + colored(compressed_filename, "cyan")
+            + f" ({len(data)} -> {os.path.getsize(compressed_filename)} bytes)"
+        )
+        saved.append(compressed_filename)
+    return saved
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    ap.add_argument(
+        "--precompress",
+        type=parse_encodings,
+        default=[],
+        help=textwrap.dedent(
+            """\
+            Comma separated list of encodings (gzip,br) to save compressed
+            copies next to each output, such as "video.html.gz", to be
+            served directly by web servers or CDN (ie: nginx gzip_static).
+
+            They are regenerated whenever they are older than the output.
+
+            Note that "br" requires the optional brotli dependency:
+            poetry install -E brotli
+        """
+        ),
+    )
@@ -7,12 +7,14 @@ from dataclasses import KW_ONLY
 from typing import Any
 from typing import Callable
 from typing import ClassVar
+from typing import Iterator
 from typing import Mapping
 from typing import Sequence
 from typing import TypeVar
 
 from termcolor import colored
 
+from .compress import write_compressed
 from .jsonl.reader import Reader
 from .templates import get_template
 from .utils import needs_generate
@@ -29,13 +31,17 @@ class AbstractConverter(ABC):
     input_filename: str
     force: bool
     _: KW_ONLY
+    precompress: Sequence[str] = ()
+    # if False, nothing is written, see AbstractJsonlConverter.render()
+    save: bool = True
     filename: str = field(init=False)
     generated: bool = field(init=False)
 
     def __post_init__(self) -> None:
         self.filename = self.create_output_name(self.input_filename)
         self.generated = False
-        self._write()
+        if self.save:
+            self._write()
 
     @classmethod
     def create_output_name(cls, input_filename: str) -> str:
@@ -58,16 +64,18 @@ class AbstractConverter(ABC):
                 + colored(self.filename, "green")
                 + f" (from: {self.input_filename})"
             )
-            return
+        else:
+            self.generate()
 
-        self.generate()
+            logger(
+                "Saved: "
+                + colored(self.filename, "cyan")
+                + f" (from: {self.input_filename})"
+            )
+            self.generated = True
 
-        logger(
-            "Saved: "
-            + colored(self.filename, "cyan")
-            + f" (from: {self.input_filename})"
-        )
-        self.generated = False
+        if self.precompress:
+            write_compressed(self.filename, self.precompress)
 
     @classmethod
     def batch(
@@ -83,12 +91,21 @@ class AbstractJsonlConverter(AbstractConverter):
     template_name: ClassVar[str]
 
     def generate(self) -> None:
-        tmpl = get_template(self.template_name)
         with Reader(self.input_filename) as reader:
-            ctx = self.get_template_context(reader)
+            chunks = self.render(reader)
             with open(self.filename, "w") as out:
-                for chunk in tmpl.generate(**ctx):
+                for chunk in chunks:
                     out.write(chunk)
 
+    def render(self, reader: Reader) -> Iterator[str]:
+        """Render the template in chunks, as the reader is consumed.
+
+        Used by ``generate()`` and to render in memory (ie: ``serve``)
+        with ``save=False``.
+        """
+        tmpl = get_template(self.template_name)
+        ctx = self.get_template_context(reader)
+        return tmpl.generate(**ctx)
+
     def get_template_context(self, reader: Reader) -> Mapping[str, object]:
         return {**asdict(self), "reader": reader}
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+from typing import Any
+from typing import Optional
+
+from .utils import write_atomic
+
+_logger = logging.getLogger(__name__)
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+
+class DirectoryCache:
+    """Persistent cache of values computed from the files of a directory.
+
+    Saved as a JSON dotfile (``.{name}.json``) in the directory itself, so
+    it moves along with the files. Entries are keyed by file name and
+    invalidated whenever the file size or modification time (nanoseconds)
+    change. Use :func:`get_directory_cache` to share the instances.
+    """
+
+    dirname: str
+    filename: str
+    version: int
+    _entries: dict[str, dict[str, Any]]
+    _dirty: bool
+    _lock: threading.Lock
+
+    def __init__(self, dirname: str, name: str, version: int) -> None:
+        self.dirname = dirname
+        self.filename = os.path.join(dirname, f".{name}.json")
+        self.version = version
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.filename) as file:
+                data = json.load(file)
+            if data.get("version") == self.version:
+                return dict(data["entries"])
+            _dbg(f"Ignoring cache {self.filename}: version mismatch")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            _dbg(f"Ignoring cache {self.filename}: {e}")
+        return {}
+
+    @staticmethod
+    def _get_key(st: os.stat_result) -> list[int]:
+        return [st.st_size, st.st_mtime_ns]
+
+    def _stat(self, name: str, st: Optional[os.stat_result]) -> Optional[list[int]]:
+        if st is None:
+            try:
+                st = os.stat(os.path.join(self.dirname, name))
+            except OSError:
+                return None
+        return self._get_key(st)
+
+    def get(self, name: str, st: Optional[os.stat_result] = None) -> Optional[Any]:
+        """The value if the file didn't change, ``st`` avoids another stat."""
+        key = self._stat(name, st)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or entry.get("key") != key:
+            return None
+        return entry.get("value")
+
+    def set(self, name: str, value: Any, st: Optional[os.stat_result] = None) -> None:
+        key = self._stat(name, st)
+        if key is None:
+            return
+        with self._lock:
+            self._entries[name] = {"key": key, "value": value}
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # forget files that were removed
+            entries = {
+                name: entry
+                for name, entry in self._entries.items()
+                if os.path.exists(os.path.join(self.dirname, name))
+            }
+            data = json.dumps(
+                {"version": self.version, "entries": entries},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            try:
+                write_atomic(self.filename, data.encode("utf-8"))
+            except OSError as e:
+                # read-only directories still work, just without persistence
+                _dbg(f"Could not save cache {self.filename}: {e}")
+                return
+            self._entries = entries
+            self._dirty = False
+
+
+_caches: dict[tuple[str, str], DirectoryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_directory_cache(dirname: str, name: str, version: int) -> DirectoryCache:
+    dirname = os.path.abspath(dirname)
+    with _caches_lock:
+        cache = _caches.get((dirname, name))
+        if cache is None or cache.version != version:
+            cache = DirectoryCache(dirname, name, version)
+            _caches[(dirname, name)] = cache
+        return cache
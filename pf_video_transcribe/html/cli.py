@@ -5,6 +5,8 @@ from argparse import RawTextHelpFormatter
 import textwrap
 
 from .. import log
+from ..thumbnail.cli import parse_formats
+from ..thumbnail.cli import parse_widths
 from ..types import Size
 from ..utils import parse_size
 from ..vtt import cli as vtt
@@ -35,14 +37,25 @@ def handle_command(args: Namespace) -> None:
         args.file,
         args.force,
         duration_threshold=args.duration_threshold,
+        precompress=args.precompress,
+    )
+    ThumbnailConverter.batch(
+        args.file,
+        args.force,
+        size=args.thumb_size,
+        fast_seek=args.thumb_fast_seek,
+        variant_widths=args.thumb_widths,
+        variant_formats=args.thumb_formats,
     )
-    ThumbnailConverter.batch(args.file, args.force, size=args.thumb_size)
     HTMLConverter.batch(
         args.file,
         args.force,
         html_head_entry=args.html_head_entry,
         stylesheet=args.stylesheet,
         javascript=args.javascript,
+        compact=args.compact,
+        chunk_duration=args.chunk_duration,
+        precompress=args.precompress,
     )
 
 
@@ -92,6 +105,40 @@ def add_arguments(ap: ArgumentParser, add_files: bool = True) -> None:
             """
         ),
     )
+    ap.add_argument(
+        "--compact",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            Embed the word timings as a single compact JSON array
+            instead of one element per word, the JavaScript then
+            creates the word elements.
+
+            This reduces the page size and load time of long media.
+            Without JavaScript, the text of each segment is still shown.
+            """
+        ),
+    )
+    ap.add_argument(
+        "--chunk-duration",
+        type=float,
+        default=0.0,
+        help=textwrap.dedent(
+            """\
+            Split the transcription into fragments of this duration
+            (in seconds), saved as JSON files in the "NAME.chunks" folder.
+            The HTML page will only contain placeholders and the
+            JavaScript loads the fragments near the current playback
+            time or scroll position. Use it for very long media (hours),
+            such as 600 (10 minutes).
+
+            This requires the page to be served over http(s).
+
+            Default: %(default)s (disabled)
+            """
+        ),
+    )
     ap.add_argument(
         "--thumb-size",
         type=parse_size,
@@ -110,6 +157,51 @@ def add_arguments(ap: ArgumentParser, add_files: bool = True) -> None:
         ),
     )
 
+    ap.add_argument(
+        "--thumb-fast-seek",
+        type=int,
+        default=0,
+        metavar="CANDIDATES",
+        help=textwrap.dedent(
+            """\
+            Seek to CANDIDATES evenly spread positions and decode only their
+            keyframes, picking the sharpest and best exposed frame. This is
+            much faster than decoding and scaling from the start, specially
+            for long and high resolution media.
+
+            Default: %(default)s (disabled, decode from the start)
+        """
+        ),
+    )
+
+    ap.add_argument(
+        "--thumb-widths",
+        type=parse_widths,
+        default=[],
+        help=textwrap.dedent(
+            """\
+            Comma separated list of widths to save extra thumbnails for
+            responsive images (srcset), such as "160,320,640,1280". They
+            are created in the same decode, saved as "NAME.{WIDTH}w.jpeg".
+
+            The generated HTML lists them in meta tags that are used by
+            'index_html' to create '<picture>' with 'srcset'.
+        """
+        ),
+    )
+    ap.add_argument(
+        "--thumb-formats",
+        type=parse_formats,
+        default=[],
+        help=textwrap.dedent(
+            """\
+            Comma separated list of extra formats (webp,avif) of the
+            width variants, saved as "NAME.{WIDTH}w.{FORMAT}". Note that
+            ffmpeg must be built with the matching encoder.
+        """
+        ),
+    )
+
 
 def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
     ap = sub.add_parser(
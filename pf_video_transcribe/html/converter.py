@@ -1,21 +1,39 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from dataclasses import field
 from dataclasses import KW_ONLY
 import functools
 import importlib.resources
+import json
 import logging
-from mimetypes import guess_type
 import os.path
 import re
-import shutil
+from typing import Any
 from typing import ClassVar
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
 
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
 from termcolor import colored
 
+from ..compress import ENCODING_EXTENSIONS
+from ..compress import write_compressed
 from ..converter import AbstractJsonlConverter
+from ..index_html.html_info import save_html_info
 from ..jsonl.reader import Reader
+from ..optimize.converter import OptimizeConverter
+from ..probe import get_mime_type
+from ..storyboard.converter import StoryboardConverter
+from ..thumbnail.converter import find_variants
+from ..thumbnail.converter import IMAGE_MIME_TYPES
+from ..thumbnail.converter import read_jpeg_size
 from ..thumbnail.converter import ThumbnailConverter
+from ..types import SegmentPayloadJson
+from ..utils import replace_ext
+from ..utils import write_atomic
 from ..vtt.converter import VTTConverter
 
 
@@ -33,6 +51,185 @@ def _gen_title_from_filename(filename: str) -> str:
     return _clean_title_from_path_re.sub(" ", name).title()
 
 
+class CompactWords:
+    """Iterate segments while collecting their words as compact arrays.
+
+    Instead of one ``<span class="word">`` per word, the compact HTML
+    embeds a single JSON object with the word timings and texts as
+    parallel arrays, ``counts`` holds the number of words of each segment.
+    The JavaScript then creates the word elements from it.
+    """
+
+    segments: Iterator[SegmentPayloadJson]
+    counts: list[int]
+    starts: list[float]
+    ends: list[float]
+    texts: list[str]
+
+    def __init__(self, segments: Iterator[SegmentPayloadJson]) -> None:
+        self.segments = segments
+        self.counts = []
+        self.starts = []
+        self.ends = []
+        self.texts = []
+
+    def __iter__(self) -> Iterator[SegmentPayloadJson]:
+        for segment in self.segments:
+            words = segment["words"]
+            self.counts.append(len(words))
+            for word in words:
+                self.starts.append(round(word["start"], 3))
+                self.ends.append(round(word["end"], 3))
+                self.texts.append(word["text"])
+            yield segment
+
+    def asdict(self) -> dict[str, list]:
+        return {
+            "counts": self.counts,
+            "start": self.starts,
+            "end": self.ends,
+            "text": self.texts,
+        }
+
+    def tojson(self) -> Markup:
+        return htmlsafe_json_dumps(
+            self.asdict(),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+
+def _get_existing_basename(path: str) -> str:
+    if os.path.isfile(path):
+        return os.path.basename(path)
+    return ""
+
+
+def _get_image_sources(
+    variants: dict[str, list[tuple[int, str]]],
+) -> list[tuple[str, str]]:
+    """List of ``(mime_type, srcset)`` in the order of preference."""
+    return [
+        (
+            mime_type,
+            ", ".join(
+                f"{os.path.basename(path)} {width}w" for width, path in variants[fmt]
+            ),
+        )
+        for fmt, mime_type in IMAGE_MIME_TYPES.items()
+        if fmt in variants
+    ]
+
+
+def _get_poster(variants: dict[str, list[tuple[int, str]]]) -> str:
+    # <video poster> doesn't take srcset, use the largest JPEG
+    jpegs = variants.get("jpeg")
+    if not jpegs:
+        return ""
+    return os.path.basename(jpegs[-1][1])
+
+
+@dataclass
+class TranscriptChunk:
+    first: int  # index (1-based) of the first segment, as in "#segment/N"
+    count: int
+    start: float
+    end: float
+    src: str
+
+
+class TranscriptChunks:
+    """Split segments into time-window fragments saved as JSON files.
+
+    Each fragment holds the segments starting within ``duration`` seconds
+    from its first segment, they are saved to ``directory`` as they are
+    iterated. The HTML then only contains placeholders and the JavaScript
+    fetches the fragments near the playback time or scroll position.
+    """
+
+    segments: Iterator[SegmentPayloadJson]
+    directory: str
+    duration: float
+    precompress: Sequence[str]
+    _saved: set[str]
+
+    def __init__(
+        self,
+        segments: Iterator[SegmentPayloadJson],
+        directory: str,
+        duration: float,
+        precompress: Sequence[str] = (),
+    ) -> None:
+        self.segments = segments
+        self.directory = directory
+        self.duration = duration
+        self.precompress = precompress
+        self._saved = set()
+
+    def __iter__(self) -> Iterator[TranscriptChunk]:
+        os.makedirs(self.directory, exist_ok=True)
+        first = 1
+        pending: list[SegmentPayloadJson] = []
+        for segment in self.segments:
+            if pending and segment["start"] - pending[0]["start"] >= self.duration:
+                yield self._save(first, pending)
+                first += len(pending)
+                pending = []
+            pending.append(segment)
+
+        if pending:
+            yield self._save(first, pending)
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        # chunks are replaced in place, so the pages being viewed keep
+        # working while they are generated; only the unused are removed
+        compressed_exts = tuple(
+            os.path.extsep + ext for ext in ENCODING_EXTENSIONS.values()
+        )
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if name.endswith(compressed_exts):
+                name = os.path.splitext(name)[0]
+            if name.endswith(".json") and name not in self._saved:
+                _dbg("Removing stale chunk " + colored(entry.path, "yellow"))
+                os.unlink(entry.path)
+
+    def _save(self, first: int, segments: list[SegmentPayloadJson]) -> TranscriptChunk:
+        name = f"{first:06d}.json"
+        words = CompactWords(iter(segments))
+        for _ in words:
+            pass
+
+        data = json.dumps(
+            {
+                "first": first,
+                "segments": {
+                    "start": [s["start"] for s in segments],
+                    "end": [s["end"] for s in segments],
+                    "text": [s["text"] for s in segments],
+                },
+                "words": words.asdict(),
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        path = os.path.join(self.directory, name)
+        write_atomic(path, data.encode("utf-8"))
+        if self.precompress:
+            write_compressed(path, self.precompress)
+        self._saved.add(name)
+
+        _dbg("Saved chunk " + colored(name, "cyan") + f" ({len(segments)} segments)")
+        return TranscriptChunk(
+            first=first,
+            count=len(segments),
+            start=segments[0]["start"],
+            end=segments[-1]["end"],
+            src=f"{os.path.basename(self.directory)}/{name}",
+        )
+
+
 @dataclass
 class HTMLConverter(AbstractJsonlConverter):
     ext = "html"
@@ -44,31 +241,80 @@ class HTMLConverter(AbstractJsonlConverter):
     html_head_entry: list[str]
     stylesheet: str
     javascript: str
+    compact: bool
+    chunk_duration: float
+    # page metadata (title, image...) of the last generated page
+    _info: dict[str, Any] = field(init=False, repr=False, default_factory=dict)
+
+    def generate(self) -> None:
+        super().generate()
+        # index_html will use it instead of parsing the page
+        save_html_info(self.filename, self._info)
 
     def get_template_context(self, reader: Reader) -> dict:
         media_filename = reader.media_filename
         base_media_filename = os.path.basename(media_filename)
-        mime_type = guess_type(media_filename)[0]
+        mime_type = get_mime_type(media_filename)
+        # web optimized derivatives come first, the original is the fallback
+        sources = []
+        web_media = OptimizeConverter.create_output_name(media_filename)
+        if os.path.isfile(web_media):
+            sources.append((os.path.basename(web_media), get_mime_type(web_media)))
+        sources.append((base_media_filename, mime_type))
+        video = _get_existing_basename(
+            OptimizeConverter.create_preview_name(media_filename)
+        )
         vtt_filename = VTTConverter.create_output_name(base_media_filename)
         image = ThumbnailConverter.create_output_name(media_filename)
-        if os.path.isfile(image):
-            image = os.path.basename(image)
-        else:
-            image = ""
+        image_variants = find_variants(image)
+        image_size = read_jpeg_size(image)
+        image = _get_existing_basename(image)
+        storyboard = _get_existing_basename(
+            StoryboardConverter.create_output_name(media_filename)
+        )
 
+        self._info = {
+            "title": _gen_title_from_filename(media_filename),
+            "image": image,
+            "video": video,
+            "image_sources": _get_image_sources(image_variants),
+            "image_width": image_size.width if image_size else 0,
+            "image_height": image_size.height if image_size else 0,
+        }
         return {
+            **self._info,
             "javascript": self._get_and_copy_javascript(),
             "stylesheet": self._get_and_copy_stylesheet(),
             "html_head_entry": self.html_head_entry,
-            "image": image,
+            "poster": _get_poster(image_variants) or image,
             "language": reader.language,
             "media_filename": base_media_filename,
             "mime_type": mime_type,
-            "title": _gen_title_from_filename(media_filename),
+            "sources": sources,
             "vtt_filename": vtt_filename,
-            "segments": iter(reader),
+            "storyboard": storyboard,
+            "compact": self.compact,
+            "segments": CompactWords(reader) if self.compact else iter(reader),
+            # after the segments: still being transcribed, see serve
+            "is_finished": lambda: reader.finished is not None,
+            "jsonl_filename": os.path.basename(self.input_filename),
+            "chunks": self._get_chunks(reader),
         }
 
+    @classmethod
+    def create_chunks_dirname(cls, filename: str) -> str:
+        return replace_ext(filename, "chunks")
+
+    def _get_chunks(self, reader: Reader) -> Optional[TranscriptChunks]:
+        if self.chunk_duration <= 0:
+            return None
+        return TranscriptChunks(
+            reader,
+            self.create_chunks_dirname(self.filename),
+            self.chunk_duration,
+            self.precompress,
+        )
+
     def _get_and_copy_stylesheet(self) -> str:
         if self.stylesheet:
             return self.stylesheet
@@ -81,12 +327,33 @@ class HTMLConverter(AbstractJsonlConverter):
 
     def _get_and_copy_default(self, ext: str) -> str:
         dst_name = f"{self.default_resource_name}{os.path.extsep}{ext}"
+        if not self.save:
+            return dst_name  # rendered in memory, see get_default_resource()
         dst_path = os.path.join(os.path.dirname(self.filename), dst_name)
-        if os.path.exists(dst_path):
+        data = importlib.resources.read_binary(__package__, f"default.{ext}")
+        try:
+            with open(dst_path, "rb") as file:
+                existing: Optional[bytes] = file.read()
+        except FileNotFoundError:
+            existing = None
+        if existing == data:
             _dbg("Already exists " + colored(dst_path, "cyan"))
-            return dst_name
-        src = importlib.resources.open_text(__package__, f"default.{ext}")
-        with open(dst_path, "x") as dst:
-            _inf("Created " + colored(dst_path, "cyan"))
-            shutil.copyfileobj(src, dst)
+        else:
+            # pages of older versions are converted again with this one;
+            # other files of the directory may be converted at once (pipeline)
+            write_atomic(dst_path, data)
+            _inf(
+                ("Created " if existing is None else "Updated ")
+                + colored(dst_path, "cyan")
+            )
+        if self.precompress:
+            write_compressed(dst_path, self.precompress)
         return dst_name
+
+    @classmethod
+    def get_default_resource(cls, name: str) -> Optional[bytes]:
+        """Contents of the built-in stylesheet or script named ``name``."""
+        base, ext = os.path.splitext(name)
+        if base != cls.default_resource_name or ext not in (".css", ".js"):
+            return None
+        return importlib.resources.read_binary(__package__, f"default{ext}")
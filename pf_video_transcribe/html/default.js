@@ -1,82 +1,321 @@
-function createTimeActiveTracker(videoEl, className) {
-    function getStart(element) {
-        const { dataset: { start } } = element;
-        if (start === undefined) {
-            if (element.parentNode) {
-                return getStart(element.parentNode);
-            }
+function formatTimestamp(seconds) {
+    // same as format_timestamp(decimal_marker=None) used by the template
+    const total = Math.floor(Math.round(seconds * 1000) / 1000);
+    const hours = Math.floor(total / 3600);
+    const minutes = Math.floor(total / 60) % 60;
+    const pad = (n) => String(n).padStart(2, "0");
+    const hoursMarker = hours > 0 ? `${pad(hours)}:` : "";
+    return `${hoursMarker}${pad(minutes)}:${pad(total % 60)}`;
+}
+
+function findLastLessOrEqual(sortedArray, value) {
+    // binary search, returns -1 if all items are greater than value
+    let low = 0;
+    let high = sortedArray.length - 1;
+    let found = -1;
+    while (low <= high) {
+        const mid = (low + high) >>> 1;
+        if (sortedArray[mid] <= value) {
+            found = mid;
+            low = mid + 1;
+        } else {
+            high = mid - 1;
         }
-        return start;
     }
+    return found;
+}
+
+// used by the click handler to seek to the start of the clicked
+// word or segment (the innermost element wins)
+const startByElement = new WeakMap();
 
-    function seek(clickEvent) {
-        clickEvent.preventDefault();
-        const start = getStart(clickEvent.target)
-        if (start == undefined) {
-            console.warn("missing dataset.start:", clickEvent);
+function collectTimeEntries(parentEl, className) {
+    const elements = parentEl.getElementsByClassName(className);
+    const starts = new Float64Array(elements.length);
+    const ends = new Float64Array(elements.length);
+    for (let i = 0; i < elements.length; i++) {
+        const element = elements[i];
+        starts[i] = Number(element.dataset.start);
+        ends[i] = Number(element.dataset.end);
+        startByElement.set(element, starts[i]);
+    }
+    return { starts, ends, getElement: (i) => elements[i] };
+}
+
+function createSegmentElements(first, { start, end, text }) {
+    // same markup as the template creates for each segment
+    const elements = [];
+    for (let i = 0; i < start.length; i++) {
+        const n = first + i;
+        const element = document.createElement("div");
+        element.id = `segment/${n}`;
+        element.className = "segment";
+        startByElement.set(element, start[i]);
+
+        const timestampEl = document.createElement("a");
+        timestampEl.className = "timestamp";
+        timestampEl.href = `#segment/${n}`;
+        for (const [className, time] of [["start", start[i]], ["end", end[i]]]) {
+            const timeEl = document.createElement("span");
+            timeEl.className = className;
+            timeEl.textContent = formatTimestamp(time);
+            timestampEl.appendChild(timeEl);
+        }
+
+        const textEl = document.createElement("p");
+        textEl.className = "text";
+        textEl.textContent = text[i].trim();
+
+        element.append(timestampEl, textEl);
+        elements.push(element);
+    }
+    return {
+        starts: Float64Array.from(start),
+        ends: Float64Array.from(end),
+        getElement: (i) => elements[i],
+        elements,
+    };
+}
+
+function createLazyWords(viewportEl, segmentEls, { counts, start, end, text }) {
+    // words are only created for the segments near the visible area (or
+    // the active one), the others are collapsed back to their plain text
+    const offsets = new Uint32Array(counts.length + 1);
+    for (let s = 0; s < counts.length; s++) {
+        offsets[s + 1] = offsets[s] + counts[s];
+    }
+    const wordEls = new Array(start.length);
+    const expanded = new Set();
+    const visible = new Set();
+    let activeSegment = -1;
+
+    function getTextEl(s) {
+        return segmentEls[s].getElementsByClassName("text")[0];
+    }
+
+    function expand(s) {
+        if (expanded.has(s) || offsets[s] === offsets[s + 1]) {
             return;
         }
-        console.log("seek to:", className, start);
-        videoEl.currentTime = start;
+        const fragment = document.createDocumentFragment();
+        for (let w = offsets[s]; w < offsets[s + 1]; w++) {
+            const element = document.createElement("span");
+            element.className = "word";
+            element.textContent = text[w];
+            startByElement.set(element, start[w]);
+            wordEls[w] = element;
+            fragment.appendChild(element);
+        }
+        getTextEl(s).replaceChildren(fragment);
+        expanded.add(s);
     }
 
-    const array = [];
-    for (const element of document.getElementsByClassName(className)) {
-        const start = Number(element.dataset.start);
-        const end = Number(element.dataset.end);
-        array.push({ start, end, element });
-        element.onclick = seek;
+    function collapse(s) {
+        if (!expanded.has(s) || visible.has(s) || s === activeSegment) {
+            return;
+        }
+        getTextEl(s).textContent = text.slice(offsets[s], offsets[s + 1]).join("").trim();
+        wordEls.fill(undefined, offsets[s], offsets[s + 1]);
+        expanded.delete(s);
     }
 
-    let currentIdx;
+    const indexByElement = new Map();
+    for (let s = 0; s < segmentEls.length; s++) {
+        indexByElement.set(segmentEls[s], s);
+    }
 
-    function findTime(time, backwards) {
-        const start = currentIdx || 0;
-        if (backwards) {
-            for (let i = start; i >= 0; i--) {
-                const { start, end } = array[i];
-                if (start <= time && time <= end) {
-                    return [i, true];
-                }
-                if (time > end) {
-                    return [i, false];
-                }
+    function onIntersection(entries) {
+        entries.forEach(entry => {
+            const s = indexByElement.get(entry.target);
+            if (entry.isIntersecting) {
+                visible.add(s);
+                expand(s);
+            } else {
+                visible.delete(s);
+                collapse(s);
             }
-        } else {
-            for (let i = start; i < array.length; i++) {
-                const { start, end } = array[i];
-                if (start <= time && time <= end) {
-                    return [i, true];
-                }
-                if (time < start) {
-                    return [i, false];
-                }
+        });
+    }
+
+    const observer = new IntersectionObserver(onIntersection, {
+        root: viewportEl,
+        rootMargin: "50% 0px",
+    });
+    for (const element of segmentEls) {
+        observer.observe(element);
+    }
+
+    return {
+        starts: Float64Array.from(start),
+        ends: Float64Array.from(end),
+        getElement(w) {
+            const previous = activeSegment;
+            activeSegment = findLastLessOrEqual(offsets, w);
+            expand(activeSegment);
+            if (previous >= 0) {
+                collapse(previous);
+            }
+            return wordEls[w];
+        },
+    };
+}
+
+function createCompactWords(viewportEl, segmentEls) {
+    // compact HTML embeds the words as arrays instead of <span class="word">
+    const dataEl = document.getElementById("transcription-words");
+    if (!dataEl) {
+        return undefined;
+    }
+    return createLazyWords(viewportEl, segmentEls, JSON.parse(dataEl.textContent));
+}
+
+function createTimeActiveTracker({ starts, ends, getElement }) {
+    let currentIdx = -1;
+    let currentEl;
+
+    function update(time) {
+        const i = findLastLessOrEqual(starts, time);
+        if (i === currentIdx || i < 0 || ends[i] < time) {
+            // keep the last active element while in between items
+            return currentEl;
+        }
+        if (currentEl) {
+            currentEl.classList.remove("active");
+        }
+        currentIdx = i;
+        currentEl = getElement(i);
+        currentEl.classList.add("active");
+        return currentEl;
+    }
+
+    function clear() {
+        if (currentEl) {
+            currentEl.classList.remove("active");
+        }
+        currentIdx = -1;
+        currentEl = undefined;
+    }
+
+    return { update, clear };
+}
+
+function createTranscriptTracker(segments, words) {
+    const segmentsTracker = createTimeActiveTracker(segments);
+    const wordsTracker = createTimeActiveTracker(words);
+
+    return {
+        update(time) {
+            const segmentEl = segmentsTracker.update(time);
+            return wordsTracker.update(time) || segmentEl;
+        },
+        clear() {
+            segmentsTracker.clear();
+            wordsTracker.clear();
+        },
+    };
+}
+
+function createChunkedTracker(viewportEl, onChunkLoaded) {
+    // chunked HTML only has placeholders, the segments are fetched from
+    // JSON fragments near the playback time or the scroll position
+    const chunks = [];
+    const chunkByElement = new WeakMap();
+    for (const element of viewportEl.getElementsByClassName("chunk")) {
+        const { first, count, src } = element.dataset;
+        const chunk = {
+            first: Number(first),
+            count: Number(count),
+            src,
+            element,
+            tracker: undefined,
+            loading: undefined,
+        };
+        chunks.push(chunk);
+        chunkByElement.set(element, chunk);
+    }
+    const { starts } = collectTimeEntries(viewportEl, "chunk");
+
+    function onIntersection(entries) {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                load(chunkByElement.get(entry.target));
             }
+        });
+    }
+
+    const observer = new IntersectionObserver(onIntersection, {
+        root: viewportEl,
+        rootMargin: "100% 0px",
+    });
+    for (const { element } of chunks) {
+        observer.observe(element);
+    }
+
+    function load(chunk) {
+        if (chunk.loading) {
+            return chunk.loading;
         }
-        return [0, false];
+        console.log("load chunk:", chunk.src);
+        chunk.loading = fetch(chunk.src)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`${response.status} ${response.statusText}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                const segments = createSegmentElements(data.first, data.segments);
+                chunk.element.replaceChildren(...segments.elements);
+                chunk.element.classList.remove("pending");
+                const words = createLazyWords(viewportEl, segments.elements, data.words);
+                chunk.tracker = createTranscriptTracker(segments, words);
+                observer.unobserve(chunk.element);
+                onChunkLoaded(chunk);
+            })
+            .catch(error => {
+                console.error("could not load chunk:", chunk.src, error);
+                chunk.loading = undefined;
+            });
+        return chunk.loading;
     }
 
-    return function update(time) {
-        let backwards = false;
-        if (currentIdx !== undefined) {
-            backwards = time < array[currentIdx].start;
+    function showSegment(n) {
+        const chunk = chunks.find(({ first, count }) => first <= n && n < first + count);
+        if (!chunk) {
+            return;
         }
-        const [i, found] = findTime(time, backwards);
-        if (i === currentIdx || !found) {
-            if (currentIdx !== undefined) {
-                return array[currentIdx].element;
+        load(chunk).then(() => {
+            const element = document.getElementById(`segment/${n}`);
+            if (element) {
+                element.scrollIntoView({ block: "center" });
             }
+        });
+    }
+
+    let current;
+
+    function update(time) {
+        if (!chunks.length) {
             return undefined;
         }
-        if (currentIdx !== undefined) {
-            const oldEl = array[currentIdx].element;
-            oldEl.classList.remove("active");
+        const i = Math.max(0, findLastLessOrEqual(starts, time));
+        const chunk = chunks[i];
+        if (current !== chunk) {
+            if (current && current.tracker) {
+                current.tracker.clear();
+            }
+            current = chunk;
         }
-        const newEl = array[i].element;
-        newEl.classList.add("active");
-        currentIdx = i;
-        return newEl;
-    };
+        for (let j = Math.max(0, i - 1); j <= i + 1 && j < chunks.length; j++) {
+            load(chunks[j]);
+        }
+        if (!chunk.tracker) {
+            return undefined;
+        }
+        return chunk.tracker.update(time);
+    }
+
+    return { update, showSegment };
 }
 
 function createGoToCurrentTracker() {
@@ -120,6 +359,69 @@ function createGoToCurrentTracker() {
     };
 }
 
+function createLiveSegmentElement(n, { start, end, text, words }) {
+    // same markup as the template creates for each segment (not compact)
+    const element = document.createElement("div");
+    element.id = `segment/${n}`;
+    element.className = "segment";
+    element.dataset.start = start;
+    element.dataset.end = end;
+
+    const timestampEl = document.createElement("a");
+    timestampEl.className = "timestamp";
+    timestampEl.href = `#segment/${n}`;
+    for (const [className, time] of [["start", start], ["end", end]]) {
+        const timeEl = document.createElement("span");
+        timeEl.className = className;
+        timeEl.textContent = formatTimestamp(time);
+        timestampEl.appendChild(timeEl);
+    }
+
+    const textEl = document.createElement("p");
+    textEl.className = "text";
+    if (words && words.length) {
+        for (const word of words) {
+            const wordEl = document.createElement("span");
+            wordEl.className = "word";
+            wordEl.dataset.start = word.start;
+            wordEl.dataset.end = word.end;
+            wordEl.textContent = word.text;
+            textEl.appendChild(wordEl);
+        }
+    } else {
+        textEl.textContent = text.trim();
+    }
+
+    element.append(timestampEl, textEl);
+    return element;
+}
+
+function subscribeLive(viewportEl, onAppended) {
+    // the page of a transcript still being written, served by 'serve':
+    // its new segments are pushed as Server-Sent Events
+    const liveEl = document.getElementById("transcription-live");
+    if (!liveEl || !window.EventSource || window.location.protocol === "file:") {
+        return;
+    }
+    const dirname = window.location.pathname.replace(/[^/]*$/, "");
+    const jsonl = encodeURIComponent(liveEl.dataset.jsonl);
+    const since = viewportEl.getElementsByClassName("segment").length;
+    const source = new EventSource(
+        `/api/transcript${dirname}${jsonl}/events?since=${since}`,
+    );
+    source.addEventListener("segment", (event) => {
+        const n = Number(event.lastEventId);
+        if (document.getElementById(`segment/${n}`)) {
+            return; // already shown
+        }
+        viewportEl.appendChild(createLiveSegmentElement(n, JSON.parse(event.data)));
+        onAppended();
+    });
+    for (const type of ["finished", "failure"]) {
+        source.addEventListener(type, () => source.close());
+    }
+}
+
 function onLoad() {
     const videoEl = document.getElementById("viewer");
     videoEl.autoplay = true;
@@ -127,15 +429,71 @@ function onLoad() {
     videoEl.preload = "auto";
 
     const goToCurrentTracker = createGoToCurrentTracker();
+    const viewportEl = document.getElementById("transcription");
+
+    viewportEl.addEventListener("click", function seek(clickEvent) {
+        // a single handler for all segments and words
+        for (let el = clickEvent.target; el && el !== viewportEl; el = el.parentNode) {
+            const start = startByElement.get(el);
+            if (start !== undefined) {
+                clickEvent.preventDefault();
+                console.log("seek to:", el.className, start);
+                videoEl.currentTime = start;
+                return;
+            }
+        }
+    });
 
-    const segmentsTracker = createTimeActiveTracker(videoEl, "segment");
-    const wordsTracker = createTimeActiveTracker(videoEl, "word");
+    let tracker;
+    let syncScheduled = false;
 
-    videoEl.ontimeupdate = () => {
-        const time = videoEl.currentTime;
-        segmentsTracker(time);
-        goToCurrentTracker(wordsTracker(time));
-    };
+    function sync() {
+        syncScheduled = false;
+        goToCurrentTracker(tracker.update(videoEl.currentTime));
+    }
+
+    function scheduleSync() {
+        // timeupdate and seeking may fire many times per frame,
+        // the DOM is updated at most once per animation frame
+        if (!syncScheduled) {
+            syncScheduled = true;
+            window.requestAnimationFrame(sync);
+        }
+    }
+
+    if (viewportEl.classList.contains("chunked")) {
+        tracker = createChunkedTracker(viewportEl, scheduleSync);
+
+        const showSegmentFromHash = () => {
+            const m = /^#segment\/(\d+)$/.exec(window.location.hash);
+            if (m) {
+                tracker.showSegment(Number(m[1]));
+            }
+        };
+        window.addEventListener("hashchange", showSegmentFromHash);
+        showSegmentFromHash();
+    } else {
+        const segments = collectTimeEntries(viewportEl, "segment");
+        const segmentEls = viewportEl.getElementsByClassName("segment");
+        const words = (
+            createCompactWords(viewportEl, segmentEls)
+            || collectTimeEntries(viewportEl, "word")
+        );
+        tracker = createTranscriptTracker(segments, words);
+
+        subscribeLive(viewportEl, () => {
+            tracker.clear();
+            tracker = createTranscriptTracker(
+                collectTimeEntries(viewportEl, "segment"),
+                collectTimeEntries(viewportEl, "word"),
+            );
+            scheduleSync();
+        });
+    }
+
+    videoEl.ontimeupdate = scheduleSync;
+    videoEl.onseeking = scheduleSync;
+    scheduleSync();
 }
 
 window.addEventListener("DOMContentLoaded", onLoad);
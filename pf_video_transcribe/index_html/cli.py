@@ -2,6 +2,7 @@ from argparse import _SubParsersAction
 from argparse import ArgumentParser
 from argparse import Namespace
 from argparse import RawTextHelpFormatter
+import textwrap
 
 from .. import log
 from ..html import cli as html_cli
@@ -9,7 +10,8 @@ from ..utils import check_dir_exists
 
 description = """\
 Lists all '.html' in a directory and creates an 'index.html'
-with link to them all.
+with link to each sub directory, which are listed in their own
+'index-N.html' pages (paginated).
 
 This can be used to generate a nice landing page for all generated videos.
 
@@ -21,20 +23,102 @@ be generated automatically.
 def handle_command(args: Namespace) -> None:
     # avoid loading heavy libraries in the command line
     from .work import index_batch
+    from .work import index_watch
 
-    index_batch(
+    index_args = (
         args.directory,
         args.force,
         args.duration_threshold,
         args.thumb_size,
+        args.thumb_fast_seek,
+        args.thumb_widths,
+        args.thumb_formats,
         args.html_head_entry,
         args.stylesheet,
         args.javascript,
+        args.compact,
+        args.chunk_duration,
+        args.precompress,
+        args.page_size,
     )
+    if args.watch:
+        index_watch(
+            *index_args,
+            args.debounce,
+            args.poll_interval,
+            args.poll,
+        )
+    else:
+        index_batch(*index_args)
 
 
 def add_arguments(ap: ArgumentParser) -> None:
     html_cli.add_arguments(ap, False)
+    ap.add_argument(
+        "--page-size",
+        type=int,
+        default=100,
+        help=textwrap.dedent(
+            """\
+            Number of items in each page of a directory listing.
+
+            Use 0 to list all items in a single page.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--watch",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            After indexing, keep watching the directories for new or
+            changed '.jsonl', media and '.html' files. Only the affected
+            files are converted and the index is refreshed.
+
+            Uses inotify if available, otherwise polls for changes.
+        """
+        ),
+    )
+    ap.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help=textwrap.dedent(
+            """\
+            With '--watch', wait until there are no changes for this
+            many seconds, so bursts of changes are handled at once.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--poll",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            With '--watch', poll for changes instead of using inotify.
+            Required for network file systems (ie: NFS), as inotify
+            doesn't see changes done by other hosts.
+        """
+        ),
+    )
+    ap.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help=textwrap.dedent(
+            """\
+            Seconds between checks when polling for changes.
+
+            Default: %(default)s
+        """
+        ),
+    )
     ap.add_argument(
         "directory",
         nargs="+",
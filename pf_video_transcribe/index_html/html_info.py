@@ -1,5 +1,18 @@
+from __future__ import annotations
+
 from html.parser import HTMLParser
+import os
+from typing import Any
+from typing import Mapping
 from typing import NamedTuple
+from typing import Optional
+
+from ..dircache import DirectoryCache
+from ..dircache import get_directory_cache
+
+# pages metadata, written by HTMLConverter and filled by index_html
+MANIFEST_NAME = "pf-video-transcribe-pages"
+MANIFEST_VERSION = 2
 
 
 class HtmlInfo(NamedTuple):
@@ -7,6 +20,21 @@ class HtmlInfo(NamedTuple):
     title: str
     image: str
     video: str
+    # (mime_type, srcset) of the image variants, see ThumbnailConverter
+    image_sources: tuple[tuple[str, str], ...] = ()
+    image_width: int = 0
+    image_height: int = 0
+
+
+# HtmlInfo fields saved in the manifest
+_manifest_fields = (
+    "title",
+    "image",
+    "video",
+    "image_sources",
+    "image_width",
+    "image_height",
+)
 
 
 class HtmlInfoParser(HTMLParser):
@@ -14,6 +42,9 @@ class HtmlInfoParser(HTMLParser):
     title: str
     image: str
     video: str
+    image_sources: list[tuple[str, str]]
+    image_width: int
+    image_height: int
     finished_head: bool
 
     def __init__(self, *, convert_charrefs: bool = True) -> None:
@@ -22,6 +53,9 @@ class HtmlInfoParser(HTMLParser):
         self.title = ""
         self.image = ""
         self.video = ""
+        self.image_sources = []
+        self.image_width = 0
+        self.image_height = 0
         self.finished_head = False
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
@@ -46,8 +80,6 @@ class HtmlInfoParser(HTMLParser):
     def handle_startendtag(
         self, tag: str, attrs_tuple: list[tuple[str, str | None]]
     ) -> None:
-        if self.image and self.video:
-            return
         if tag == "meta":
             attrs = dict(attrs_tuple)
             prop = attrs.get("property")
@@ -60,6 +92,66 @@ class HtmlInfoParser(HTMLParser):
                 self.image = content
             elif prop == "og:video":
                 self.video = content
+            elif prop in ("og:image:width", "og:image:height"):
+                try:
+                    setattr(
+                        self, prop.replace("og:", "").replace(":", "_"), int(content)
+                    )
+                except ValueError:
+                    pass
+            elif prop.startswith("pf:image-srcset:"):
+                mime_type = prop[len("pf:image-srcset:") :]
+                self.image_sources.append((mime_type, content))
+
+
+def get_manifest(dirname: str) -> DirectoryCache:
+    return get_directory_cache(dirname or ".", MANIFEST_NAME, MANIFEST_VERSION)
+
+
+def save_html_info(path: str, info: Mapping[str, Any]) -> None:
+    """Record the page metadata, so it's not parsed by :func:`load_html_info`.
+
+    The ``info`` keys are the :class:`HtmlInfo` fields, except ``path``.
+    """
+    manifest = get_manifest(os.path.dirname(path))
+    manifest.set(os.path.basename(path), {k: info[k] for k in _manifest_fields})
+    manifest.save()
+
+
+def load_html_info(
+    prefix_len: int,
+    path: str,
+    st: Optional[os.stat_result] = None,
+) -> HtmlInfo:
+    """Same as :func:`parse_html_info`, but uses the directory manifest.
+
+    Pages missing from the manifest (or changed since) are parsed and
+    added to it, call ``get_manifest(dirname).save()`` afterwards.
+    """
+    manifest = get_manifest(os.path.dirname(path))
+    name = os.path.basename(path)
+    cached = manifest.get(name, st)
+    if cached is not None:
+        rel_path = path[prefix_len:]
+        return HtmlInfo(
+            path=rel_path,
+            **{
+                **cached,
+                "title": cached["title"] or rel_path,
+                "image_sources": tuple(tuple(s) for s in cached["image_sources"]),
+            },
+        )
+
+    info = parse_html_info(prefix_len, path)
+    manifest.set(
+        name,
+        {
+            **{k: getattr(info, k) for k in _manifest_fields},
+            "title": info.title if info.title != info.path else "",
+        },
+        st,
+    )
+    return info
 
 
 def parse_html_info(prefix_len: int, path: str) -> HtmlInfo:
@@ -76,4 +168,7 @@ def parse_html_info(prefix_len: int, path: str) -> HtmlInfo:
             title=parser.title.strip() or rel_path,
             image=parser.image.strip(),
             video=parser.video.strip(),
+            image_sources=tuple(parser.image_sources),
+            image_width=parser.image_width,
+            image_height=parser.image_height,
         )
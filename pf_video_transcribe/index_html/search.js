@@ -0,0 +1,178 @@
+(() => {
+    "use strict";
+
+    // see pf_video_transcribe/index_html/search.py
+    const formEl = document.getElementById("search");
+    const resultsEl = document.getElementById("search-results");
+    if (!formEl || !resultsEl || !window.fetch) {
+        return;
+    }
+    const inputEl = formEl.querySelector("input[type=search]");
+    const base = formEl.dataset.src;
+    const maxDocs = 20;
+    const maxSegmentsPerDoc = 10;
+
+    function formatTimestamp(seconds) {
+        // same as format_timestamp(decimal_marker=None) used by the templates
+        const total = Math.floor(seconds);
+        const hours = Math.floor(total / 3600);
+        const minutes = Math.floor(total / 60) % 60;
+        const pad = (n) => String(n).padStart(2, "0");
+        const hoursMarker = hours > 0 ? `${pad(hours)}:` : "";
+        return `${hoursMarker}${pad(minutes)}:${pad(total % 60)}`;
+    }
+
+    function normalize(text) {
+        // same as normalize_text() in search.py
+        return text.normalize("NFKD").replace(/\p{M}/gu, "").toLowerCase();
+    }
+
+    function tokenize(text) {
+        return normalize(text).match(/[\p{L}\p{N}_]+/gu) || [];
+    }
+
+    let manifestPromise = null;
+    const shardPromises = new Map();
+
+    function fetchJson(url, options) {
+        return fetch(url, options).then((response) => {
+            if (!response.ok) {
+                throw new Error(`${url}: ${response.status}`);
+            }
+            return response.json();
+        });
+    }
+
+    function loadManifest() {
+        if (!manifestPromise) {
+            // always revalidated, shards are versioned by their hash
+            manifestPromise = fetchJson(`${base}docs.json`, { cache: "no-cache" });
+            manifestPromise.catch(() => {
+                manifestPromise = null;
+            });
+        }
+        return manifestPromise;
+    }
+
+    function loadShard(manifest, prefix) {
+        const hash = manifest.shards[prefix];
+        if (!hash) {
+            return Promise.resolve({});
+        }
+        let promise = shardPromises.get(prefix);
+        if (!promise) {
+            const name = encodeURIComponent(prefix);
+            promise = fetchJson(`${base}${name}.json?h=${hash}`);
+            promise.catch(() => shardPromises.delete(prefix));
+            shardPromises.set(prefix, promise);
+        }
+        return promise;
+    }
+
+    async function findTerm(manifest, term, isPrefix) {
+        // Map of "doc/segment" => [doc, segment, start]
+        const found = new Map();
+        const prefix = term.slice(0, manifest.prefix_length);
+        const shard = await loadShard(manifest, prefix);
+        const matches = (isPrefix && term.length >= manifest.prefix_length)
+            ? Object.keys(shard).filter((key) => key.startsWith(term))
+            : (term in shard ? [term] : []);
+        for (const key of matches) {
+            const postings = shard[key];
+            for (let i = 0; i < postings.length; i += 3) {
+                const posting = postings.slice(i, i + 3);
+                found.set(`${posting[0]}/${posting[1]}`, posting);
+            }
+        }
+        return found;
+    }
+
+    async function search(query) {
+        const terms = tokenize(query);
+        if (!terms.length) {
+            return null;
+        }
+        const manifest = await loadManifest();
+        // the last term is still being typed, unless followed by a space
+        const lastIsPrefix = !/\s$/.test(query);
+        const founds = await Promise.all(terms.map(
+            (term, i) => findTerm(manifest, term, lastIsPrefix && i === terms.length - 1),
+        ));
+
+        // segments with all the terms, by document
+        founds.sort((a, b) => a.size - b.size);
+        const byDoc = new Map();
+        for (const [key, posting] of founds[0]) {
+            if (founds.every((found) => found.has(key))) {
+                const [doc, segment, start] = posting;
+                if (!byDoc.has(doc)) {
+                    byDoc.set(doc, []);
+                }
+                byDoc.get(doc).push({ segment, start });
+            }
+        }
+        return Array.from(byDoc, ([doc, segments]) => ({
+            href: manifest.docs[doc][0],
+            title: manifest.docs[doc][1],
+            segments: segments.sort((a, b) => a.segment - b.segment),
+        })).sort((a, b) => b.segments.length - a.segments.length);
+    }
+
+    function render(results) {
+        resultsEl.replaceChildren();
+        if (results === null) {
+            return;
+        }
+        if (!results.length) {
+            const emptyEl = document.createElement("p");
+            emptyEl.textContent = "No results.";
+            resultsEl.appendChild(emptyEl);
+            return;
+        }
+        const listEl = document.createElement("ul");
+        for (const { href, title, segments } of results.slice(0, maxDocs)) {
+            const itemEl = document.createElement("li");
+            const linkEl = document.createElement("a");
+            linkEl.href = href;
+            linkEl.textContent = `${title} (${segments.length})`;
+            itemEl.appendChild(linkEl);
+            const segmentsEl = document.createElement("span");
+            segmentsEl.className = "index-search-segments";
+            for (const { segment, start } of segments.slice(0, maxSegmentsPerDoc)) {
+                const segmentEl = document.createElement("a");
+                segmentEl.href = `${href}#segment/${segment}`;
+                segmentEl.textContent = formatTimestamp(start);
+                segmentsEl.append(" ", segmentEl);
+            }
+            itemEl.appendChild(segmentsEl);
+            listEl.appendChild(itemEl);
+        }
+        resultsEl.appendChild(listEl);
+    }
+
+    let generation = 0;
+    let timer = null;
+
+    function update() {
+        const current = ++generation;
+        search(inputEl.value).then((results) => {
+            // ignore the results of older queries
+            if (current === generation) {
+                render(results);
+            }
+        }).catch((error) => {
+            console.error("search failed:", error);
+        });
+    }
+
+    inputEl.addEventListener("input", () => {
+        window.clearTimeout(timer);
+        timer = window.setTimeout(update, 200);
+    });
+    formEl.addEventListener("submit", (event) => {
+        event.preventDefault();
+        window.clearTimeout(timer);
+        update();
+    });
+    formEl.hidden = false;
+})();
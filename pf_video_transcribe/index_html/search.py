@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib.resources
+import json
+import logging
+import os
+import re
+from typing import Any
+from typing import Iterator
+from typing import Sequence
+import unicodedata
+
+from termcolor import colored
+
+from .html_info import HtmlInfo
+from ..compress import ENCODING_EXTENSIONS
+from ..compress import get_compressed_filename
+from ..compress import write_compressed
+from ..dircache import get_directory_cache
+from ..jsonl.reader import Reader
+from ..utils import replace_ext
+from ..utils import write_atomic
+
+_logger = logging.getLogger(__name__.replace(".search", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_inf = functools.partial(_logger.log, logging.INFO)
+
+# static files of the search, relative to the index directory
+SEARCH_DIRNAME = "index-search"
+SEARCH_MANIFEST = "docs.json"
+SEARCH_SCRIPT = "search.js"
+SEARCH_VERSION = 1
+# terms are sharded by their first characters, the browser only
+# downloads the shards of the query terms
+SHARD_PREFIX_LEN = 2
+
+# postings of each transcript, so only the changed ones are read again
+_TERMS_CACHE_NAME = "pf-video-transcribe-terms"
+_TERMS_CACHE_VERSION = 1
+
+_word_re = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower case without diacritics, same as ``normalize()`` in search.js."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    return _word_re.findall(normalize_text(text))
+
+
+def get_shard_prefix(term: str) -> str:
+    return term[:SHARD_PREFIX_LEN]
+
+
+def _read_transcript_terms(jsonl_filename: str) -> dict[str, list[float]]:
+    """Postings of each term as flat ``[segment, start, ...]``.
+
+    Segments are numbered from 1, as ``#segment/N`` in the HTML.
+    """
+    terms: dict[str, list[float]] = {}
+    with Reader(jsonl_filename) as reader:
+        for n, segment in enumerate(reader, 1):
+            start = round(segment["start"], 2)
+            for term in sorted(set(tokenize(segment["text"]))):
+                terms.setdefault(term, []).extend((n, start))
+    return terms
+
+
+def get_transcript_terms(jsonl_filename: str) -> dict[str, list[float]]:
+    dirname, name = os.path.split(jsonl_filename)
+    cache = get_directory_cache(dirname, _TERMS_CACHE_NAME, _TERMS_CACHE_VERSION)
+    st = os.stat(jsonl_filename)
+    terms = cache.get(name, st)
+    if terms is None:
+        _dbg("Indexing terms of " + colored(jsonl_filename, "cyan"))
+        terms = _read_transcript_terms(jsonl_filename)
+        cache.set(name, terms, st)
+    return terms
+
+
+def _iter_transcripts(
+    directory: str,
+    pages: Sequence[HtmlInfo],
+) -> Iterator[tuple[HtmlInfo, str]]:
+    for info in pages:
+        jsonl_filename = replace_ext(os.path.join(directory, info.path), "jsonl")
+        if os.path.isfile(jsonl_filename):
+            yield info, jsonl_filename
+
+
+class _SearchManifest:
+    """Documents and shards of the published index (``docs.json``).
+
+    Document ids are kept stable across updates, so shards without
+    changed transcripts keep the same contents and are not written again.
+    Removed documents leave a ``null`` that is reused by new ones.
+    The shard hashes are used by search.js to bypass stale HTTP caches.
+    """
+
+    filename: str
+    docs: list[Any]
+    shards: dict[str, str]
+
+    def __init__(self, dirname: str) -> None:
+        self.filename = os.path.join(dirname, SEARCH_MANIFEST)
+        self.docs = []
+        self.shards = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.filename) as file:
+                data = json.load(file)
+            if data["version"] == SEARCH_VERSION:
+                self.docs = list(data["docs"])
+                self.shards = dict(data["shards"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _dbg(f"Ignoring search manifest {self.filename}: {e}")
+
+    def assign_ids(self, pages: Sequence[HtmlInfo]) -> list[int]:
+        ids_by_path = {doc[0]: i for i, doc in enumerate(self.docs) if doc is not None}
+        paths = {info.path for info in pages}
+        docs: list[Any] = [
+            doc if doc is not None and doc[0] in paths else None for doc in self.docs
+        ]
+        free = (i for i, doc in enumerate(docs) if doc is None)
+        ids = []
+        for info in pages:
+            doc_id = ids_by_path.get(info.path)
+            if doc_id is None:
+                doc_id = next(free, len(docs))
+                if doc_id == len(docs):
+                    docs.append(None)
+            docs[doc_id] = [info.path, info.title]
+            ids.append(doc_id)
+
+        while docs and docs[-1] is None:
+            docs.pop()
+        self.docs = docs
+        return ids
+
+    def tojson(self) -> bytes:
+        data = {
+            "version": SEARCH_VERSION,
+            "prefix_length": SHARD_PREFIX_LEN,
+            "docs": self.docs,
+            "shards": self.shards,
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+
+def _get_shard_filename(dirname: str, prefix: str) -> str:
+    return os.path.join(dirname, f"{prefix}.json")
+
+
+def _get_compressed_filenames(filename: str) -> list[str]:
+    return [get_compressed_filename(filename, e) for e in ENCODING_EXTENSIONS]
+
+
+def _write_if_changed(filename: str, data: bytes) -> bool:
+    try:
+        with open(filename, "rb") as file:
+            if file.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    write_atomic(filename, data)
+    return True
+
+
+def _copy_script(dirname: str) -> str:
+    filename = os.path.join(dirname, SEARCH_SCRIPT)
+    data = importlib.resources.read_binary(__package__, SEARCH_SCRIPT)
+    if _write_if_changed(filename, data):
+        _inf("Created " + colored(filename, "cyan"))
+    return filename
+
+
+def write_search_index(
+    directory: str,
+    pages: Sequence[HtmlInfo],
+    precompress: Sequence[str],
+) -> None:
+    """Write the inverted index of the transcripts of ``pages``.
+
+    Pages are relative to ``directory`` and only those with a sibling
+    ``.jsonl`` are indexed. Each shard maps the terms with the same
+    prefix to their flat postings ``[doc, segment, start, ...]``.
+    Only the changed transcripts are read and only the changed shards
+    are written.
+    """
+    dirname = os.path.join(directory, SEARCH_DIRNAME)
+    os.makedirs(dirname, exist_ok=True)
+
+    transcripts = list(_iter_transcripts(directory, sorted(pages)))
+    manifest = _SearchManifest(dirname)
+    manifest.load()
+    doc_ids = manifest.assign_ids([info for info, _ in transcripts])
+
+    shards: dict[str, dict[str, list[float]]] = {}
+    for doc_id, (_, jsonl_filename) in zip(doc_ids, transcripts):
+        for term, postings in get_transcript_terms(jsonl_filename).items():
+            shard = shards.setdefault(get_shard_prefix(term), {})
+            doc_postings = shard.setdefault(term, [])
+            for i in range(0, len(postings), 2):
+                doc_postings.extend((doc_id, postings[i], postings[i + 1]))
+
+    for jsonl_dirname in {os.path.dirname(f) for _, f in transcripts}:
+        get_directory_cache(
+            jsonl_dirname, _TERMS_CACHE_NAME, _TERMS_CACHE_VERSION
+        ).save()
+
+    written = [_copy_script(dirname)]
+    old_shards = manifest.shards
+    manifest.shards = {}
+    changed = 0
+    for prefix, terms in sorted(shards.items()):
+        data = json.dumps(
+            terms, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+        ).encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        manifest.shards[prefix] = digest
+        filename = _get_shard_filename(dirname, prefix)
+        if old_shards.get(prefix) != digest or not os.path.exists(filename):
+            write_atomic(filename, data)
+            changed += 1
+        written.append(filename)
+
+    for prefix in old_shards.keys() - manifest.shards.keys():
+        filename = _get_shard_filename(dirname, prefix)
+        _dbg("Removing stale search shard " + colored(filename, "yellow"))
+        for path in (filename, *_get_compressed_filenames(filename)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    manifest_filename = manifest.filename
+    written.append(manifest_filename)
+    if _write_if_changed(manifest_filename, manifest.tojson()):
+        _inf(
+            "Saved: "
+            + colored(manifest_filename, "cyan")
+            + f" ({len(transcripts)} transcripts, {len(shards)} shards,"
+            + f" {changed} changed)"
+        )
+    else:
+        _inf("Up to date: " + colored(manifest_filename, "green"))
+
+    if precompress:
+        for filename in written:
+            write_compressed(filename, precompress)
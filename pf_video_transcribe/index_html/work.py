@@ -1,40 +1,86 @@
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 import dataclasses
 import functools
+import hashlib
+import json
 import logging
+from mimetypes import guess_type
 import os
+import re
+from typing import Any
+from typing import Mapping
+from typing import Optional
 from typing import Sequence
 
+from jinja2 import Template
 from termcolor import colored
 
+from .html_info import get_manifest
 from .html_info import HtmlInfo
-from .html_info import parse_html_info
+from .html_info import load_html_info
+from .search import SEARCH_DIRNAME
+from .search import write_search_index
+from ..compress import write_compressed
 from ..converter import AbstractConverter
 from ..html.converter import HTMLConverter
+from ..jsonl.writer import Writer
 from ..templates import get_template
 from ..thumbnail.converter import ThumbnailConverter
 from ..types import Size
+from ..utils import write_atomic
 from ..vtt.converter import VTTConverter
+from ..watch import create_watcher
+from ..watch import iter_changes
 
 
 _logger = logging.getLogger(__name__.replace(".work", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
 _inf = functools.partial(_logger.log, logging.INFO)
+_err = functools.partial(_logger.log, logging.ERROR)
 
+_GROUPS_CACHE_NAME = "pf-video-transcribe-index"
+DEFAULT_PAGE_SIZE = 100
+# paginated group pages, not to be listed in the index itself
+_index_page_re = re.compile(r"^index-(\d+)\.html$")
 
-def collect(directory: str) -> dict[str, set[str]]:
-    collected: dict[str, set[str]] = {}
 
-    for root, dirs, files in os.walk(directory):
-        for dname in tuple(dirs):
-            if dname.startswith("."):
-                dirs.remove(dname)
-        for fname in files:
-            if fname.startswith(".") or fname == "index.html":
+def _scan_dir(dirname: str) -> tuple[list[str], list[str]]:
+    dirs = []
+    files = []
+    with os.scandir(dirname) as it:
+        for entry in it:
+            if entry.name.startswith("."):
                 continue
-            path = os.path.join(root, fname)
-            ext = os.path.splitext(path)[1]
-            collected.setdefault(ext, set()).add(path)
+            if entry.is_dir():
+                if entry.name != SEARCH_DIRNAME:
+                    dirs.append(entry.path)
+            elif entry.name != "index.html" and not _index_page_re.match(entry.name):
+                files.append(entry.path)
+    return dirs, files
+
+
+def collect(directory: str, jobs: int = 8) -> dict[str, set[str]]:
+    """Recursively collect files by extension, skipping hidden files.
+
+    Directories are scanned in parallel, which helps on network file
+    systems where each ``scandir`` is a round trip.
+    """
+    collected: dict[str, set[str]] = {}
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="scan") as pool:
+        pending = {pool.submit(_scan_dir, directory)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirs, files = future.result()
+                pending.update(pool.submit(_scan_dir, d) for d in dirs)
+                for path in files:
+                    ext = os.path.splitext(path)[1]
+                    collected.setdefault(ext, set()).add(path)
 
     return collected
 
@@ -47,61 +93,386 @@ _jsonl_converters: Sequence[type[AbstractConverter]] = (
 
 
 def get_dataclass_field_names(dataclass: type) -> Sequence[str]:
-    return [f.name for f in dataclasses.fields(dataclass) if f.name]
+    return [f.name for f in dataclasses.fields(dataclass) if f.init]
 
 
-def index(
-    directory: str,
+def convert_jsonl(
+    jsonl_filenames: Sequence[str],
     force: bool,
-    duration_threshold: float,
-    size: Size,
-    html_head_entry: list[str],
-    stylesheet: str,
-    javascript: str,
-) -> None:
-    by_ext = collect(directory)
-    jsonl_filenames = tuple(by_ext[".jsonl"])
+    converter_kwargs: Mapping[str, Any],
+    converters: Sequence[type[AbstractConverter]] = _jsonl_converters,
+) -> dict[str, set[str]]:
+    """Run the converters on all files, returns the outputs by extension.
 
-    converter_kwargs = {
-        "duration_threshold": duration_threshold,
-        "size": size,
-        "html_head_entry": html_head_entry,
-        "stylesheet": stylesheet,
-        "javascript": javascript,
-    }
-    for converter_cls in _jsonl_converters:
+    Each converter only gets the ``converter_kwargs`` matching its
+    dataclass fields.
+    """
+    by_ext: dict[str, set[str]] = {}
+    for converter_cls in converters:
         conv_ext = f".{converter_cls.ext}"
         arg_names = get_dataclass_field_names(converter_cls)
         kwargs = {k: converter_kwargs[k] for k in arg_names if k in converter_kwargs}
         for c in converter_cls.batch(jsonl_filenames, force, **kwargs):
             by_ext.setdefault(conv_ext, set()).add(c.filename)
+    return by_ext
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
 
-    html_paths = sorted(by_ext[".html"])
+def _load_groups(
+    directory: str,
+    html_paths: Sequence[str],
+    jobs: int,
+) -> dict[str, list[HtmlInfo]]:
     prefix_len = len(directory + os.path.sep)
+    paths = sorted(html_paths)
+    # stat in parallel, the results validate the manifest entries
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="stat") as pool:
+        stats = list(pool.map(_stat_or_none, paths))
+
     groups: dict[str, list[HtmlInfo]] = {}
-    recent_mtime = 0.0
-    for path in html_paths:
+    for path, st in zip(paths, stats):
+        if st is None:
+            continue
         dname = os.path.dirname(path)
-        groups.setdefault(dname, []).append(parse_html_info(prefix_len, path))
-        mtime = os.stat(path).st_mtime
-        if recent_mtime < mtime:
-            recent_mtime = mtime
+        groups.setdefault(dname, []).append(load_html_info(prefix_len, path, st))
 
-    filename = os.path.join(directory, "index.html")
+    for dname in groups:
+        get_manifest(dname).save()
+    return groups
+
+
+def get_page_filename(dirname: str, page: int) -> str:
+    return os.path.join(dirname, f"index-{page}.html")
+
+
+def _get_group_key(name: str, items: Sequence[HtmlInfo], page_size: int) -> str:
+    data = json.dumps([name, items, page_size], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _paginate(items: Sequence[HtmlInfo], page_size: int) -> list[Sequence[HtmlInfo]]:
+    if page_size <= 0:
+        return [items]
+    return [items[i : i + page_size] for i in range(0, len(items), page_size)]
+
+
+def _remove_stale_pages(dirname: str, pages: int) -> None:
     try:
-        mtime = os.stat(filename).st_mtime
-    except OSError:
-        mtime = 0
-    if mtime > recent_mtime and not force:
-        _inf("Up to date: " + colored(filename, "green"))
-        return
+        entries = list(os.scandir(dirname))
+    except FileNotFoundError:
+        return  # the group directory was removed, with its pages
+    for entry in entries:
+        m = _index_page_re.match(entry.name)
+        if m and int(m.group(1)) > pages:
+            _dbg("Removing stale index page " + colored(entry.path, "yellow"))
+            os.unlink(entry.path)
+
+
+class _GroupsCache:
+    """Summary of each group of the index, in a dotfile.
+
+    Groups are only rendered if their pages metadata changed, the whole
+    cache is invalidated if the templates change.
+    """
+
+    filename: str
+    template_key: list[int]
+    groups: dict[str, dict[str, Any]]
+
+    def __init__(self, directory: str, template_filenames: Sequence[str]) -> None:
+        self.filename = os.path.join(directory, f".{_GROUPS_CACHE_NAME}.json")
+        self.template_key = []
+        for template_filename in template_filenames:
+            st = os.stat(template_filename)
+            self.template_key.extend((st.st_size, st.st_mtime_ns))
+        self.groups = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.filename) as file:
+                data = json.load(file)
+            if data["template"] == self.template_key:
+                self.groups = data["groups"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _dbg(f"Ignoring cache {self.filename}: {e}")
+
+    def save(self, groups: dict[str, dict[str, Any]]) -> None:
+        data = json.dumps(
+            {"template": self.template_key, "groups": groups},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        write_atomic(self.filename, data.encode("utf-8"))
+
 
+def _write_group(
+    directory: str,
+    dirname: str,
+    name: str,
+    items: Sequence[HtmlInfo],
+    page_size: int,
+    tmpl: Template,
+) -> int:
+    """Write the paginated pages of the group, returns the page count.
+
+    The pages are saved in the group directory, so all paths are
+    relative to it.
+    """
+    # pages are in the same directory as the group items
+    items = [info._replace(path=os.path.basename(info.path)) for info in items]
+    pages = _paginate(items, page_size)
+    root = os.path.relpath(os.path.join(directory, "index.html"), dirname)
+    for page, page_items in enumerate(pages, 1):
+        data = tmpl.render(
+            name=name,
+            items=page_items,
+            page=page,
+            pages=len(pages),
+            root=root,
+        )
+        write_atomic(get_page_filename(dirname, page), data.encode("utf-8"))
+
+    _remove_stale_pages(dirname, len(pages))
+    _inf(
+        "Saved: "
+        + colored(get_page_filename(dirname, 1), "cyan")
+        + f" ({len(items)} items, {len(pages)} pages)"
+    )
+    return len(pages)
+
+
+def _get_cover(dirname: str, info: HtmlInfo) -> dict[str, Any]:
+    return {
+        # relative to the landing page
+        "image": os.path.normpath(os.path.join(dirname, info.image)),
+        "width": info.image_width,
+        "height": info.image_height,
+    }
+
+
+def write_index(
+    directory: str,
+    html_paths: Sequence[str],
+    force: bool,
+    precompress: Sequence[str],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    jobs: int = 8,
+) -> None:
+    """Write the landing ``index.html`` and the pages of each group.
+
+    The landing page only lists the groups (directories), each with a
+    cover image. The items of each group are listed in ``index-N.html``
+    inside the group directory, with ``page_size`` items per page.
+
+    The search index of the transcripts is also updated.
+    """
+    groups = _load_groups(directory, html_paths, jobs)
+    write_search_index(
+        directory,
+        [info for items in groups.values() for info in items],
+        precompress,
+    )
+    group_tmpl = get_template("index_group.html.jinja2")
     tmpl = get_template("index.html.jinja2")
-    with open(filename, "w") as out:
-        for chunk in tmpl.generate(groups=sorted(groups.items())):
-            out.write(chunk)
+    template_filenames = [
+        t.filename or ""
+        for t in (get_template("index_base.html.jinja2"), group_tmpl, tmpl)
+    ]
+    cache = _GroupsCache(directory, template_filenames)
+    if not force:
+        cache.load()
+
+    filename = os.path.join(directory, "index.html")
+    summaries: dict[str, dict[str, Any]] = {}
+    changed = force or not os.path.exists(filename)
+    written = [filename]
+    for dirname, items in sorted(groups.items()):
+        name = os.path.relpath(dirname, directory)
+        if name == os.path.curdir:
+            name = os.path.basename(os.path.abspath(directory))
+        key = _get_group_key(name, items, page_size)
+        summary = cache.groups.get(dirname)
+        if (
+            summary is None
+            or summary["key"] != key
+            or not os.path.exists(get_page_filename(dirname, 1))
+        ):
+            pages = _write_group(directory, dirname, name, items, page_size, group_tmpl)
+            cover = next((info for info in items if info.image), None)
+            summary = {
+                "key": key,
+                "name": name,
+                "href": os.path.relpath(get_page_filename(dirname, 1), directory),
+                "count": len(items),
+                "pages": pages,
+                "cover": _get_cover(os.path.relpath(dirname, directory), cover)
+                if cover
+                else None,
+            }
+            changed = True
+        summaries[dirname] = summary
+        written.extend(
+            get_page_filename(dirname, p) for p in range(1, summary["pages"] + 1)
+        )
+
+    for dirname in cache.groups.keys() - summaries.keys():
+        # removed groups
+        _remove_stale_pages(dirname, 0)
+        changed = True
+
+    if not changed:
+        _inf("Up to date: " + colored(filename, "green"))
+    else:
+        data = tmpl.render(
+            groups=list(summaries.values()),
+            search_src=f"{SEARCH_DIRNAME}/",
+        )
+        write_atomic(filename, data.encode("utf-8"))
+        cache.save(summaries)
+        _inf("Saved: " + colored(filename, "cyan"))
+
+    if precompress:
+        for page_filename in written:
+            write_compressed(page_filename, precompress)
+
+
+def _is_index_page(path: str) -> bool:
+    name = os.path.basename(path)
+    return name == "index.html" or bool(_index_page_re.match(name))
+
+
+def _is_media(path: str) -> bool:
+    mime_type = guess_type(path)[0] or ""
+    return mime_type.startswith(("video/", "audio/"))
+
+
+def _index(
+    directory: str,
+    force: bool,
+    converter_kwargs: Mapping[str, Any],
+    precompress: Sequence[str],
+    page_size: int,
+) -> set[str]:
+    by_ext = collect(directory)
+    jsonl_filenames = tuple(by_ext.get(".jsonl", ()))
+    converted = convert_jsonl(jsonl_filenames, force, converter_kwargs)
+    for conv_ext, filenames in converted.items():
+        by_ext.setdefault(conv_ext, set()).update(filenames)
 
-    _inf("Saved: " + colored(filename, "cyan"))
+    html_paths = by_ext.get(".html", set())
+    write_index(directory, tuple(html_paths), force, precompress, page_size)
+    return html_paths
+
+
+def _index_changes(
+    directory: str,
+    changed: set[str],
+    html_paths: set[str],
+    converter_kwargs: Mapping[str, Any],
+    precompress: Sequence[str],
+    page_size: int,
+) -> None:
+    """Only convert the changed files and refresh the index if needed.
+
+    ``html_paths`` is updated with the added and removed pages.
+    """
+    jsonl_filenames = set()
+    html_changed = False
+    for path in changed:
+        ext = os.path.splitext(path)[1]
+        exists = os.path.isfile(path)
+        if ext == ".jsonl":
+            if exists:
+                jsonl_filenames.add(path)
+        elif ext == ".html":
+            if _is_index_page(path):
+                continue
+            if exists:
+                html_paths.add(path)
+            else:
+                html_paths.discard(path)
+            html_changed = True
+        elif _is_media(path):
+            # thumbnails depend on the media
+            jsonl_filename = Writer.create_output_name(path)
+            if os.path.isfile(jsonl_filename):
+                jsonl_filenames.add(jsonl_filename)
+
+    if jsonl_filenames:
+        converted = convert_jsonl(sorted(jsonl_filenames), False, converter_kwargs)
+        html_paths.update(converted.get(".html", ()))
+        html_changed = True
+
+    if html_changed:
+        write_index(directory, tuple(html_paths), False, precompress, page_size)
+
+
+def _get_converter_kwargs(
+    duration_threshold: float,
+    size: Size,
+    fast_seek: int,
+    variant_widths: Sequence[int],
+    variant_formats: Sequence[str],
+    html_head_entry: list[str],
+    stylesheet: str,
+    javascript: str,
+    compact: bool,
+    chunk_duration: float,
+    precompress: Sequence[str],
+) -> dict[str, Any]:
+    return {
+        "duration_threshold": duration_threshold,
+        "size": size,
+        "fast_seek": fast_seek,
+        "variant_widths": variant_widths,
+        "variant_formats": variant_formats,
+        "html_head_entry": html_head_entry,
+        "stylesheet": stylesheet,
+        "javascript": javascript,
+        "compact": compact,
+        "chunk_duration": chunk_duration,
+        "precompress": precompress,
+    }
+
+
+def index(
+    directory: str,
+    force: bool,
+    duration_threshold: float,
+    size: Size,
+    fast_seek: int,
+    variant_widths: Sequence[int],
+    variant_formats: Sequence[str],
+    html_head_entry: list[str],
+    stylesheet: str,
+    javascript: str,
+    compact: bool,
+    chunk_duration: float,
+    precompress: Sequence[str],
+    page_size: int,
+) -> None:
+    converter_kwargs = _get_converter_kwargs(
+        duration_threshold,
+        size,
+        fast_seek,
+        variant_widths,
+        variant_formats,
+        html_head_entry,
+        stylesheet,
+        javascript,
+        compact,
+        chunk_duration,
+        precompress,
+    )
+    _index(directory, force, converter_kwargs, precompress, page_size)
 
 
 def index_batch(
@@ -109,17 +480,98 @@ def index_batch(
     force: bool,
     duration_threshold: float,
     size: Size,
+    fast_seek: int,
+    variant_widths: Sequence[int],
+    variant_formats: Sequence[str],
     html_head_entry: list[str],
     stylesheet: str,
     javascript: str,
+    compact: bool,
+    chunk_duration: float,
+    precompress: Sequence[str],
+    page_size: int,
 ) -> None:
+    converter_kwargs = _get_converter_kwargs(
+        duration_threshold,
+        size,
+        fast_seek,
+        variant_widths,
+        variant_formats,
+        html_head_entry,
+        stylesheet,
+        javascript,
+        compact,
+        chunk_duration,
+        precompress,
+    )
     for d in directories:
-        index(
-            d,
-            force,
-            duration_threshold,
-            size,
-            html_head_entry,
-            stylesheet,
-            javascript,
-        )
+        _index(d, force, converter_kwargs, precompress, page_size)
+
+
+def index_watch(
+    directories: Sequence[str],
+    force: bool,
+    duration_threshold: float,
+    size: Size,
+    fast_seek: int,
+    variant_widths: Sequence[int],
+    variant_formats: Sequence[str],
+    html_head_entry: list[str],
+    stylesheet: str,
+    javascript: str,
+    compact: bool,
+    chunk_duration: float,
+    precompress: Sequence[str],
+    page_size: int,
+    debounce: float,
+    poll_interval: float,
+    force_polling: bool,
+) -> None:
+    """Index the directories, then keep them updated as files change.
+
+    Only the changed ``.jsonl`` (or the ones of changed media) are
+    converted and the index is only refreshed if pages changed.
+    """
+    converter_kwargs = _get_converter_kwargs(
+        duration_threshold,
+        size,
+        fast_seek,
+        variant_widths,
+        variant_formats,
+        html_head_entry,
+        stylesheet,
+        javascript,
+        compact,
+        chunk_duration,
+        precompress,
+    )
+    html_by_dir = {
+        d: _index(d, force, converter_kwargs, precompress, page_size)
+        for d in directories
+    }
+
+    watcher = create_watcher(directories, poll_interval, force_polling)
+    _inf("Watching: " + colored(", ".join(directories), "cyan"))
+    try:
+        for changed in iter_changes(watcher, debounce):
+            for d, html_paths in html_by_dir.items():
+                prefix = os.path.join(d, "")
+                dir_changed = {p for p in changed if p.startswith(prefix)}
+                if not dir_changed:
+                    continue
+                try:
+                    _index_changes(
+                        d,
+                        dir_changed,
+                        html_paths,
+                        converter_kwargs,
+                        precompress,
+                        page_size,
+                    )
+                except Exception as e:
+                    # keep watching, the next change may fix it
+                    _err("Could not update " + colored(d, "red") + f": {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -64,10 +64,11 @@ class Writer:
         media_filename: str,
         info: HeaderInfoJson,
         merge_threshold: float,
+        filename: Optional[str] = None,  # instead of the media ".jsonl"
     ) -> None:
         self.media_filename = os.path.basename(media_filename)
         self.merge_threshold = merge_threshold
-        self.filename = self.create_output_name(media_filename)
+        self.filename = filename or self.create_output_name(media_filename)
         self._segment = None
         self._file = open(self.filename, "w")
         self._write_header(info)
@@ -0,0 +1,112 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import textwrap
+
+from .. import log
+from ..utils import check_file_exists
+
+description = """\
+Loads media files and generate web optimized MP4 derivatives.
+
+The "NAME.web.mp4" is a remux with the index (moov atom) at the
+beginning of the file (faststart), so browsers start playing before
+downloading all of it. Streams are copied whenever possible.
+
+Optionally a low bitrate "NAME.preview.mp4" is encoded as well.
+
+The HTML generated afterwards will use them as the first video sources,
+keeping the original as fallback.
+
+NOTE: this converter relies on ffmpeg being installed.
+"""
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .converter import OptimizeConverter
+
+    OptimizeConverter.batch(
+        args.file,
+        args.force,
+        preview_height=args.preview_height,
+        preview_bitrate=args.preview_bitrate,
+    )
+
+
+def add_arguments(ap: ArgumentParser, add_files: bool = True) -> None:
+    ap.add_argument(
+        "--preview-height",
+        type=int,
+        default=0,
+        help=textwrap.dedent(
+            """\
+            Also encode a "NAME.preview.mp4" with this maximum height,
+            such as 360.
+
+            Default: %(default)s (disabled)
+        """
+        ),
+    )
+    ap.add_argument(
+        "--preview-bitrate",
+        default="600k",
+        help=textwrap.dedent(
+            """\
+            Maximum video bitrate of the preview.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "-f",
+        "--force",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            Force regeneration of existing files.
+
+            By default, if the generated file timestamp (mtime) is newer than the
+            source (media), then it will be skipped.
+        """
+        ),
+    )
+    if add_files:
+        ap.add_argument(
+            "file",
+            nargs="+",
+            help="media or jsonl file to be processed",
+            type=check_file_exists,
+        )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "optimize",
+        help="Create web optimized MP4 (faststart) of the given media file",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
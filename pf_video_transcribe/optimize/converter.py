@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import KW_ONLY
+import functools
+import logging
+from typing import Any
+from typing import Sequence
+
+import ffmpeg
+from termcolor import colored
+
+from ..converter import AbstractConverter
+from ..probe import MediaInfo
+from ..probe import probe
+from ..probe import probe_or_none
+from ..thumbnail.converter import get_media_filename
+from ..utils import needs_generate
+from ..utils import replace_ext
+
+_logger = logging.getLogger(__name__.replace(".converter", ""))
+_inf = functools.partial(_logger.log, logging.INFO)
+_err = functools.partial(_logger.log, logging.ERROR)
+
+# codecs that browsers play from MP4, these are copied as is
+MP4_VIDEO_CODECS = frozenset(("h264", "av1", "vp9"))
+MP4_AUDIO_CODECS = frozenset(("aac", "mp3", "opus"))
+
+# browsers only play 8-bit 4:2:0 H.264
+_h264_kwargs = {"vcodec": "libx264", "preset": "veryfast", "pix_fmt": "yuv420p"}
+
+
+def get_video_kwargs(info: MediaInfo) -> dict[str, Any]:
+    if info.video_codec in MP4_VIDEO_CODECS:
+        return {"vcodec": "copy"}
+    return {**_h264_kwargs, "crf": 20}
+
+
+def get_audio_kwargs(info: MediaInfo) -> dict[str, Any]:
+    if info.audio_codec in MP4_AUDIO_CODECS:
+        return {"acodec": "copy"}
+    return {"acodec": "aac", "b:a": "192k"}
+
+
+@dataclass
+class OptimizeConverter(AbstractConverter):
+    """Web optimized MP4 derivatives of the media.
+
+    ``NAME.web.mp4`` is a remux with the ``moov`` atom at the beginning
+    (``+faststart``), so browsers can start playing before downloading
+    the whole file. Streams are copied whenever browsers support their
+    codecs in MP4, otherwise they are encoded.
+
+    If ``preview_height`` is given, ``NAME.preview.mp4`` is encoded in the
+    same run with that maximum height and ``preview_bitrate``, to be used
+    on slow links and as the ``og:video``.
+    """
+
+    ext = "web.mp4"
+    logger = _inf
+
+    _: KW_ONLY
+    preview_height: int = 0
+    preview_bitrate: str = "600k"
+    # media is already compressed
+    precompress: Sequence[str] = field(default=(), init=False)
+
+    def __init__(
+        self,
+        input_filename: str,
+        force: bool,
+        preview_height: int = 0,
+        preview_bitrate: str = "600k",
+    ) -> None:
+        self.preview_height = preview_height
+        self.preview_bitrate = preview_bitrate
+        super().__init__(get_media_filename(input_filename), force)
+
+    @classmethod
+    def create_preview_name(cls, input_filename: str) -> str:
+        return replace_ext(input_filename, "preview.mp4")
+
+    def _needs_generate(self) -> bool:
+        if super()._needs_generate():
+            return True
+        if not self.preview_height or not needs_generate(
+            self.input_filename,
+            self.create_preview_name(self.input_filename),
+        ):
+            return False
+        # audio only media have no preview, see generate()
+        info = probe_or_none(self.input_filename)
+        return info is None or info.has_video
+
+    def generate(self) -> None:
+        info = probe(self.input_filename)
+        source = ffmpeg.input(self.input_filename)
+        streams = []
+        kwargs: dict[str, Any] = {"movflags": "+faststart"}
+        if info.has_video:
+            streams.append(source["v:0"])
+            kwargs.update(get_video_kwargs(info))
+        if info.has_audio:
+            streams.append(source["a:0"])
+            kwargs.update(get_audio_kwargs(info))
+        if not streams:
+            raise ValueError(f"no audio or video streams: {self.input_filename}")
+
+        outputs = [ffmpeg.output(*streams, self.filename, **kwargs)]
+        if self.preview_height > 0 and info.has_video:
+            outputs.append(self._get_preview_output(source, info))
+
+        pipeline = (
+            ffmpeg.merge_outputs(*outputs).overwrite_output().global_args("-v", "error")
+        )
+        try:
+            pipeline.run(capture_stdout=True, capture_stderr=True)
+        except ffmpeg.Error as e:
+            _err(
+                "Could not generate: "
+                + colored(self.filename, "red")
+                + f" (from: {self.input_filename}): "
+                + colored(e.stderr.decode(), "red")
+            )
+            raise
+
+    def _get_preview_output(self, source: ffmpeg.Stream, info: MediaInfo) -> Any:
+        video = source["v:0"].filter("scale", -2, f"min(ih,{self.preview_height})")
+        streams = [video]
+        kwargs: dict[str, Any] = {
+            **_h264_kwargs,
+            "crf": 28,
+            "maxrate": self.preview_bitrate,
+            "bufsize": self.preview_bitrate,
+            "movflags": "+faststart",
+        }
+        if info.has_audio:
+            streams.append(source["a:0"])
+            kwargs.update({"acodec": "aac", "b:a": "96k"})
+        preview_filename = self.create_preview_name(self.input_filename)
+        _inf("Encoding preview: " + colored(preview_filename, "cyan"))
+        return ffmpeg.output(*streams, preview_filename, **kwargs)
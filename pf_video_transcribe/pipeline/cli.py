@@ -0,0 +1,122 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import textwrap
+
+from .. import log
+from ..html import cli as html_cli
+from ..transcribe import cli as transcribe_cli
+from ..utils import check_dir_exists
+from ..utils import check_file_exists
+
+description = """\
+Transcribe media files and convert each of them to WebVTT, SRT,
+thumbnail and HTML as soon as its transcription finishes.
+
+The conversions run in a separate worker pool while the next file is
+being transcribed, so the first pages are published before the whole
+batch is transcribed. If '--index' is given, that directory 'index.html'
+is refreshed whenever a page is generated.
+
+This is the same as running 'transcribe', then 'srt' and 'html', but
+overlapping the cheap conversions with the heavy transcription.
+"""
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .work import pipeline
+
+    pipeline(
+        args.file,
+        args.force,
+        args.language,
+        args.merge_threshold,
+        args.local,
+        args.acceleration_device,
+        args.vad_threshold,
+        args.vad_min_speech_duration,
+        args.vad_min_silence_duration,
+        args.vad_speech_pad,
+        args.min_speech,
+        args.word_timestamps,
+        args.duration_threshold,
+        args.thumb_size,
+        args.thumb_fast_seek,
+        args.thumb_widths,
+        args.thumb_formats,
+        args.html_head_entry,
+        args.stylesheet,
+        args.javascript,
+        args.compact,
+        args.chunk_duration,
+        args.precompress,
+        args.index,
+        args.jobs,
+    )
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    transcribe_cli.add_model_arguments(ap)
+    transcribe_cli.add_word_timestamps_argument(ap)
+    html_cli.add_arguments(ap, False)
+    ap.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=2,
+        help=textwrap.dedent(
+            """\
+            Number of files to be converted in parallel while the
+            transcription runs.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--index",
+        type=check_dir_exists,
+        help=textwrap.dedent(
+            """\
+            Refresh the 'index.html' of this directory whenever a page is
+            generated. See the 'index_html' command.
+        """
+        ),
+    )
+    ap.add_argument(
+        "file",
+        nargs="+",
+        help="media file to be processed",
+        type=check_file_exists,
+    )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "pipeline",
+        help="Transcribe media files and convert them as soon as possible",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+import os.path
+import threading
+from typing import Any
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+
+from termcolor import colored
+
+from ..converter import AbstractConverter
+from ..html.converter import HTMLConverter
+from ..index_html.work import collect
+from ..index_html.work import convert_jsonl
+from ..index_html.work import write_index
+from ..srt.converter import SRTConverter
+from ..thumbnail.converter import ThumbnailConverter
+from ..transcribe.vad import create_vad_options
+from ..transcribe.work import filter_transcribable
+from ..transcribe.work import get_model_loader
+from ..transcribe.work import transcribe
+from ..types import Size
+from ..vtt.converter import VTTConverter
+
+_logger = logging.getLogger(__name__.replace(".work", ""))
+_inf = functools.partial(_logger.log, logging.INFO)
+_err = functools.partial(_logger.log, logging.ERROR)
+
+_jsonl_converters: Sequence[type[AbstractConverter]] = (
+    VTTConverter,
+    SRTConverter,
+    ThumbnailConverter,
+    HTMLConverter,
+)
+
+
+def _convert(
+    jsonl_filename: str,
+    force: bool,
+    converter_kwargs: Mapping[str, Any],
+    index_directory: Optional[str],
+    index_lock: threading.Lock,
+    html_paths: set[str],
+) -> None:
+    converted = convert_jsonl(
+        (jsonl_filename,), force, converter_kwargs, _jsonl_converters
+    )
+    if not index_directory:
+        return
+
+    # other pages may be finishing at the same time, refresh one at a time
+    with index_lock:
+        for path in converted.get(".html", ()):
+            relpath = os.path.relpath(path, index_directory)
+            if not relpath.startswith(os.pardir):
+                # same form as collected, see write_index()
+                html_paths.add(os.path.join(index_directory, relpath))
+        write_index(
+            index_directory,
+            tuple(html_paths),
+            False,
+            converter_kwargs["precompress"],
+        )
+
+
+def pipeline(
+    files: Sequence[str],
+    force: bool,
+    language: Optional[str],
+    merge_threshold: float,
+    local: bool,
+    acceleration_device: str,
+    vad_threshold: float,
+    vad_min_speech_duration: float,
+    vad_min_silence_duration: float,
+    vad_speech_pad: float,
+    min_speech: float,
+    word_timestamps: bool,
+    duration_threshold: float,
+    size: Size,
+    fast_seek: int,
+    variant_widths: Sequence[int],
+    variant_formats: Sequence[str],
+    html_head_entry: list[str],
+    stylesheet: str,
+    javascript: str,
+    compact: bool,
+    chunk_duration: float,
+    precompress: Sequence[str],
+    index_directory: Optional[str],
+    jobs: int,
+) -> None:
+    converter_kwargs = {
+        "duration_threshold": duration_threshold,
+        "size": size,
+        "fast_seek": fast_seek,
+        "variant_widths": variant_widths,
+        "variant_formats": variant_formats,
+        "html_head_entry": html_head_entry,
+        "stylesheet": stylesheet,
+        "javascript": javascript,
+        "compact": compact,
+        "chunk_duration": chunk_duration,
+        "precompress": precompress,
+    }
+    index_lock = threading.Lock()
+    failed: list[str] = []
+
+    def on_done(jsonl_filename: str, future: Future) -> None:
+        exc = future.exception()
+        if exc is not None:
+            failed.append(jsonl_filename)
+            _err(
+                "Could not convert: "
+                + colored(jsonl_filename, "red")
+                + ": "
+                + colored(str(exc), "red")
+            )
+
+    files = filter_transcribable(files)
+    if not files:
+        return
+
+    # collected once, the converted pages are added as they are done
+    html_paths = (
+        set(collect(index_directory).get(".html", ())) if index_directory else set()
+    )
+    vad_options = create_vad_options(
+        vad_threshold, vad_min_speech_duration, vad_min_silence_duration, vad_speech_pad
+    )
+    get_model = get_model_loader(local, acceleration_device)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="convert") as pool:
+        for filename in files:
+            jsonl_filename = transcribe(
+                get_model,
+                filename,
+                force,
+                language,
+                merge_threshold,
+                precompress,
+                vad_options,
+                min_speech,
+                word_timestamps,
+            )
+            future = pool.submit(
+                _convert,
+                jsonl_filename,
+                force,
+                converter_kwargs,
+                index_directory,
+                index_lock,
+                html_paths,
+            )
+            future.add_done_callback(functools.partial(on_done, jsonl_filename))
+        _inf("Transcriptions finished, waiting for the conversions...")
+
+    if failed:
+        _err(f"Failed to convert {len(failed)} of {len(files)} files")
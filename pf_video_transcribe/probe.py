@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+from mimetypes import guess_type
+import os.path
+from typing import Any
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+import ffmpeg
+from termcolor import colored
+
+from .dircache import DirectoryCache
+from .dircache import get_directory_cache
+
+_logger = logging.getLogger(__name__)
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_wrn = functools.partial(_logger.log, logging.WARNING)
+
+CACHE_NAME = "pf-video-transcribe-probe"
+CACHE_VERSION = 1
+
+# codecs that are valid RFC 6381 strings as is, others (ie: avc1, mp4a)
+# need profile and level that would be guessed, better not to tell
+_simple_codecs = frozenset(("vp8", "vp9", "opus", "vorbis"))
+
+
+class MediaInfo(NamedTuple):
+    duration: float
+    format_name: str
+    has_audio: bool
+    has_video: bool
+    width: int
+    height: int
+    video_codec: str
+    audio_codec: str
+
+
+def _parse_probe(data: dict[str, Any]) -> MediaInfo:
+    video: dict[str, Any] = {}
+    audio: dict[str, Any] = {}
+    for stream in data.get("streams", ()):
+        codec_type = stream.get("codec_type")
+        # attached pictures (ie: album covers) are not videos
+        disposition = stream.get("disposition", {})
+        if codec_type == "video" and not video and not disposition.get("attached_pic"):
+            video = stream
+        elif codec_type == "audio" and not audio:
+            audio = stream
+
+    fmt = data.get("format", {})
+    return MediaInfo(
+        duration=float(fmt.get("duration") or video.get("duration") or 0),
+        format_name=fmt.get("format_name", ""),
+        has_audio=bool(audio),
+        has_video=bool(video),
+        width=int(video.get("width", 0)),
+        height=int(video.get("height", 0)),
+        video_codec=video.get("codec_name", ""),
+        audio_codec=audio.get("codec_name", ""),
+    )
+
+
+def _get_cache(filename: str) -> DirectoryCache:
+    return get_directory_cache(
+        os.path.dirname(filename) or ".",
+        CACHE_NAME,
+        CACHE_VERSION,
+    )
+
+
+def probe(filename: str, save: bool = True) -> MediaInfo:
+    """Probe the media with ``ffprobe``, results are cached per directory.
+
+    The cache is invalidated when the file size or mtime change.
+
+    :raises ffmpeg.Error: if the file could not be probed.
+    :raises OSError: if ``ffprobe`` could not be executed.
+    """
+    cache = _get_cache(filename)
+    name = os.path.basename(filename)
+    cached = cache.get(name)
+    if cached is not None:
+        return MediaInfo(**cached)
+
+    _dbg("Probing " + colored(filename, "cyan"))
+    info = _parse_probe(ffmpeg.probe(filename))
+    cache.set(name, info._asdict())
+    if save:
+        cache.save()
+    return info
+
+
+def probe_or_none(filename: str, save: bool = True) -> Optional[MediaInfo]:
+    """Same as :func:`probe`, but logs and returns None on errors."""
+    try:
+        return probe(filename, save)
+    except ffmpeg.Error as e:
+        _wrn(
+            "Could not probe: "
+            + colored(filename, "red")
+            + ": "
+            + colored(e.stderr.decode(), "red")
+        )
+    except OSError as e:
+        # usually ffprobe is not installed
+        _dbg(f"Could not probe {filename}: {e}")
+    return None
+
+
+def probe_batch(
+    filenames: Sequence[str],
+    jobs: int = 4,
+) -> dict[str, Optional[MediaInfo]]:
+    """Probe all files in parallel, saving each directory cache once."""
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="probe") as pool:
+        infos = dict(
+            zip(
+                filenames,
+                pool.map(functools.partial(probe_or_none, save=False), filenames),
+            )
+        )
+    for cache in {_get_cache(f) for f in filenames}:
+        cache.save()
+    return infos
+
+
+def get_mime_type(filename: str) -> Optional[str]:
+    """MIME type to be used in ``<source type="...">``.
+
+    Audio only containers that share extension with videos (ie: ``.mp4``,
+    ``.webm``) are reported as ``audio/``, the codecs are added if they
+    are known to be valid as is. Falls back to the extension if the media
+    can't be probed.
+    """
+    mime_type = guess_type(filename)[0]
+    info = probe_or_none(filename)
+    if not mime_type or info is None:
+        return mime_type
+
+    kind, subtype = mime_type.split("/", 1)
+    if kind == "video" and not info.has_video and info.has_audio:
+        mime_type = f"audio/{subtype}"
+
+    codecs = [c for c in (info.video_codec, info.audio_codec) if c]
+    if codecs and all(c in _simple_codecs for c in codecs):
+        mime_type += f'; codecs="{",".join(codecs)}"'
+    return mime_type
@@ -0,0 +1,100 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import textwrap
+
+from .. import log
+from ..catalog import cli as catalog_cli
+
+description = """\
+Searches the transcriptions added by the 'catalog' command, printing
+the best ranked segments with the media path, the time of the first
+matching word and a snippet of the text.
+
+All words must match, case and diacritics are ignored. Use '--raw'
+to use the SQLite FTS5 query syntax, such as prefixes ('cach*'),
+'OR' and 'NEAR()'.
+"""
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .work import search_print
+
+    search_print(
+        args.database,
+        " ".join(args.query),
+        args.limit,
+        args.raw,
+        args.json,
+    )
+
+
+def parse_limit(s: str) -> int:
+    limit = int(s)
+    if limit < 1:
+        raise ValueError(f"must be at least 1: {limit}")
+    return limit
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    catalog_cli.add_database_argument(ap)
+    ap.add_argument(
+        "-n",
+        "--limit",
+        type=parse_limit,
+        default=20,
+        help="Maximum number of results. Default: %(default)s",
+    )
+    ap.add_argument(
+        "--raw",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            The query is given as is to SQLite FTS5, see
+            https://www.sqlite.org/fts5.html#full_text_query_syntax
+        """
+        ),
+    )
+    ap.add_argument(
+        "--json",
+        default=False,
+        action="store_true",
+        help="Print one JSON object per result (JSON Lines)",
+    )
+    ap.add_argument(
+        "query",
+        nargs="+",
+        help="words to search",
+    )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "search",
+        help="Search the transcriptions in the catalog database",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
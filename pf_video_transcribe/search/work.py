@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+from typing import NamedTuple
+from typing import Optional
+
+from termcolor import colored
+
+from ..catalog.database import connect
+from ..index_html.search import normalize_text
+from ..index_html.search import tokenize
+from ..utils import format_timestamp
+
+_logger = logging.getLogger(__name__.replace(".work", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+# around the matches in SearchHit.snippet, replaced by the presentation
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+_SNIPPET_TOKENS = 16
+
+# not terms in the FTS5 query syntax
+_fts_operators = ("and", "or", "not", "near")
+
+# a term in the FTS5 query syntax, matching as a prefix if followed by "*"
+_raw_term_re = re.compile(r"(\w+)(\*?)")
+
+
+class SearchHit(NamedTuple):
+    # paths are relative to the database directory
+    media: str
+    jsonl: str
+    segment: int  # 1-based, as "#segment/N" in the HTML
+    start: float  # of the first matching word, if known
+    end: float
+    snippet: str
+    rank: float
+
+
+def create_match_query(query: str, raw: bool) -> str:
+    """FTS5 query, unless ``raw`` all terms are quoted (implicit AND)."""
+    if raw:
+        return query
+    return " ".join(f'"{term}"' for term in tokenize(query))
+
+
+def _get_query_terms(query: str, raw: bool) -> list[tuple[str, bool]]:
+    """Terms of the query, and if they match as a prefix (``term*``)."""
+    if not raw:
+        return [(term, False) for term in tokenize(query)]
+    return [
+        (m[1], bool(m[2]))
+        for m in _raw_term_re.finditer(normalize_text(query))
+        if m[1] not in _fts_operators
+    ]
+
+
+def _find_word_start(
+    conn: sqlite3.Connection,
+    segment_id: int,
+    terms: list[tuple[str, bool]],
+) -> Optional[float]:
+    rows = conn.execute(
+        "SELECT start, text FROM words WHERE segment_id = ? ORDER BY start",
+        (segment_id,),
+    )
+    for start, text in rows:
+        words = tokenize(text)
+        if any(
+            w.startswith(term) if prefix else w == term
+            for w in words
+            for term, prefix in terms
+        ):
+            return start
+    return None
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int,
+    raw: bool = False,
+) -> list[SearchHit]:
+    """Best ranked (BM25) segments matching the query.
+
+    The start is refined to the first matching word, so players seek
+    straight to it instead of the segment start.
+    """
+    match = create_match_query(query, raw)
+    if not match:
+        return []
+
+    rows = conn.execute(
+        "SELECT s.id, t.media, t.jsonl, s.number, s.start, s.end,"
+        " snippet(segments_fts, 0, ?, ?, '…', ?), segments_fts.rank"
+        " FROM segments_fts"
+        " JOIN segments AS s ON s.id = segments_fts.rowid"
+        " JOIN transcripts AS t ON t.id = s.transcript_id"
+        " WHERE segments_fts MATCH ?"
+        " ORDER BY segments_fts.rank"
+        " LIMIT ?",
+        (SNIPPET_START, SNIPPET_END, _SNIPPET_TOKENS, match, limit),
+    ).fetchall()
+
+    terms = _get_query_terms(query, raw)
+    hits = []
+    for segment_id, media, jsonl, number, start, end, snippet, rank in rows:
+        word_start = _find_word_start(conn, segment_id, terms) if terms else None
+        hits.append(
+            SearchHit(
+                media=media,
+                jsonl=jsonl,
+                segment=number,
+                start=start if word_start is None else word_start,
+                end=end,
+                snippet=snippet,
+                rank=rank,
+            )
+        )
+    return hits
+
+
+def _highlight(snippet: str) -> str:
+    text = ""
+    for part in " ".join(snippet.split()).split(SNIPPET_START):
+        match, sep, rest = part.partition(SNIPPET_END)
+        text += colored(match, "yellow", attrs=["bold"]) + rest if sep else part
+    return text
+
+
+def strip_markers(snippet: str) -> str:
+    return snippet.replace(SNIPPET_START, "").replace(SNIPPET_END, "")
+
+
+def _format_hit(root: str, hit: SearchHit) -> str:
+    media = os.path.relpath(os.path.join(root, hit.media))
+    return (
+        colored(media, "cyan")
+        + " "
+        + colored(format_timestamp(hit.start), "green")
+        + f" #segment/{hit.segment}: "
+        + _highlight(hit.snippet)
+    )
+
+
+def search_print(
+    database: str,
+    query: str,
+    limit: int,
+    raw: bool,
+    as_json: bool,
+) -> None:
+    root = os.path.dirname(os.path.abspath(database))
+    try:
+        conn = connect(database, readonly=True)
+    except sqlite3.OperationalError as e:
+        # missing or unreadable database
+        raise SystemExit(f"could not open {database}: {e}") from e
+    except ValueError as e:
+        # unsupported catalog version
+        raise SystemExit(str(e)) from e
+    try:
+        hits = search(conn, query, limit, raw)
+    except sqlite3.OperationalError as e:
+        # usually an invalid FTS5 query syntax with --raw
+        raise SystemExit(f"search failed: {e}") from e
+    finally:
+        conn.close()
+
+    _dbg(f"Found {len(hits)} hits for {create_match_query(query, raw)!r}")
+    for hit in hits:
+        if as_json:
+            data = hit._asdict()
+            data["media"] = os.path.relpath(os.path.join(root, hit.media))
+            data["jsonl"] = os.path.relpath(os.path.join(root, hit.jsonl))
+            data["snippet"] = strip_markers(hit.snippet)
+            print(json.dumps(data, ensure_ascii=False))
+        else:
+            print(_format_hit(root, hit))
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import random
+import sys
+import time
+from typing import Optional
+
+from termcolor import colored
+
+_logger = logging.getLogger(__name__.replace(".access_log", ""))
+_inf = functools.partial(_logger.log, logging.INFO)
+
+# JSON lines, without the level and the colors of the other loggers
+_json_logger = logging.getLogger(__name__.replace(".access_log", ".access"))
+
+ACCESS_LOG_FORMATS = ("color", "json", "off")
+
+
+class AccessLog:
+    """Log of the served requests: colored, JSON lines or nothing.
+
+    Only a ``sample`` (ratio) of the successful requests are logged, so
+    logging doesn't cost much under load; errors (4xx and 5xx) are
+    always logged.
+    """
+
+    log_format: str
+    sample: float
+
+    def __init__(self, log_format: str = "color", sample: float = 1.0) -> None:
+        if log_format not in ACCESS_LOG_FORMATS:
+            raise ValueError(f"Invalid access log format {log_format!r}")
+        self.log_format = log_format
+        self.sample = sample
+        if log_format == "json" and not _json_logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _json_logger.addHandler(handler)
+            _json_logger.setLevel(logging.INFO)
+            _json_logger.propagate = False
+
+    def log(
+        self,
+        address: str,
+        requestline: str,
+        status: int,
+        size: Optional[int],
+        duration: float,
+        route: str,
+    ) -> None:
+        if self.log_format == "off":
+            return
+        if status < 400 and self.sample < 1.0 and random.random() >= self.sample:
+            return
+        if self.log_format == "json":
+            self._log_json(address, requestline, status, size, duration, route)
+        else:
+            self._log_color(address, requestline, status, size)
+
+    @staticmethod
+    def _log_color(
+        address: str,
+        requestline: str,
+        status: int,
+        size: Optional[int],
+    ) -> None:
+        code_str = str(status)
+        code_color = "green"
+        if code_str[0] in ("4", "5"):
+            code_color = "red"
+
+        _inf(
+            colored(address, "blue")
+            + " "
+            + colored(requestline, "cyan")
+            + " "
+            + colored(code_str, code_color)
+            + " "
+            + colored("-" if size is None else str(size), "cyan")
+        )
+
+    def _log_json(
+        self,
+        address: str,
+        requestline: str,
+        status: int,
+        size: Optional[int],
+        duration: float,
+        route: str,
+    ) -> None:
+        record = {
+            "time": round(time.time(), 3),
+            "client": address,
+            "request": requestline,
+            "route": route,
+            "status": status,
+            "bytes": size,
+            "duration_ms": round(duration * 1000, 3),
+        }
+        if self.sample < 1.0:
+            record["sample"] = self.sample
+        _json_logger.info(json.dumps(record, ensure_ascii=False))
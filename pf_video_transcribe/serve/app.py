@@ -0,0 +1,826 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from dataclasses import field
+import datetime
+from email.message import Message
+import email.utils
+import functools
+import html
+from http import HTTPStatus
+import json
+import logging
+import math
+import mimetypes
+import os
+import posixpath
+import sqlite3
+import stat
+from typing import Any
+from typing import BinaryIO
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
+from typing import Protocol
+from typing import Sequence
+import urllib.parse
+
+from termcolor import colored
+
+from .access_log import AccessLog
+from .cache import make_etag
+from .cache import MemoryCache
+from .limits import Lease
+from .limits import Limiter
+from .limits import RETRY_AFTER
+from .live import LiveTranscripts
+from .metrics import CacheStats
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .metrics import Metrics
+from .ranges import ByteRange
+from .ranges import MultipartRanges
+from .ranges import parse_range
+from .render import Renderer
+from .transcript import get_summary
+from .transcript import get_window
+from .transcript import get_word_at
+from .transcript import TimeIndexes
+from ..catalog.database import connect
+from ..compress import ENCODING_EXTENSIONS
+from ..compress import get_compressed_filename
+from ..search.work import search
+from ..search.work import SNIPPET_END
+from ..search.work import SNIPPET_START
+from ..utils import replace_ext
+
+_logger = logging.getLogger(__name__.replace(".app", ""))
+_wrn = functools.partial(_logger.log, logging.WARNING)
+
+_TRANSCRIPT_API = "/api/transcript/"
+_TRANSCRIPT_LIMIT = 1000
+
+# same as SimpleHTTPRequestHandler.extensions_map
+_extensions_map = {
+    ".gz": "application/gzip",
+    ".Z": "application/octet-stream",
+    ".bz2": "application/x-bzip2",
+    ".xz": "application/x-xz",
+}
+
+
+@dataclass
+class Request:
+    method: str
+    target: str  # path and query, as in the request line
+    headers: Message
+    client: str = ""  # IP address
+
+
+class Stream(Protocol):
+    """Body of unknown length, such as a generator.
+
+    It may also be an asynchronous iterator, so the asyncio engine
+    waits for it without blocking a thread (ie: :class:`EventStream`).
+    """
+
+    def __iter__(self) -> Iterator[bytes]:
+        ...
+
+    def __next__(self) -> bytes:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+@dataclass
+class Response:
+    """Response of :class:`App`, written by the server engines.
+
+    The body is a sequence of parts, each is some bytes followed by the
+    optional range of ``file``, so engines can send the file ranges
+    without copying them (ie: ``sendfile()``). Then the ``stream``, if
+    any, of unknown length: sent as it's generated, chunked (HTTP/1.1) or
+    until the connection is closed (HTTP/1.0). The file ranges are
+    throttled by the ``lease``, if any. The response must be closed to
+    release the file, the stream and the lease.
+    """
+
+    status: HTTPStatus
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    parts: Sequence[tuple[bytes, Optional[ByteRange]]] = ()
+    file: Optional[BinaryIO] = None
+    stream: Optional[Stream] = None
+    lease: Optional[Lease] = None
+
+    @property
+    def content_length(self) -> int:
+        return sum(len(data) + (r.length if r else 0) for data, r in self.parts)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self.lease is not None:
+            self.lease.release()
+            self.lease = None
+
+
+def _parse_accept_encoding(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        params = params.strip().replace(" ", "")
+        if not name or params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name)
+    return accepted
+
+
+def _to_url(root: str, directory: str, path: str) -> Optional[str]:
+    # path relative to root (catalog directory) => URL path in directory
+    relpath = os.path.relpath(os.path.join(root, path), directory)
+    if relpath.startswith(os.pardir):
+        return None
+    return "/" + urllib.parse.quote(relpath.replace(os.sep, "/"))
+
+
+def _format_snippet_html(snippet: str) -> str:
+    return (
+        html.escape(snippet)
+        .replace(SNIPPET_START, "<mark>")
+        .replace(SNIPPET_END, "</mark>")
+    )
+
+
+def guess_type(path: str) -> str:
+    ext = os.path.splitext(path)[1]
+    if ext in _extensions_map:
+        return _extensions_map[ext]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def format_date(timestamp: float) -> str:
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def _parse_etags(header: str) -> list[str]:
+    # weak comparison (RFC 7232, section 2.3.2), the "W/" are ignored
+    return [
+        etag.strip().removeprefix("W/") for etag in header.split(",") if etag.strip()
+    ]
+
+
+def _is_not_modified(headers: Message, fs: os.stat_result, etag: str) -> bool:
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        # takes precedence over If-Modified-Since (RFC 7232, section 6)
+        etags = _parse_etags(if_none_match)
+        return "*" in etags or etag in etags
+
+    # most of this code is similar to send_head() handling files:
+    if "If-Modified-Since" not in headers:
+        return False
+
+    # compare If-Modified-Since and time of last file modification
+    try:
+        ims = email.utils.parsedate_to_datetime(headers["If-Modified-Since"])
+    except (TypeError, IndexError, OverflowError, ValueError):
+        # ignore ill-formed values
+        return False
+
+    if ims and ims.tzinfo is None:
+        # obsolete format with no timezone, cf.
+        # https://tools.ietf.org/html/rfc7231#section-7.1.1.1
+        ims = ims.replace(tzinfo=datetime.timezone.utc)
+    if ims and ims.tzinfo is datetime.timezone.utc:
+        # compare to UTC datetime of last modification
+        last_modif = datetime.datetime.fromtimestamp(fs.st_mtime, datetime.timezone.utc)
+        # remove microseconds, like in If-Modified-Since
+        last_modif = last_modif.replace(microsecond=0)
+        return last_modif <= ims
+
+    return False
+
+
+def _is_if_range_fresh(headers: Message, fs: os.stat_result, etag: str) -> bool:
+    # the Range is ignored (whole file is sent) if If-Range doesn't match
+    if_range = headers.get("If-Range")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False  # strong comparison, weak tags never match
+    if if_range.startswith('"'):
+        return if_range == etag
+    try:
+        date = email.utils.parsedate_to_datetime(if_range)
+    except (TypeError, IndexError, OverflowError, ValueError):
+        return False
+    return int(date.timestamp()) == int(fs.st_mtime)
+
+
+def _get_float_param(params: dict[str, list[str]], name: str, default: float) -> float:
+    """Raises ValueError with a message for the client, not Python's."""
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = float(values[0])
+    except ValueError:
+        value = math.nan
+    if math.isnan(value):
+        raise ValueError(f"invalid {name}")
+    return value
+
+
+def _get_int_param(params: dict[str, list[str]], name: str, default: int) -> int:
+    """Same as :func:`_get_float_param`, for integers."""
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise ValueError(f"invalid {name}") from None
+
+
+def _invalid_transcript_response(jsonl: str) -> Response:
+    # the file is broken, not the request; the details are in the log
+    _wrn("Invalid transcript: " + colored(jsonl, "red"), exc_info=True)
+    return json_response(
+        HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "invalid transcript"}
+    )
+
+
+def error_response(status: HTTPStatus, message: str = "") -> Response:
+    message = message or status.phrase
+    body = (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f"<title>{status.value} {html.escape(status.phrase)}</title></head>"
+        f"<body><h1>{status.value} {html.escape(message)}</h1></body></html>\n"
+    ).encode("utf-8")
+    return Response(
+        status,
+        [
+            ("Content-Type", "text/html; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+        ],
+        [(body, None)],
+    )
+
+
+def json_response(status: HTTPStatus, data: Any) -> Response:
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return Response(
+        status,
+        [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+            ("Cache-Control", "no-cache"),
+        ],
+        [(body, None)],
+    )
+
+
+class App:
+    """The HTTP application, independent of the server engine.
+
+    Serves the files of ``directory`` with Range requests (required by
+    browsers to implement video seek) and precompressed files. With a
+    catalog database, ``/api/search?q=...`` searches it. The segments of
+    a transcript are queried by time with ``/api/transcript/PATH``, see
+    :class:`TimeIndexes`, and the new ones are pushed to the subscribers
+    of ``/api/transcript/PATH/events``. With a renderer,
+    missing ``.vtt``, ``.srt`` and ``.html`` are rendered from their
+    ``.jsonl``.
+
+    Files have strong entity tags (see :func:`make_etag`) for
+    ``If-None-Match`` and ``If-Range``, ``cache_control`` maps their
+    extension (or ``*`` for the others) to ``Cache-Control``. Small files
+    are kept in ``hot_cache`` and served without reading the disk again.
+    Files sent from the disk (ie: video ranges) are streams of the
+    ``limiter``, if any, that shapes their bandwidth.
+
+    The engines report the served requests to :meth:`request_finished`,
+    counted in ``metrics`` (exposed on ``metrics_path``, if any) and
+    written to ``access_log``.
+    """
+
+    directory: str
+    catalog: Optional[str]
+    renderer: Optional[Renderer]
+    transcripts: TimeIndexes
+    live: LiveTranscripts
+    cache_control: Mapping[str, str]
+    hot_cache: Optional[MemoryCache]
+    metrics: Metrics
+    metrics_path: Optional[str]
+    access_log: AccessLog
+    limiter: Optional[Limiter]
+
+    def __init__(
+        self,
+        directory: str,
+        catalog: Optional[str] = None,
+        renderer: Optional[Renderer] = None,
+        cache_control: Mapping[str, str] = {},
+        hot_cache: Optional[MemoryCache] = None,
+        metrics_path: Optional[str] = "/metrics",
+        access_log: Optional[AccessLog] = None,
+        limiter: Optional[Limiter] = None,
+    ) -> None:
+        self.directory = directory
+        self.catalog = catalog
+        self.renderer = renderer
+        self.cache_control = cache_control
+        self.hot_cache = hot_cache
+        self.transcripts = TimeIndexes()
+        self.live = LiveTranscripts(self.transcripts)
+        self.metrics = Metrics()
+        self.metrics_path = metrics_path
+        self.access_log = access_log or AccessLog()
+        self.limiter = limiter
+
+    def translate_path(self, path: str) -> str:
+        # same as SimpleHTTPRequestHandler.translate_path()
+        path = path.split("?", 1)[0]
+        path = path.split("#", 1)[0]
+        trailing_slash = path.rstrip().endswith("/")
+        try:
+            path = urllib.parse.unquote(path, errors="surrogatepass")
+        except UnicodeDecodeError:
+            path = urllib.parse.unquote(path)
+        path = posixpath.normpath(path)
+        result = self.directory
+        for word in filter(None, path.split("/")):
+            if os.path.dirname(word) or word in (os.curdir, os.pardir):
+                # Ignore components that are not a simple file/directory name
+                continue
+            result = os.path.join(result, word)
+        if trailing_slash:
+            result += "/"
+        return result
+
+    def handle(self, request: Request) -> Response:
+        response = self._handle(request)
+        if self.limiter is not None and response.file is not None:
+            lease = self.limiter.acquire(request.client)
+            if lease is None:
+                response.close()
+                response = error_response(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "Too many streams"
+                )
+                response.headers.append(("Retry-After", str(RETRY_AFTER)))
+            else:
+                response.lease = lease
+        return response
+
+    def _handle(self, request: Request) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return error_response(
+                HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({request.method!r})"
+            )
+
+        url = urllib.parse.urlsplit(request.target)
+        if url.path == self.metrics_path:
+            return self._metrics()
+        if url.path == "/api/search" and self.catalog:
+            return self._search(urllib.parse.parse_qs(url.query))
+        if url.path.startswith(_TRANSCRIPT_API):
+            return self._transcript(url, request.headers)
+
+        path = self.translate_path(request.target)
+        if os.path.isdir(path):
+            if not url.path.endswith("/"):
+                # redirect browser - doing basically what apache does
+                location = urllib.parse.urlunsplit(url._replace(path=url.path + "/"))
+                return Response(
+                    HTTPStatus.MOVED_PERMANENTLY,
+                    [("Location", location), ("Content-Length", "0")],
+                )
+            for index in ("index.html", "index.htm"):
+                index_path = os.path.join(path, index)
+                if os.path.isfile(index_path):
+                    path = index_path
+                    break
+            else:
+                return self._list_directory(path, url.path)
+
+        if path.endswith("/"):
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+        if self.renderer is not None and not os.path.exists(path):
+            response = self._render(request, path, self.renderer)
+            if response is not None:
+                return response
+        if "Range" not in request.headers:
+            response = self._precompressed(request, path)
+            if response is not None:
+                return response
+        return self._file(request, path)
+
+    def get_route(self, target: str) -> str:
+        """Label of the requests to ``target`` in the metrics.
+
+        The API endpoints or the extension of the files, only the known
+        ones, so clients can't create many series.
+        """
+        path = urllib.parse.urlsplit(target).path
+        if path == self.metrics_path:
+            return "metrics"
+        if path == "/api/search":
+            return "search"
+        if path.startswith(_TRANSCRIPT_API):
+            for action in ("summary", "word", "events"):
+                if path.endswith("/" + action):
+                    return f"transcript_{action}"
+            return "transcript"
+        if path.endswith("/"):
+            return "directory"
+        ext = posixpath.splitext(path)[1].lower()
+        if ext in mimetypes.types_map or ext in _extensions_map:
+            return ext[1:]
+        return "other"
+
+    def request_finished(
+        self,
+        address: str,
+        requestline: str,
+        request: Request,
+        status: int,
+        size: Optional[int],
+        duration: float,
+    ) -> None:
+        """Count and log a request, once its response is sent.
+
+        ``size`` is the body sent, None if it wasn't (ie: ``HEAD``).
+        ``duration`` is in seconds, since the request was read.
+        """
+        route = self.get_route(request.target)
+        method = request.method if request.method in ("GET", "HEAD") else "other"
+        self.metrics.request_finished(route, method, status, size or 0, duration)
+        self.access_log.log(address, requestline, status, size, duration, route)
+
+    def request_rejected(self, address: str, requestline: str, status: int) -> None:
+        """Count and log a request the engine answered (ie: malformed)."""
+        self.metrics.request_rejected(status)
+        self.access_log.log(address, requestline, status, None, 0.0, "-")
+
+    def _metrics(self) -> Response:
+        caches: dict[str, CacheStats] = {"time_index": self.transcripts}
+        if self.hot_cache is not None:
+            caches["hot"] = self.hot_cache
+        if self.renderer is not None:
+            caches["render"] = self.renderer.cache
+        body = self.metrics.format(caches).encode("utf-8")
+        return Response(
+            HTTPStatus.OK,
+            [
+                ("Content-Type", METRICS_CONTENT_TYPE),
+                ("Content-Length", str(len(body))),
+                ("Cache-Control", "no-cache"),
+            ],
+            [(body, None)],
+        )
+
+    def _search(self, params: dict[str, list[str]]) -> Response:
+        catalog = self.catalog
+        assert catalog is not None
+        query = " ".join(params.get("q", ()))
+        try:
+            # SQLite doesn't limit negative values
+            limit = max(1, min(int(params.get("limit", ["20"])[0]), 100))
+        except ValueError:
+            return json_response(HTTPStatus.BAD_REQUEST, {"error": "invalid limit"})
+
+        root = os.path.dirname(os.path.abspath(catalog))
+        directory = os.path.abspath(self.directory)
+        try:
+            conn = connect(catalog, readonly=True)
+            try:
+                hits = search(conn, query, limit)
+            finally:
+                conn.close()
+        except (ValueError, sqlite3.OperationalError) as e:
+            # wrong schema version, missing or locked file
+            return json_response(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)})
+
+        results = []
+        for hit in hits:
+            media = _to_url(root, directory, hit.media)
+            if media is None:
+                continue  # not served
+            page = os.path.splitext(hit.jsonl)[0] + ".html"
+            page_url = _to_url(root, directory, page)
+            if not os.path.isfile(os.path.join(root, page)):
+                page_url = None
+            results.append(
+                {
+                    "media": media,
+                    "page": page_url,
+                    "segment": hit.segment,
+                    "start": hit.start,
+                    "end": hit.end,
+                    "snippet": _format_snippet_html(hit.snippet),
+                }
+            )
+        return json_response(HTTPStatus.OK, {"query": query, "hits": results})
+
+    def _transcript(
+        self,
+        url: urllib.parse.SplitResult,
+        headers: Message,
+    ) -> Response:
+        # /api/transcript/PATH?from=T0&to=T1[&words=0][&limit=N]
+        # /api/transcript/PATH/summary
+        # /api/transcript/PATH/word?t=T
+        # /api/transcript/PATH/events[?since=N] (Server-Sent Events)
+        path = url.path[len(_TRANSCRIPT_API) - 1 :]
+        action = ""
+        for suffix in ("/summary", "/word", "/events"):
+            if path.endswith(suffix):
+                path = path[: -len(suffix)]
+                action = suffix[1:]
+        params = urllib.parse.parse_qs(url.query)
+
+        jsonl = replace_ext(self.translate_path(path), "jsonl")
+        if action == "events":
+            return self._events(jsonl, params, headers)
+        try:
+            t = _get_float_param(params, "t", 0.0)
+            start = _get_float_param(params, "from", 0.0)
+            end = _get_float_param(params, "to", math.inf)
+            limit = _get_int_param(params, "limit", _TRANSCRIPT_LIMIT)
+        except ValueError as e:
+            return json_response(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        words = params.get("words", ["1"])[0] not in ("0", "false")
+
+        try:
+            f = open(jsonl, "rb")
+        except OSError:
+            return json_response(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        try:
+            try:
+                index = self.transcripts.get(jsonl, f)
+            except ValueError:
+                return _invalid_transcript_response(jsonl)
+            if action == "summary":
+                return json_response(HTTPStatus.OK, get_summary(index))
+            elif action == "word":
+                return json_response(HTTPStatus.OK, get_word_at(index, f, t))
+            data = get_window(
+                index, f, start, end, max(0, min(limit, _TRANSCRIPT_LIMIT)), words
+            )
+            return json_response(HTTPStatus.OK, data)
+        finally:
+            f.close()
+
+    def _events(
+        self,
+        jsonl: str,
+        params: dict[str, list[str]],
+        headers: Message,
+    ) -> Response:
+        # the segments after "since" (count), EventSource reconnects with
+        # the id of the last received event, which is also a count
+        since = headers.get("Last-Event-ID") or params.get("since", ["0"])[0]
+        try:
+            count = int(since)
+        except ValueError:
+            return json_response(HTTPStatus.BAD_REQUEST, {"error": "invalid since"})
+        try:
+            stream = self.live.subscribe(jsonl, count)
+        except OSError:
+            return json_response(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        except ValueError:
+            return _invalid_transcript_response(jsonl)
+        return Response(
+            HTTPStatus.OK,
+            [
+                ("Content-Type", "text/event-stream; charset=utf-8"),
+                ("Cache-Control", "no-cache"),
+                ("X-Accel-Buffering", "no"),  # nginx: don't buffer the events
+            ],
+            stream=stream,
+        )
+
+    def _list_directory(self, path: str, url_path: str) -> Response:
+        try:
+            names = sorted(os.listdir(path), key=lambda a: a.lower())
+        except OSError:
+            return error_response(
+                HTTPStatus.NOT_FOUND, "No permission to list directory"
+            )
+
+        title = html.escape(f"Directory listing for {urllib.parse.unquote(url_path)}")
+        lines = [
+            "<!DOCTYPE html>",
+            "<html>",
+            '<head><meta charset="utf-8">',
+            f"<title>{title}</title></head>",
+            f"<body><h1>{title}</h1><hr><ul>",
+        ]
+        for name in names:
+            display = name + ("/" if os.path.isdir(os.path.join(path, name)) else "")
+            href = urllib.parse.quote(display, errors="surrogatepass")
+            lines.append(f'<li><a href="{href}">{html.escape(display)}</a></li>')
+        lines.append("</ul><hr></body></html>\n")
+        body = "\n".join(lines).encode("utf-8", "surrogateescape")
+        return Response(
+            HTTPStatus.OK,
+            [
+                ("Content-Type", "text/html; charset=utf-8"),
+                ("Content-Length", str(len(body))),
+            ],
+            [(body, None)],
+        )
+
+    def _get_validators(
+        self,
+        path: str,
+        fs: os.stat_result,
+        etag: str,
+    ) -> list[tuple[str, str]]:
+        # also sent with "304 Not Modified"
+        headers = [("ETag", etag), ("Last-Modified", format_date(fs.st_mtime))]
+        ext = os.path.splitext(path)[1].lower()
+        cache_control = self.cache_control.get(ext, self.cache_control.get("*"))
+        if cache_control:
+            headers.append(("Cache-Control", cache_control))
+        return headers
+
+    def _open(
+        self,
+        path: str,
+    ) -> tuple[os.stat_result, Optional[bytes], Optional[BinaryIO]]:
+        """Stat and contents of ``path``: the bytes (hot) or the opened file.
+
+        Raises OSError if the file can't be opened.
+        """
+        cache = self.hot_cache
+        if cache is not None:
+            fs = os.stat(path)
+            data = cache.get(path, fs)
+            if data is not None:
+                return fs, data, None
+
+        f = open(path, "rb")
+        try:
+            fs = os.fstat(f.fileno())
+            if not stat.S_ISREG(fs.st_mode):
+                raise IsADirectoryError(path)
+            if cache is None or not 0 < fs.st_size <= cache.max_entry_size:
+                return fs, None, f
+            data = f.read()
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+        if len(data) == fs.st_size:  # not modified while reading
+            cache.set(path, fs, data)
+        return fs, data, None
+
+    def _render(
+        self,
+        request: Request,
+        path: str,
+        renderer: Renderer,
+    ) -> Optional[Response]:
+        ctype = guess_type(path)
+        data = renderer.get_resource(path)
+        if data is not None:
+            return Response(
+                HTTPStatus.OK,
+                [("Content-Type", ctype), ("Content-Length", str(len(data)))],
+                [(data, None)],
+            )
+
+        jsonl = renderer.get_source(path)
+        if jsonl is None:
+            return None
+        try:
+            fs = os.stat(jsonl)
+        except OSError:
+            return None
+        # the rendered file changes with the jsonl, but their tags differ
+        ext = os.path.splitext(path)[1]
+        headers = self._get_validators(path, fs, make_etag(fs, ext))
+        if _is_not_modified(request.headers, fs, headers[0][1]):
+            return Response(HTTPStatus.NOT_MODIFIED, headers)
+
+        headers.append(("Content-Type", f"{ctype}; charset=utf-8"))
+        data = renderer.cache.get(path, fs)
+        if data is not None:
+            headers.append(("Content-Length", str(len(data))))
+            return Response(HTTPStatus.OK, headers, [(data, None)])
+        return Response(HTTPStatus.OK, headers, stream=renderer.render(path, jsonl, fs))
+
+    def _precompressed(self, request: Request, path: str) -> Optional[Response]:
+        # serve "file.gz" or "file.br" created by --precompress, if they are
+        # accepted by the client and not older than the original file
+        accepted = _parse_accept_encoding(request.headers.get("Accept-Encoding", ""))
+        for encoding in ENCODING_EXTENSIONS:
+            if encoding not in accepted:
+                continue
+            try:
+                fs, data, f = self._open(get_compressed_filename(path, encoding))
+            except OSError:
+                continue
+
+            try:
+                is_outdated = fs.st_mtime < os.stat(path).st_mtime
+            except OSError:
+                is_outdated = True
+            if is_outdated:
+                if f is not None:
+                    f.close()
+                continue
+
+            # the compressed file has its own inode, thus its own tag
+            headers = self._get_validators(path, fs, make_etag(fs))
+            headers.append(("Vary", "Accept-Encoding"))
+            if _is_not_modified(request.headers, fs, headers[0][1]):
+                if f is not None:
+                    f.close()
+                return Response(HTTPStatus.NOT_MODIFIED, headers)
+
+            headers.extend(
+                (
+                    ("Content-Type", guess_type(path)),
+                    ("Content-Encoding", encoding),
+                    ("Content-Length", str(fs.st_size)),
+                )
+            )
+            if data is not None:
+                return Response(HTTPStatus.OK, headers, [(data, None)])
+            return Response(
+                HTTPStatus.OK, headers, [(b"", ByteRange(0, fs.st_size - 1))], f
+            )
+
+        return None
+
+    def _file(self, request: Request, path: str) -> Response:
+        # Range requests (RFC 7233): "start-end", "start-" and "-suffix",
+        # multiple ranges are sent as multipart/byteranges
+        try:
+            fs, data, f = self._open(path)
+        except OSError:
+            return error_response(HTTPStatus.NOT_FOUND, "File not found")
+
+        try:
+            size = fs.st_size
+            etag = make_etag(fs)
+            validators = self._get_validators(path, fs, etag)
+            # Use browser cache if possible
+            if _is_not_modified(request.headers, fs, etag):
+                if f is not None:
+                    f.close()
+                return Response(HTTPStatus.NOT_MODIFIED, validators)
+
+            ranges = None
+            range_header = request.headers.get("Range")
+            if range_header and _is_if_range_fresh(request.headers, fs, etag):
+                ranges = parse_range(range_header, size)
+
+            if ranges == []:
+                if f is not None:
+                    f.close()
+                return Response(
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    [("Content-Range", f"bytes */{size}"), ("Content-Length", "0")],
+                )
+        except BaseException:
+            if f is not None:
+                f.close()
+            raise
+
+        ctype = guess_type(path)
+        response = Response(HTTPStatus.PARTIAL_CONTENT, file=f)
+        parts: list[tuple[bytes, Optional[ByteRange]]]
+        if ranges is None:
+            response.status = HTTPStatus.OK
+            response.headers.append(("Content-Type", ctype))
+            parts = [(b"", ByteRange(0, size - 1))]
+        elif len(ranges) == 1:
+            response.headers.append(("Content-Type", ctype))
+            response.headers.append(("Content-Range", ranges[0].content_range(size)))
+            parts = [(b"", ranges[0])]
+        else:
+            multipart = MultipartRanges(ranges, ctype, size)
+            response.headers.append(("Content-Type", multipart.content_type))
+            parts = list(multipart)
+        if data is not None:
+            # hot file: the ranges are sliced from memory
+            parts = [
+                (header + data[r.start : r.end + 1], None) if r else (header, None)
+                for header, r in parts
+            ]
+        response.parts = parts
+        response.headers.append(("Content-Length", str(response.content_length)))
+        response.headers.append(("Accept-Ranges", "bytes"))
+        response.headers.extend(validators)
+        return response
@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import asyncio
+import email.parser
+import email.utils
+import functools
+from http import HTTPStatus
+import http.client
+import logging
+import time
+from typing import AsyncIterator
+from typing import BinaryIO
+from typing import Optional
+
+from termcolor import colored
+
+from .app import App
+from .app import error_response
+from .app import Request
+from .app import Response
+from .app import Stream
+from .limits import Lease
+from .limits import THROTTLE_CHUNK_SIZE
+from .ranges import ByteRange
+
+_logger = logging.getLogger(__name__.replace(".asyncio_server", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_inf = functools.partial(_logger.log, logging.INFO)
+_err = functools.partial(_logger.log, logging.ERROR)
+
+_SERVER = "pf-video-transcribe"
+_COPY_BUFSIZE = 256 * 1024
+# the request line and each header line must fit the StreamReader limit
+_LINE_LIMIT = 64 * 1024
+_MAX_HEADERS = 100
+_MAX_BODY = 1024 * 1024
+_HEADERS_TIMEOUT = 10.0
+
+
+class _BadRequest(Exception):
+    status: HTTPStatus
+
+    def __init__(self, status: HTTPStatus, message: str = "") -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+@functools.lru_cache(maxsize=2)
+def _format_date(now: int) -> str:
+    return email.utils.formatdate(now, usegmt=True)
+
+
+class AsyncioServer:
+    """HTTP/1.1 server with persistent connections (keep-alive).
+
+    A single thread serves all connections. File ranges are streamed
+    with ``loop.sendfile()`` (zero copy, with backpressure), while the
+    App itself (which may block on stat, open or sqlite) runs in the
+    default executor. At most ``max_concurrency`` requests are handled at
+    once, connections beyond ``max_connections`` get
+    ``503 Service Unavailable``, and idle connections are closed after
+    ``keepalive_timeout`` seconds.
+    """
+
+    app: App
+    use_sendfile: bool
+    max_connections: int
+    max_concurrency: int
+    keepalive_timeout: float
+    connections: int
+    _semaphore: asyncio.Semaphore
+
+    def __init__(
+        self,
+        app: App,
+        use_sendfile: bool = True,
+        max_connections: int = 1024,
+        max_concurrency: int = 256,
+        keepalive_timeout: float = 15.0,
+    ) -> None:
+        self.app = app
+        self.use_sendfile = use_sendfile
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+        self.connections = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        peer = writer.get_extra_info("peername")
+        address = str(peer[0]) if peer else "-"
+        if self.connections >= self.max_connections:
+            _dbg(
+                colored(address, "blue") + " " + colored("too many connections", "red")
+            )
+            self.app.request_rejected(
+                address, "-", HTTPStatus.SERVICE_UNAVAILABLE.value
+            )
+            response = error_response(HTTPStatus.SERVICE_UNAVAILABLE)
+            response.headers.append(("Retry-After", "1"))
+            await self._close_with(writer, response)
+            return
+
+        self.connections += 1
+        self.app.metrics.connection_opened()
+        try:
+            await self._serve_requests(address, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            self.app.metrics.connection_closed()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _close_with(
+        self,
+        writer: asyncio.StreamWriter,
+        response: Response,
+    ) -> None:
+        try:
+            await self._send(writer, "GET", "HTTP/1.1", response, False)
+        except ConnectionError:
+            pass
+        finally:
+            response.close()
+            writer.close()
+
+    async def _serve_requests(
+        self,
+        address: str,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        keep_alive = True
+        while keep_alive:
+            try:
+                line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+            except asyncio.TimeoutError:
+                return
+            except ValueError:  # line too long
+                line = b"?"
+            if not line:
+                return  # closed by the client
+            if line in (b"\r\n", b"\n"):
+                continue  # RFC 7230, section 3.5: ignore leading empty lines
+
+            requestline = line.decode("latin-1").rstrip("\r\n")
+            try:
+                method, target, version = self._parse_request_line(requestline)
+                headers = await asyncio.wait_for(
+                    self._read_headers(reader), _HEADERS_TIMEOUT
+                )
+                keep_alive = self._wants_keep_alive(version, headers)
+                await self._discard_body(reader, headers)
+            except (_BadRequest, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", HTTPStatus.REQUEST_TIMEOUT)
+                self.app.request_rejected(address, requestline, status.value)
+                await self._close_with(writer, error_response(status, str(e)))
+                return
+
+            request = Request(method, target, headers, address)
+            started = time.monotonic()
+            self.app.metrics.request_started()
+            response = None
+            size = None
+            try:
+                async with self._semaphore:
+                    loop = asyncio.get_running_loop()
+                    try:
+                        response = await loop.run_in_executor(
+                            None, self.app.handle, request
+                        )
+                    except Exception:
+                        # nothing was sent yet, the connection is still usable
+                        _err("Could not handle: " + requestline, exc_info=True)
+                        response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+                    if response.stream is not None and version == "HTTP/1.0":
+                        keep_alive = False  # no chunked encoding
+                    # live streams (ie: events) and throttled files last
+                    # long, but don't use threads: they don't count as
+                    # concurrent requests
+                    is_long = isinstance(response.stream, AsyncIterator) or (
+                        response.lease is not None and response.lease.is_throttled
+                    )
+                    if not is_long:
+                        size = await self._send_response(
+                            writer, method, version, response, keep_alive
+                        )
+                if is_long:
+                    size = await self._send_response(
+                        writer, method, version, response, keep_alive
+                    )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                raise
+            except Exception:
+                # the headers were sent, the response can only be cut short
+                _err("Could not send: " + requestline, exc_info=True)
+                return
+            finally:
+                status = (
+                    response.status if response else HTTPStatus.INTERNAL_SERVER_ERROR
+                )
+                self.app.request_finished(
+                    address,
+                    requestline,
+                    request,
+                    status.value,
+                    size,
+                    time.monotonic() - started,
+                )
+
+    async def _send_response(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        version: str,
+        response: Response,
+        keep_alive: bool,
+    ) -> Optional[int]:
+        try:
+            return await self._send(writer, method, version, response, keep_alive)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _parse_request_line(requestline: str) -> tuple[str, str, str]:
+        words = requestline.split()
+        if len(words) != 3:
+            raise _BadRequest(HTTPStatus.BAD_REQUEST, "Bad request syntax")
+        method, target, version = words
+        if not version.startswith("HTTP/1."):
+            raise _BadRequest(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+        return method, target, version
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> http.client.HTTPMessage:
+        lines = []
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError as e:
+                raise _BadRequest(
+                    HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Line too long"
+                ) from e
+            if line in (b"\r\n", b"\n", b""):
+                break
+            lines.append(line)
+            if len(lines) > _MAX_HEADERS:
+                raise _BadRequest(
+                    HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers"
+                )
+        # same as http.client.parse_headers()
+        data = b"".join(lines).decode("iso-8859-1")
+        return email.parser.Parser(_class=http.client.HTTPMessage).parsestr(data)
+
+    @staticmethod
+    def _wants_keep_alive(version: str, headers: http.client.HTTPMessage) -> bool:
+        connection = headers.get("Connection", "").lower()
+        if version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @staticmethod
+    async def _discard_body(
+        reader: asyncio.StreamReader,
+        headers: http.client.HTTPMessage,
+    ) -> None:
+        # GET and HEAD don't have bodies, but they must be consumed to
+        # read the next request of the connection
+        if "Transfer-Encoding" in headers:
+            raise _BadRequest(HTTPStatus.NOT_IMPLEMENTED, "Unsupported body")
+        try:
+            length = int(headers.get("Content-Length", "0"))
+        except ValueError as e:
+            raise _BadRequest(HTTPStatus.BAD_REQUEST, "Bad Content-Length") from e
+        if length > _MAX_BODY:
+            raise _BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        if length > 0:
+            await reader.readexactly(length)
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        version: str,
+        response: Response,
+        keep_alive: bool,
+    ) -> Optional[int]:
+        """Send the response, returns the size of the body, if any."""
+        status = response.status
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Server: {_SERVER}",
+            f"Date: {_format_date(int(time.time()))}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in response.headers)
+        chunked = response.stream is not None and version != "HTTP/1.0"
+        if chunked:
+            lines.append("Transfer-Encoding: chunked")
+        if not keep_alive:
+            lines.append("Connection: close")
+        elif version == "HTTP/1.0":
+            lines.append("Connection: keep-alive")
+        lines.append("\r\n")
+        buffer = "\r\n".join(lines).encode("latin-1")
+
+        has_body = method != "HEAD" and status not in (
+            HTTPStatus.NOT_MODIFIED,
+            HTTPStatus.NO_CONTENT,
+        )
+        size = None
+        if has_body:
+            size = response.content_length
+            for data, r in response.parts:
+                # coalesce the headers and small parts in a single write
+                buffer += data
+                if r is not None and response.file is not None and r.length > 0:
+                    writer.write(buffer)
+                    buffer = b""
+                    await self._send_range(writer, response.file, r, response.lease)
+        if buffer:
+            writer.write(buffer)
+        if has_body and response.stream is not None:
+            size = await self._send_stream(writer, response.stream, chunked)
+        await writer.drain()
+        return size
+
+    @staticmethod
+    async def _iter_stream(stream: Stream) -> AsyncIterator[bytes]:
+        if isinstance(stream, AsyncIterator):
+            async for data in stream:
+                yield data
+            return
+
+        # the stream may block (ie: rendering), run it in the executor
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await loop.run_in_executor(None, next, stream, None)
+            if data is None:
+                break
+            yield data
+
+    async def _send_stream(
+        self,
+        writer: asyncio.StreamWriter,
+        stream: Stream,
+        chunked: bool,
+    ) -> int:
+        size = 0
+        async for data in self._iter_stream(stream):
+            if not data:
+                continue  # a zero length chunk is the end of the body
+            size += len(data)
+            if chunked:
+                data = f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n"
+            writer.write(data)
+            await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        return size
+
+    async def _send_range(
+        self,
+        writer: asyncio.StreamWriter,
+        f: BinaryIO,
+        r: ByteRange,
+        lease: Optional[Lease] = None,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        if lease is not None and lease.is_throttled:
+            # small chunks, each waits for the tokens of its bytes
+            for start in range(r.start, r.end + 1, THROTTLE_CHUNK_SIZE):
+                chunk = ByteRange(start, min(r.end, start + THROTTLE_CHUNK_SIZE - 1))
+                await asyncio.sleep(lease.throttle(chunk.length))
+                await self._send_range(writer, f, chunk)
+            return
+        if self.use_sendfile:
+            # waits for the written headers, then sendfile(2) as the
+            # socket is writable. Falls back to read() and write()
+            await loop.sendfile(writer.transport, f, r.start, r.length)
+            return
+
+        await loop.run_in_executor(None, f.seek, r.start)
+        remaining = r.length
+        while remaining > 0:
+            data = await loop.run_in_executor(
+                None, f.read, min(_COPY_BUFSIZE, remaining)
+            )
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+            remaining -= len(data)
+
+
+async def _serve(server: AsyncioServer, port: int) -> None:
+    srv = await asyncio.start_server(
+        server.handle_connection,
+        port=port,
+        limit=_LINE_LIMIT,
+        backlog=min(server.max_connections, 4096),
+    )
+    async with srv:
+        for sock in srv.sockets:
+            host, port = sock.getsockname()[:2]
+            url_host = f"[{host}]" if ":" in host else host
+            _inf(
+                "Serving "
+                + colored(server.app.directory, "cyan")
+                + " at: "
+                + colored(f"http://{url_host}:{port}/", "cyan")
+                + colored(" (asyncio)", "blue")
+            )
+        await srv.serve_forever()
+
+
+def serve_asyncio(
+    app: App,
+    port: int,
+    use_sendfile: bool,
+    max_connections: int,
+    max_concurrency: int,
+    keepalive_timeout: float,
+) -> None:
+    server = AsyncioServer(
+        app,
+        use_sendfile,
+        max_connections,
+        max_concurrency,
+        keepalive_timeout,
+    )
+    asyncio.run(_serve(server, port))
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import os
+import threading
+from typing import NamedTuple
+from typing import Optional
+
+
+def make_etag(fs: os.stat_result, suffix: str = "") -> str:
+    """Strong entity tag of a file from its inode, size and mtime (ns)."""
+    return f'"{fs.st_ino:x}-{fs.st_size:x}-{fs.st_mtime_ns:x}{suffix}"'
+
+
+class _Entry(NamedTuple):
+    key: tuple[int, int, int]
+    data: bytes
+
+
+class MemoryCache:
+    """Least recently used contents, bounded by their total size.
+
+    Entries are validated by the stat of their source (inode, size and
+    mtime), so they are discarded once the source changes. Contents
+    larger than ``max_entry_size`` are not kept, as they would evict most
+    of the other entries.
+    """
+
+    max_size: int
+    max_entries: int
+    max_entry_size: int
+    size: int
+    hits: int
+    misses: int
+    _entries: OrderedDict[str, _Entry]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        max_size: int,
+        max_entries: int,
+        max_entry_size: Optional[int] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.max_entries = max_entries
+        if max_entry_size is None:
+            max_entry_size = max_size // 4
+        self.max_entry_size = min(max_entry_size, max_size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(fs: os.stat_result) -> tuple[int, int, int]:
+        return (fs.st_ino, fs.st_size, fs.st_mtime_ns)
+
+    def get(self, path: str, fs: os.stat_result) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.key != self._get_key(fs):
+                self._remove(path)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry.data
+
+    def set(self, path: str, fs: os.stat_result, data: bytes) -> None:
+        if len(data) > self.max_entry_size:
+            return
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            self._entries[path] = _Entry(self._get_key(fs), data)
+            self.size += len(data)
+            while self.size > self.max_size or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, path: str) -> None:
+        entry = self._entries.pop(path)
+        self.size -= len(entry.data)
@@ -3,6 +3,7 @@ from argparse import ArgumentParser
 from argparse import Namespace
 from argparse import RawTextHelpFormatter
 import os.path
+import textwrap
 
 from .. import log
 
@@ -10,7 +11,10 @@ description = """\
 Serve HTTP for the given directory (where you place your videos).
 
 It's Python's http.server enabled to serve Range requests, required by
-browsers to implement video seek.
+browsers to implement video seek. Files are sent with sendfile(2), without
+copying them through Python. With '--engine=asyncio', a single thread
+serves many persistent (keep-alive) connections, as browsers do when
+seeking a video while loading the page assets.
 
 NOTE: this server is meant to help during development and not to be used
 in production! For production use a proper server such as nginx, apache;
@@ -22,7 +26,29 @@ def handle_command(args: Namespace) -> None:
     # avoid loading heavy libraries in the command line
     from .work import serve
 
-    serve(args.port, args.directory)
+    serve(
+        args.port,
+        args.directory,
+        args.catalog,
+        args.use_sendfile,
+        args.engine,
+        args.max_connections,
+        args.max_concurrency,
+        args.keepalive_timeout,
+        args.render,
+        args.render_cache_size * 1024 * 1024,
+        args.render_cache_entries,
+        dict(args.cache_control),
+        args.hot_cache_size * 1024 * 1024,
+        args.hot_file_size * 1024,
+        args.metrics_path or None,
+        args.access_log,
+        args.access_log_sample,
+        args.max_rate * 1024,
+        args.max_client_rate * 1024,
+        args.max_streams,
+        args.max_client_streams,
+    )
 
 
 def check_directory(s: str) -> str:
@@ -33,6 +59,25 @@ def check_directory(s: str) -> str:
     return s
 
 
+def parse_cache_control(s: str) -> list[tuple[str, str]]:
+    # "EXT[,EXT...]=VALUE", "*" for the other extensions
+    exts, sep, value = s.partition("=")
+    if not sep or not exts.strip():
+        raise ValueError(f"expected EXT=VALUE: {s}")
+    return [
+        (ext if ext == "*" else "." + ext.lstrip(".").lower(), value.strip())
+        for ext in (e.strip() for e in exts.split(","))
+        if ext
+    ]
+
+
+def parse_ratio(s: str) -> float:
+    value = float(s)
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"not between 0 and 1: {s}")
+    return value
+
+
 def add_arguments(ap: ArgumentParser) -> None:
     ap.add_argument(
         "-p",
@@ -41,6 +86,272 @@ def add_arguments(ap: ArgumentParser) -> None:
         default=8000,
         help="Port to start the HTTP server. Default: %(default)s",
     )
+    ap.add_argument(
+        "--engine",
+        choices=("thread", "asyncio"),
+        default="thread",
+        help=textwrap.dedent(
+            """\
+            Server engine:
+            - thread: one thread and connection (HTTP/1.0) per request;
+            - asyncio: a single thread for all connections, which are
+              kept alive (HTTP/1.1) for the next requests.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-connections",
+        type=int,
+        default=1024,
+        help=textwrap.dedent(
+            """\
+            With '--engine=asyncio', connections beyond this number are
+            answered with '503 Service Unavailable'.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=256,
+        help=textwrap.dedent(
+            """\
+            With '--engine=asyncio', the number of requests handled at
+            once, the others wait (idle connections don't count).
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--keepalive-timeout",
+        type=float,
+        default=15.0,
+        help=textwrap.dedent(
+            """\
+            With '--engine=asyncio', seconds to wait for the next
+            request before closing an idle connection.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-rate",
+        type=float,
+        default=0,
+        metavar="KiB/s",
+        help=textwrap.dedent(
+            """\
+            Bandwidth of the files sent from the disk (ie: videos) to all
+            the clients, shared evenly by their streams (token bucket).
+            Small files served from memory are not limited.
+
+            Default: unlimited
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-client-rate",
+        type=float,
+        default=0,
+        metavar="KiB/s",
+        help=textwrap.dedent(
+            """\
+            Bandwidth of the files sent to each client (IP address), so
+            a few clients seeking large videos don't starve the others.
+
+            Default: unlimited
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-streams",
+        type=int,
+        default=0,
+        help=textwrap.dedent(
+            """\
+            Files sent from the disk at once, the requests beyond it are
+            answered with '503 Service Unavailable' and 'Retry-After', so
+            the clients retry later.
+
+            Default: unlimited
+        """
+        ),
+    )
+    ap.add_argument(
+        "--max-client-streams",
+        type=int,
+        default=0,
+        help=textwrap.dedent(
+            """\
+            Files sent at once to each client (IP address), beyond it
+            they are answered as with '--max-streams'. Browsers use a
+            few streams per video when seeking.
+
+            Default: unlimited
+        """
+        ),
+    )
+    ap.add_argument(
+        "--no-sendfile",
+        dest="use_sendfile",
+        default=True,
+        action="store_false",
+        help="Copy files through Python instead of using sendfile(2)",
+    )
+    ap.add_argument(
+        "--catalog",
+        metavar="DATABASE",
+        help=textwrap.dedent(
+            """\
+            Database created by the 'catalog' command, enables
+            '/api/search?q=WORDS&limit=N' returning the best ranked
+            segments as JSON. See the 'search' command.
+        """
+        ),
+    )
+    ap.add_argument(
+        "--cache-control",
+        type=parse_cache_control,
+        action="extend",
+        default=[],
+        metavar="EXT=VALUE",
+        help=textwrap.dedent(
+            """\
+            Cache-Control header of the files with the given extensions,
+            separated by comma, or '*' for the others. May be repeated:
+
+              --cache-control '*=no-cache'
+              --cache-control 'css,js,vtt,jpeg,webp=max-age=86400'
+
+            Files have entity tags (ETag) and modification date, so the
+            browsers revalidate them with '304 Not Modified'.
+
+            Default: no Cache-Control
+        """
+        ),
+    )
+    ap.add_argument(
+        "--hot-cache-size",
+        type=int,
+        default=32,
+        metavar="MiB",
+        help=textwrap.dedent(
+            """\
+            Memory used to keep the most recently served small files
+            (stylesheets, scripts, subtitles, thumbnails...), served
+            without reading them again while they are not modified.
+            Use 0 to disable.
+
+            Default: %(default)s MiB
+        """
+        ),
+    )
+    ap.add_argument(
+        "--hot-file-size",
+        type=int,
+        default=256,
+        metavar="KiB",
+        help=textwrap.dedent(
+            """\
+            Files up to this size are kept in the hot cache.
+
+            Default: %(default)s KiB
+        """
+        ),
+    )
+    ap.add_argument(
+        "--metrics-path",
+        default="/metrics",
+        metavar="PATH",
+        help=textwrap.dedent(
+            """\
+            Path of the metrics in the Prometheus text format: requests
+            by route (extension or API) and status, latency histograms,
+            bytes sent, open connections, requests in flight and hits of
+            the caches. Use '' to disable.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--access-log",
+        choices=("color", "json", "off"),
+        default="color",
+        help=textwrap.dedent(
+            """\
+            Format of the log of the requests:
+            - color: a line per request, as the other messages;
+            - json: a JSON object per line (stderr), with the route and
+              the duration;
+            - off: no log of the requests.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--access-log-sample",
+        type=parse_ratio,
+        default=1.0,
+        metavar="RATIO",
+        help=textwrap.dedent(
+            """\
+            Log only this ratio of the successful requests, so logging
+            doesn't cost much under load (ie: 0.01). The errors are
+            always logged.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--render",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            Render missing NAME.vtt, NAME.srt and NAME.html from their
+            NAME.jsonl on demand, streamed as they are generated, so the
+            'vtt', 'srt' and 'html' commands are not needed for content
+            that is rarely opened. The built-in stylesheet and script
+            are served as well.
+        """
+        ),
+    )
+    ap.add_argument(
+        "--render-cache-size",
+        type=int,
+        default=64,
+        metavar="MiB",
+        help=textwrap.dedent(
+            """\
+            Memory used to keep the most recently rendered files, they
+            are rendered again once their jsonl changes. Files larger
+            than a quarter of it are not kept.
+
+            Default: %(default)s MiB
+        """
+        ),
+    )
+    ap.add_argument(
+        "--render-cache-entries",
+        type=int,
+        default=256,
+        help=textwrap.dedent(
+            """\
+            Maximum number of rendered files to keep.
+
+            Default: %(default)s
+        """
+        ),
+    )
     ap.add_argument(
         "directory",
         nargs="?",
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+# bytes sent between two reservations of the buckets, small enough to
+# interleave the streams sharing the global rate
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+# seconds, for the clients told to retry later (503)
+RETRY_AFTER = 1
+
+# clients without streams are forgotten beyond this number
+_MAX_IDLE_CLIENTS = 1024
+
+
+class TokenBucket:
+    """Bandwidth limit of ``rate`` bytes per second, ``burst`` at once.
+
+    Bytes are reserved before they are sent: the tokens may go negative,
+    then :meth:`reserve` returns how long to wait, so it works the same
+    for threads (``time.sleep()``) and coroutines (``asyncio.sleep()``).
+    Reservations are served in order, so the streams sharing a bucket
+    get the same share of it.
+    """
+
+    rate: float
+    burst: float
+    tokens: float
+    updated: float
+    _lock: threading.Lock
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        # a second of rate, at least a chunk
+        self.burst = max(burst or rate, THROTTLE_CHUNK_SIZE)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def reserve(self, size: int) -> float:
+        """Take ``size`` tokens, seconds to wait before sending them."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= size
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def is_full(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.burst
+
+
+class _Client:
+    bucket: Optional[TokenBucket]
+    streams: int
+
+    def __init__(self, bucket: Optional[TokenBucket]) -> None:
+        self.bucket = bucket
+        self.streams = 0
+
+
+class Lease:
+    """A stream allowed by the :class:`Limiter`, released once sent."""
+
+    limiter: Limiter
+    client: str
+    buckets: tuple[TokenBucket, ...]
+    _released: bool
+
+    def __init__(
+        self,
+        limiter: Limiter,
+        client: str,
+        buckets: tuple[TokenBucket, ...],
+    ) -> None:
+        self.limiter = limiter
+        self.client = client
+        self.buckets = buckets
+        self._released = False
+
+    @property
+    def is_throttled(self) -> bool:
+        return bool(self.buckets)
+
+    def throttle(self, size: int) -> float:
+        """Seconds to wait before sending ``size`` bytes."""
+        return max((bucket.reserve(size) for bucket in self.buckets), default=0.0)
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.limiter._release(self.client)
+
+
+class Limiter:
+    """Bandwidth and stream limits of the files sent by ``serve``.
+
+    Each client (IP address) may receive ``client_rate`` bytes per
+    second over at most ``max_client_streams`` streams at once, and all
+    of them ``rate`` bytes per second over at most ``max_streams``. Zero
+    is unlimited. Streams beyond the limits are refused, so the clients
+    retry later (``503 Service Unavailable`` with ``Retry-After``).
+    """
+
+    rate: float
+    client_rate: float
+    max_streams: int
+    max_client_streams: int
+    streams: int
+    refused: int
+    _bucket: Optional[TokenBucket]
+    _clients: dict[str, _Client]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        rate: float = 0,
+        client_rate: float = 0,
+        max_streams: int = 0,
+        max_client_streams: int = 0,
+    ) -> None:
+        self.rate = rate
+        self.client_rate = client_rate
+        self.max_streams = max_streams
+        self.max_client_streams = max_client_streams
+        self.streams = 0
+        self.refused = 0
+        self._bucket = TokenBucket(rate) if rate > 0 else None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> Optional[Lease]:
+        """Lease of a new stream to ``client``, None if refused."""
+        with self._lock:
+            entry = self._clients.get(client)
+            if entry is None:
+                if len(self._clients) >= _MAX_IDLE_CLIENTS:
+                    self._forget_idle()
+                bucket = None
+                if self.client_rate > 0:
+                    bucket = TokenBucket(self.client_rate)
+                entry = self._clients[client] = _Client(bucket)
+            if (0 < self.max_streams <= self.streams) or (
+                0 < self.max_client_streams <= entry.streams
+            ):
+                self.refused += 1
+                return None
+            entry.streams += 1
+            self.streams += 1
+        buckets = tuple(b for b in (entry.bucket, self._bucket) if b is not None)
+        return Lease(self, client, buckets)
+
+    def _release(self, client: str) -> None:
+        with self._lock:
+            self.streams -= 1
+            entry = self._clients.get(client)
+            if entry is not None:
+                entry.streams -= 1
+
+    def _forget_idle(self) -> None:
+        # the buckets still refilling are kept, else a client would get a
+        # new burst by reconnecting
+        for client, entry in list(self._clients.items()):
+            if entry.streams == 0 and (entry.bucket is None or entry.bucket.is_full()):
+                del self._clients[client]
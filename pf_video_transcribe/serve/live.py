@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import functools
+import json
+import logging
+import threading
+import time
+from typing import Any
+from typing import AsyncIterator
+from typing import Iterator
+from typing import Optional
+
+from termcolor import colored
+
+from .transcript import TimeIndexes
+
+_logger = logging.getLogger(__name__.replace(".live", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+# a comment keeps proxies from closing idle streams and detects the
+# clients that are gone
+_PING_INTERVAL = 15.0
+_PING = b": ping\n\n"
+_RETRY_MS = 3000
+
+
+def _format_event(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    # Server-Sent Events, JSON data is a single line
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class EventStream:
+    """Server-Sent Events of a transcript to a single subscriber.
+
+    Iterable both blocking (thread engine) and asynchronously (asyncio
+    engine, without blocking a thread per subscriber). The events are
+    pushed by the :class:`_Tail` of the transcript, the stream ends
+    after the ``finished`` event. Must be closed to unsubscribe.
+    """
+
+    since: int  # segments the subscriber already has
+    _tail: Optional[_Tail]
+    _pending: deque[bytes]
+    _done: bool
+    _ended: bool
+    _lock: threading.Lock
+    _ready: threading.Event
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _async_ready: Optional[asyncio.Event]
+
+    def __init__(self, since: int) -> None:
+        self.since = since
+        self._tail = None
+        self._pending = deque([f"retry: {_RETRY_MS}\n\n".encode("latin-1")])
+        self._done = False
+        self._ended = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._ready.set()
+        self._loop = None
+        self._async_ready = None
+
+    def push(self, data: bytes, done: bool = False) -> None:
+        with self._lock:
+            self._pending.append(data)
+            self._done = self._done or done
+            self._ready.set()
+            if self._loop is not None and self._async_ready is not None:
+                self._loop.call_soon_threadsafe(self._async_ready.set)
+
+    def _pop(self) -> Optional[bytes]:
+        # all the pending events, clears the ready flags if there are none
+        with self._lock:
+            if self._pending:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                self._ended = self._done
+                return data
+            self._ready.clear()
+            if self._async_ready is not None:
+                self._async_ready.clear()
+            return None
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        if self._ended:
+            raise StopIteration
+        data = self._pop()
+        if data is not None:
+            return data
+        if not self._ready.wait(_PING_INTERVAL):
+            return _PING
+        return self._pop() or b""
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._ended:
+            raise StopAsyncIteration
+        if self._async_ready is None:
+            with self._lock:
+                self._loop = asyncio.get_running_loop()
+                self._async_ready = asyncio.Event()
+        data = self._pop()
+        if data is not None:
+            return data
+        try:
+            await asyncio.wait_for(self._async_ready.wait(), _PING_INTERVAL)
+        except asyncio.TimeoutError:
+            return _PING
+        return self._pop() or b""
+
+    def close(self) -> None:
+        tail = self._tail
+        self._tail = None
+        if tail is not None:
+            tail.unsubscribe(self)
+
+
+class _Tail(threading.Thread):
+    # one per transcript with subscribers, polls the file and pushes the
+    # new segments to all of them
+    path: str
+    live: LiveTranscripts
+    count: int  # segments pushed
+    subscribers: set[EventStream]
+    last: Optional[bytes]  # "finished" or "failure", ends the streams
+    _lock: threading.Lock
+
+    def __init__(self, path: str, live: LiveTranscripts, count: int) -> None:
+        super().__init__(name=f"tail {path}", daemon=True)
+        self.path = path
+        self.live = live
+        self.count = count
+        self.subscribers = set()
+        self.last = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, stream: EventStream) -> None:
+        with self._lock:
+            # the segments pushed before, then the new ones
+            first = stream.since
+            with open(self.path, "rb") as f:
+                index = self.live.indexes.get(self.path, f)
+                backlog = index.read_segments(f, range(first, self.count))
+            for i, segment in enumerate(backlog, first + 1):
+                stream.push(_format_event("segment", segment, i))
+            if self.last is not None:
+                stream.push(self.last, True)
+                return
+            stream._tail = self
+            self.subscribers.add(stream)
+
+    def unsubscribe(self, stream: EventStream) -> None:
+        with self._lock:
+            self.subscribers.discard(stream)
+
+    def _publish(self, data: bytes, count: int) -> None:
+        for stream in self.subscribers:
+            if count > stream.since:
+                stream.push(data)
+
+    def _publish_last(self, data: bytes) -> None:
+        self.last = data
+        for stream in self.subscribers:
+            stream.push(data, True)
+
+    def _update(self) -> bool:
+        """Push the new segments, True once finished."""
+        with open(self.path, "rb") as f:
+            index = self.live.indexes.get(self.path, f)
+            with self._lock:
+                new = index.read_segments(f, range(self.count, len(index.starts)))
+                for i, segment in enumerate(new, self.count + 1):
+                    self._publish(_format_event("segment", segment, i), i)
+                self.count += len(new)
+                if index.finished is not None:
+                    self._publish_last(_format_event("finished", index.finished))
+                    return True
+        return False
+
+    def run(self) -> None:
+        _dbg("Tailing " + colored(self.path, "cyan"))
+        while not self.live.remove_if_idle(self):
+            try:
+                if self._update():
+                    break
+            except (OSError, ValueError) as e:
+                _dbg(f"Could not tail {self.path}: {e}")
+                with self._lock:
+                    self._publish_last(_format_event("failure", str(e)))
+                break
+            time.sleep(self.live.interval)
+        self.live.remove(self)
+        _dbg("Stopped tailing " + colored(self.path, "cyan"))
+
+
+class LiveTranscripts:
+    """Push the segments of growing transcripts to their subscribers.
+
+    A single thread per transcript (:class:`_Tail`) polls its ``.jsonl``
+    every ``interval`` seconds, indexing only the complete new lines
+    (see :class:`TimeIndexes`), and fans out to all the subscribers. It
+    stops once the transcript is finished or nobody is subscribed.
+    """
+
+    indexes: TimeIndexes
+    interval: float
+    _tails: dict[str, _Tail]
+    _lock: threading.Lock
+
+    def __init__(self, indexes: TimeIndexes, interval: float = 0.5) -> None:
+        self.indexes = indexes
+        self.interval = interval
+        self._tails = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, path: str, first: int) -> EventStream:
+        """Stream the segments after the ``first`` (count), then the new ones.
+
+        Raises OSError if the file can't be read, ValueError if invalid.
+        """
+        stream = EventStream(max(0, first))
+        with open(path, "rb") as f:
+            index = self.indexes.get(path, f)
+        with self._lock:
+            tail = self._tails.get(path)
+            if tail is None and index.finished is None:
+                tail = self._tails[path] = _Tail(path, self, len(index.starts))
+                tail.start()
+            if tail is not None:
+                # still under the lock, so the tail doesn't stop as idle
+                tail.subscribe(stream)
+                return stream
+
+        # already finished, no need to tail
+        with open(path, "rb") as f:
+            segments = index.read_segments(f, range(stream.since, len(index.starts)))
+        for i, segment in enumerate(segments, stream.since + 1):
+            stream.push(_format_event("segment", segment, i))
+        stream.push(_format_event("finished", index.finished), True)
+        return stream
+
+    def remove_if_idle(self, tail: _Tail) -> bool:
+        # under the lock, so subscribe() doesn't get a stopping tail
+        with self._lock:
+            if tail.subscribers:
+                return False
+            self._tails.pop(tail.path, None)
+            return True
+
+    def remove(self, tail: _Tail) -> None:
+        with self._lock:
+            if self._tails.get(tail.path) is tail:
+                del self._tails[tail.path]
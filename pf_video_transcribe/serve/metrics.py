@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import bisect
+from collections import defaultdict
+import itertools
+import threading
+from typing import Iterator
+from typing import Mapping
+from typing import Protocol
+from typing import Sequence
+
+_PREFIX = "pf_video_transcribe_serve_"
+
+# seconds, from the request (parsed) until its body is sent
+_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class CacheStats(Protocol):
+    hits: int
+    misses: int
+
+
+class Histogram:
+    """Count of the observations per bucket, as Prometheus histograms."""
+
+    buckets: Sequence[float]
+    counts: list[int]  # per bucket, the last one is +Inf
+    total: float
+    count: int
+
+    def __init__(self, buckets: Sequence[float] = _LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def format(self, name: str, labels: str) -> Iterator[str]:
+        sep = "," if labels else ""
+        cumulative = itertools.accumulate(self.counts)
+        bounds = itertools.chain((f"{b:g}" for b in self.buckets), ("+Inf",))
+        for le, count in zip(bounds, cumulative):
+            yield f'{name}_bucket{{{labels}{sep}le="{le}"}} {count}'
+        yield f"{name}_sum{{{labels}}} {self.total:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _format_labels(**labels: object) -> str:
+    # the values are known (routes, methods, status), no need to escape
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class Metrics:
+    """In-process counters of the served requests.
+
+    Updating them is a lock and a few dictionary lookups per request,
+    :meth:`format` renders them in the Prometheus text format. Routes are
+    the API endpoints or the extension of the files (see
+    :meth:`App.get_route`), so the number of series is bounded.
+    """
+
+    requests: defaultdict[tuple[str, str, int], int]
+    bytes_sent: defaultdict[str, int]
+    latency: defaultdict[str, Histogram]
+    connections: int
+    connections_total: int
+    in_flight: int
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.requests = defaultdict(int)
+        self.bytes_sent = defaultdict(int)
+        self.latency = defaultdict(Histogram)
+        self.connections = 0
+        self.connections_total = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections += 1
+            self.connections_total += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self.connections -= 1
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(
+        self,
+        route: str,
+        method: str,
+        status: int,
+        size: int,
+        duration: float,
+    ) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[route, method, status] += 1
+            self.bytes_sent[route] += size
+            self.latency[route].observe(duration)
+
+    def request_rejected(self, status: int) -> None:
+        # answered by the engine (ie: malformed, too many connections)
+        with self._lock:
+            self.requests["-", "-", status] += 1
+
+    def format(self, caches: Mapping[str, CacheStats] = {}) -> str:
+        with self._lock:
+            lines = list(self._format(caches))
+        lines.append("")
+        return "\n".join(lines)
+
+    def _format(self, caches: Mapping[str, CacheStats]) -> Iterator[str]:
+        name = _PREFIX + "requests_total"
+        yield f"# HELP {name} Requests by route, method and status."
+        yield f"# TYPE {name} counter"
+        for (route, method, status), count in sorted(self.requests.items()):
+            labels = _format_labels(route=route, method=method, status=status)
+            yield f"{name}{{{labels}}} {count}"
+
+        name = _PREFIX + "request_duration_seconds"
+        yield f"# HELP {name} Time to handle and send the requests by route."
+        yield f"# TYPE {name} histogram"
+        for route, histogram in sorted(self.latency.items()):
+            yield from histogram.format(name, _format_labels(route=route))
+
+        name = _PREFIX + "sent_bytes_total"
+        yield f"# HELP {name} Body bytes sent by route."
+        yield f"# TYPE {name} counter"
+        for route, size in sorted(self.bytes_sent.items()):
+            yield f"{name}{{{_format_labels(route=route)}}} {size}"
+
+        name = _PREFIX + "connections"
+        yield f"# HELP {name} Open connections."
+        yield f"# TYPE {name} gauge"
+        yield f"{name} {self.connections}"
+        name = _PREFIX + "connections_total"
+        yield f"# HELP {name} Accepted connections."
+        yield f"# TYPE {name} counter"
+        yield f"{name} {self.connections_total}"
+        name = _PREFIX + "requests_in_flight"
+        yield f"# HELP {name} Requests being handled or sent, streams included."
+        yield f"# TYPE {name} gauge"
+        yield f"{name} {self.in_flight}"
+
+        for result in ("hits", "misses"):
+            name = _PREFIX + f"cache_{result}_total"
+            yield f"# HELP {name} Lookups of the in-memory caches, {result}."
+            yield f"# TYPE {name} counter"
+            for cache, stats in sorted(caches.items()):
+                value = getattr(stats, result)
+                yield f"{name}{{{_format_labels(cache=cache)}}} {value}"
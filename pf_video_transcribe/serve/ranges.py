@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+import uuid
+
+# more ranges than this are ignored and the whole file is sent, as
+# many small (or overlapping) ranges are more expensive than the file
+MAX_RANGES = 16
+
+
+class ByteRange(NamedTuple):
+    start: int
+    end: int  # inclusive, as in "Content-Range: bytes START-END/SIZE"
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    def content_range(self, size: int) -> str:
+        return f"bytes {self.start}-{self.end}/{size}"
+
+
+def _parse_range_spec(spec: str, size: int) -> Optional[ByteRange]:
+    """Parse ``first-last``, ``first-`` or ``-suffix``.
+
+    Returns None if not satisfiable, raises ValueError if invalid.
+    """
+    first, sep, last = spec.strip().partition("-")
+    first = first.strip()
+    last = last.strip()
+    if not sep or not (first or last):
+        raise ValueError(f"invalid range: {spec!r}")
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        raise ValueError(f"invalid range: {spec!r}")
+
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return None
+        return ByteRange(max(0, size - suffix), size - 1)
+
+    start = int(first)
+    if last and int(last) < start:
+        raise ValueError(f"invalid range: {spec!r}")
+    if start >= size:
+        return None
+    end = int(last) if last else size - 1
+    return ByteRange(start, min(end, size - 1))
+
+
+def _coalesce(ranges: list[ByteRange]) -> list[ByteRange]:
+    merged: list[ByteRange] = []
+    for r in sorted(ranges):
+        if merged and r.start <= merged[-1].end + 1:
+            last = merged[-1]
+            merged[-1] = ByteRange(last.start, max(last.end, r.end))
+        else:
+            merged.append(r)
+    return merged
+
+
+def parse_range(header: str, size: int) -> Optional[list[ByteRange]]:
+    """Satisfiable ranges of the ``Range`` header (RFC 7233), coalesced.
+
+    Returns None if the header must be ignored (invalid, other units or
+    too many ranges), so the whole file is sent. Returns an empty list if
+    no range is satisfiable (416 Range Not Satisfiable).
+    """
+    unit, sep, specs = header.partition("=")
+    if not sep or unit.strip().lower() != "bytes":
+        return None
+    items = [s for s in specs.split(",") if s.strip()]
+    if not items or len(items) > MAX_RANGES:
+        return None
+    ranges = []
+    for spec in items:
+        try:
+            r = _parse_range_spec(spec, size)
+        except ValueError:
+            return None
+        if r is not None:
+            ranges.append(r)
+    return _coalesce(ranges)
+
+
+class MultipartRanges:
+    """Body of ``multipart/byteranges`` (RFC 7233, appendix A).
+
+    Iterates the headers of each part and its range, then the closing
+    delimiter (with None as range). The ``content_length`` is known in
+    advance, so the parts are streamed without buffering.
+    """
+
+    boundary: str
+    content_type: str
+    parts: list[tuple[bytes, ByteRange]]
+    trailer: bytes
+
+    def __init__(self, ranges: list[ByteRange], content_type: str, size: int) -> None:
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/byteranges; boundary={self.boundary}"
+        self.parts = [
+            (
+                (
+                    f"\r\n--{self.boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: {r.content_range(size)}\r\n"
+                    "\r\n"
+                ).encode("latin-1"),
+                r,
+            )
+            for r in ranges
+        ]
+        self.trailer = f"\r\n--{self.boundary}--\r\n".encode("latin-1")
+
+    @property
+    def content_length(self) -> int:
+        parts = sum(len(header) + r.length for header, r in self.parts)
+        return parts + len(self.trailer)
+
+    def __iter__(self) -> Iterator[tuple[bytes, Optional[ByteRange]]]:
+        yield from self.parts
+        yield self.trailer, None
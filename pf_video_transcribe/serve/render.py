@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import functools
+import logging
+import os
+from typing import Any
+from typing import Generator
+from typing import Mapping
+from typing import Optional
+
+from termcolor import colored
+
+from .cache import MemoryCache
+from ..converter import AbstractJsonlConverter
+from ..html.converter import HTMLConverter
+from ..index_html.work import get_dataclass_field_names
+from ..jsonl.reader import Reader
+from ..srt.converter import SRTConverter
+from ..utils import replace_ext
+from ..vtt.converter import VTTConverter
+
+_logger = logging.getLogger(__name__.replace(".render", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+# jinja2 yields many small strings, send them in larger chunks
+_CHUNK_SIZE = 64 * 1024
+
+_render_converters: Mapping[str, type[AbstractJsonlConverter]] = {
+    f".{cls.ext}": cls for cls in (VTTConverter, SRTConverter, HTMLConverter)
+}
+
+# same defaults as the command line of the converters
+_default_converter_kwargs: Mapping[str, Any] = {
+    "duration_threshold": 10.0,
+    "html_head_entry": [],
+    "stylesheet": "",
+    "javascript": "",
+    "compact": False,
+    "chunk_duration": 0.0,  # chunks would be written to the disk
+}
+
+
+class Renderer:
+    """Render ``NAME.vtt``, ``NAME.srt`` and ``NAME.html`` from ``NAME.jsonl``.
+
+    Uses the converters with ``save=False``, so nothing is written: the
+    HTML refers to the built-in stylesheet and script, that are also
+    served from the package (see :meth:`get_resource`).
+    """
+
+    cache: MemoryCache
+    converter_kwargs: Mapping[str, Any]
+
+    def __init__(
+        self,
+        cache: MemoryCache,
+        converter_kwargs: Mapping[str, Any] = _default_converter_kwargs,
+    ) -> None:
+        self.cache = cache
+        self.converter_kwargs = converter_kwargs
+
+    @staticmethod
+    def get_resource(path: str) -> Optional[bytes]:
+        return HTMLConverter.get_default_resource(os.path.basename(path))
+
+    @staticmethod
+    def get_source(path: str) -> Optional[str]:
+        """The ``.jsonl`` to render ``path`` from, if any."""
+        if os.path.splitext(path)[1] not in _render_converters:
+            return None
+        jsonl = replace_ext(path, "jsonl")
+        if not os.path.isfile(jsonl):
+            return None
+        return jsonl
+
+    def render(
+        self,
+        path: str,
+        jsonl: str,
+        fs: os.stat_result,
+    ) -> Generator[bytes, None, None]:
+        """Render ``path`` in chunks, cached once completed."""
+        converter_cls = _render_converters[os.path.splitext(path)[1]]
+        arg_names = get_dataclass_field_names(converter_cls)
+        kwargs = {
+            k: self.converter_kwargs[k] for k in arg_names if k in self.converter_kwargs
+        }
+        converter = converter_cls(jsonl, False, save=False, **kwargs)
+
+        # kept to be cached, unless too large
+        rendered: Optional[list[bytes]] = []
+        size = 0
+        for chunk in self._iter_chunks(converter, jsonl):
+            size += len(chunk)
+            if rendered is not None:
+                rendered.append(chunk)
+                if size > self.cache.max_entry_size:
+                    rendered = None
+            yield chunk
+
+        _dbg("Rendered " + colored(path, "cyan") + f" ({size} bytes)")
+        if rendered is not None:
+            self.cache.set(path, fs, b"".join(rendered))
+
+    @staticmethod
+    def _iter_chunks(
+        converter: AbstractJsonlConverter,
+        jsonl: str,
+    ) -> Generator[bytes, None, None]:
+        pending: list[bytes] = []
+        pending_size = 0
+        with Reader(jsonl) as reader:
+            for text in converter.render(reader):
+                data = text.encode("utf-8")
+                pending.append(data)
+                pending_size += len(data)
+                if pending_size >= _CHUNK_SIZE:
+                    yield b"".join(pending)
+                    pending.clear()
+                    pending_size = 0
+        if pending:
+            yield b"".join(pending)
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import bisect
+from collections import OrderedDict
+import functools
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any
+from typing import BinaryIO
+from typing import Optional
+
+from termcolor import colored
+
+from ..dircache import get_directory_cache
+from ..jsonl.reader import Reader
+from ..types import SegmentPayloadJson
+from ..types import WordJson
+
+_logger = logging.getLogger(__name__.replace(".transcript", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+_INDEX_CACHE_NAME = "pf-video-transcribe-time-index"
+_INDEX_CACHE_VERSION = 1
+
+
+class TimeIndex:
+    """Start, end and byte offset of each segment of a ``.jsonl``.
+
+    Segments are sorted by their start, ``max_end`` is the running
+    maximum of their ends, so the segments within a time window are
+    found by binary search and only their lines are read and parsed.
+    Growing files (being transcribed) are indexed incrementally.
+    """
+
+    header: dict[str, Any]
+    starts: list[float]
+    ends: list[float]
+    max_end: list[float]
+    offsets: list[int]
+    word_counts: list[int]
+    size: int  # bytes indexed, only complete lines
+    finished: Optional[dict[str, Any]]
+
+    def __init__(self) -> None:
+        self.header = {}
+        self.starts = []
+        self.ends = []
+        self.max_end = []
+        self.offsets = []
+        self.word_counts = []
+        self.size = 0
+        self.finished = None
+
+    def update(self, f: BinaryIO) -> None:
+        """Index the lines after ``size``."""
+        f.seek(self.size)
+        offset = self.size
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # still being written
+            data = json.loads(line)
+            if "header" in data:
+                header = data["header"]
+                if header.get("encoder_version") != Reader.ENCODER_VERSION:
+                    raise ValueError(f"Invalid header {header!r}")
+                self.header = header
+            elif data.get("segment"):
+                self._append(data["segment"], offset)
+            elif data.get("finished"):
+                self.finished = data["finished"]
+            offset += len(line)
+        self.size = offset
+
+    def _append(self, segment: SegmentPayloadJson, offset: int) -> None:
+        self.starts.append(segment["start"])
+        self.ends.append(segment["end"])
+        end = segment["end"]
+        self.max_end.append(max(end, self.max_end[-1]) if self.max_end else end)
+        self.offsets.append(offset)
+        self.word_counts.append(len(segment.get("words", ())))
+
+    def find_window(self, start: float, end: float) -> range:
+        """Indexes of the segments that may overlap ``[start, end]``.
+
+        Segments ending before ``start`` may be included, if a previous
+        one ends after it.
+        """
+        first = bisect.bisect_left(self.max_end, start)
+        last = bisect.bisect_right(self.starts, end)
+        return range(first, max(first, last))
+
+    def find_at(self, t: float) -> Optional[int]:
+        """Index of the segment at time ``t``, if any."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i < 0 or self.ends[i] < t:
+            return None
+        return i
+
+    def read_segments(self, f: BinaryIO, indexes: range) -> list[SegmentPayloadJson]:
+        if not indexes:
+            return []
+        # consecutive lines, a single seek
+        f.seek(self.offsets[indexes.start])
+        return [json.loads(f.readline())["segment"] for _ in indexes]
+
+    def copy(self) -> TimeIndex:
+        index = TimeIndex()
+        index.header = self.header
+        index.starts = list(self.starts)
+        index.ends = list(self.ends)
+        index.max_end = list(self.max_end)
+        index.offsets = list(self.offsets)
+        index.word_counts = list(self.word_counts)
+        index.size = self.size
+        index.finished = self.finished
+        return index
+
+    def asdict(self) -> dict[str, Any]:
+        return {
+            "header": self.header,
+            "start": self.starts,
+            "end": self.ends,
+            "offset": self.offsets,
+            "words": self.word_counts,
+            "size": self.size,
+            "finished": self.finished,
+        }
+
+    @classmethod
+    def fromdict(cls, data: dict[str, Any]) -> TimeIndex:
+        index = cls()
+        index.header = data["header"]
+        index.starts = data["start"]
+        index.ends = data["end"]
+        index.offsets = data["offset"]
+        index.word_counts = data["words"]
+        index.size = data["size"]
+        index.finished = data["finished"]
+        index.max_end = list(itertools.accumulate(index.ends, max))
+        return index
+
+
+class _Entry:
+    key: tuple[int, int, int]
+    index: TimeIndex
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.key = (0, 0, 0)
+        self.index = TimeIndex()
+        self.lock = threading.Lock()
+
+
+class TimeIndexes:
+    """Time indexes of the recently queried transcripts, in memory.
+
+    Each is validated by the stat of its ``.jsonl``: if it only grew,
+    the new lines are indexed. Indexes of finished transcripts are also
+    saved in a per-directory cache, so they are not built again.
+    """
+
+    max_entries: int
+    hits: int  # up to date in memory
+    misses: int  # loaded, built or extended
+    _entries: OrderedDict[str, _Entry]
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, path: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self._entries[path] = _Entry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(path)
+            return entry
+
+    def get(self, path: str, f: BinaryIO) -> TimeIndex:
+        """Up to date index of ``path``, opened as ``f`` (binary)."""
+        fs = os.fstat(f.fileno())
+        key = (fs.st_ino, fs.st_size, fs.st_mtime_ns)
+        entry = self._get_entry(path)
+        with entry.lock:
+            if entry.key == key:
+                self.hits += 1
+                return entry.index
+            self.misses += 1
+            prev_ino, prev_size, _ = entry.key
+            if prev_ino == fs.st_ino and 0 < prev_size < fs.st_size:
+                # appended lines, other threads may be reading the index
+                index = entry.index.copy()
+            else:
+                index = self._load(path, fs) or TimeIndex()
+            if index.size < fs.st_size:
+                index.update(f)
+                _dbg(
+                    "Indexed "
+                    + colored(path, "cyan")
+                    + f" ({len(index.starts)} segments, {index.size} bytes)"
+                )
+                if index.finished is not None:
+                    self._save(path, fs, index)
+            entry.key = key
+            entry.index = index
+            return index
+
+    @staticmethod
+    def _load(path: str, fs: os.stat_result) -> Optional[TimeIndex]:
+        dirname, name = os.path.split(path)
+        cache = get_directory_cache(dirname, _INDEX_CACHE_NAME, _INDEX_CACHE_VERSION)
+        data = cache.get(name, fs)
+        if data is None:
+            return None
+        try:
+            return TimeIndex.fromdict(data)
+        except (KeyError, TypeError) as e:
+            _dbg(f"Ignoring time index of {path}: {e}")
+            return None
+
+    @staticmethod
+    def _save(path: str, fs: os.stat_result, index: TimeIndex) -> None:
+        dirname, name = os.path.split(path)
+        cache = get_directory_cache(dirname, _INDEX_CACHE_NAME, _INDEX_CACHE_VERSION)
+        cache.set(name, index.asdict(), fs)
+        cache.save()
+
+
+def _segment_tojson(
+    index: int,
+    segment: SegmentPayloadJson,
+    words: bool,
+) -> dict[str, Any]:
+    result: dict[str, Any] = {
+        "index": index + 1,  # as in "#segment/N"
+        "start": segment["start"],
+        "end": segment["end"],
+        "text": segment["text"],
+    }
+    if words:
+        result["words"] = segment.get("words", [])
+    return result
+
+
+def get_summary(index: TimeIndex) -> dict[str, Any]:
+    info = index.header.get("info", {})
+    return {
+        "media": index.header.get("media_filename"),
+        "language": info.get("language"),
+        "duration": info.get("duration"),
+        "segments": len(index.starts),
+        "words": sum(index.word_counts),
+        "start": index.starts[0] if index.starts else None,
+        "end": index.max_end[-1] if index.max_end else None,
+        "finished": index.finished,
+    }
+
+
+def get_window(
+    index: TimeIndex,
+    f: BinaryIO,
+    start: float,
+    end: float,
+    limit: int,
+    words: bool,
+) -> dict[str, Any]:
+    indexes = index.find_window(start, end)
+    truncated = len(indexes) > limit
+    indexes = indexes[:limit]
+    segments = index.read_segments(f, indexes)
+    return {
+        "from": start,
+        "to": end if math.isfinite(end) else None,
+        "truncated": truncated,
+        "segments": [
+            _segment_tojson(i, segment, words)
+            for i, segment in zip(indexes, segments)
+            if segment["end"] >= start
+        ],
+    }
+
+
+def get_word_at(index: TimeIndex, f: BinaryIO, t: float) -> dict[str, Any]:
+    i = index.find_at(t)
+    if i is None:
+        return {"t": t, "segment": None, "word": None}
+    segment = index.read_segments(f, range(i, i + 1))[0]
+    words: list[WordJson] = segment.get("words", [])
+    # the last word starting before t, if it didn't end yet
+    w = bisect.bisect_right([word["start"] for word in words], t) - 1
+    word = words[w] if w >= 0 and words[w]["end"] >= t else None
+    return {"t": t, "segment": _segment_tojson(i, segment, False), "word": word}
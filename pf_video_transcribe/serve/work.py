@@ -1,35 +1,52 @@
 from __future__ import annotations
 
-import datetime
-import email.utils
 import functools
 from http import HTTPStatus
-from http.server import SimpleHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 from http.server import ThreadingHTTPServer
 import logging
-import os.path
-import re
+import sqlite3
+import time
 from typing import BinaryIO
+from typing import Mapping
+from typing import Optional
 from typing import Union
 
 from termcolor import colored
 
+from .access_log import AccessLog
+from .app import App
+from .app import Request
+from .app import Response
+from .asyncio_server import serve_asyncio
+from .cache import MemoryCache
+from .limits import Lease
+from .limits import Limiter
+from .limits import THROTTLE_CHUNK_SIZE
+from .ranges import ByteRange
+from .render import Renderer
+from ..catalog.database import connect
+
 _logger = logging.getLogger(__name__.replace(".work", ""))
 _dbg = functools.partial(_logger.log, logging.DEBUG)
 _inf = functools.partial(_logger.log, logging.INFO)
 _wrn = functools.partial(_logger.log, logging.WARN)
 
-_range_re = re.compile(
-    r"bytes=(?P<start>\d+)-",
-)
+_COPY_BUFSIZE = 1024 * 1024
+
 
+class RequestHandler(BaseHTTPRequestHandler):
+    # One thread and connection per request (HTTP/1.0), the responses
+    # come from the engine independent App
+    server: Server
 
-class RequestHandler(SimpleHTTPRequestHandler):
-    # Just SimpleHTTPRequestHandler handling "Range" requests,
-    # required by video seek, returning Content-Range
-    #
-    # Also generates pretty "/"" (main index), only for .html files
-    directory: str
+    def handle(self) -> None:
+        metrics = self.server.app.metrics
+        metrics.connection_opened()
+        try:
+            super().handle()
+        finally:
+            metrics.connection_closed()
 
     def log_error(self, fmt: str, *args: object) -> None:
         message = fmt % args
@@ -40,22 +57,12 @@ class RequestHandler(SimpleHTTPRequestHandler):
         code: Union[str, int, HTTPStatus] = "-",
         size: Union[str, int] = "-",
     ) -> None:
+        # only the errors sent by BaseHTTPRequestHandler (ie: malformed
+        # requests), _handle() reports the others once they are sent
         if isinstance(code, HTTPStatus):
             code = code.value
-
-        code_str = str(code)
-        code_color = "green"
-        if code_str[0] in ("4", "5"):
-            code_color = "red"
-
-        _inf(
-            colored(self.address_string(), "blue")
-            + " "
-            + colored(self.requestline, "cyan")
-            + " "
-            + colored(code_str, code_color)
-            + " "
-            + colored(str(size), "cyan")
+        self.server.app.request_rejected(
+            self.address_string(), self.requestline, int(code)
         )
 
     def log_message(self, fmt: str, *args: object) -> None:
@@ -63,100 +70,175 @@ class RequestHandler(SimpleHTTPRequestHandler):
         _dbg(colored(self.address_string(), "blue") + " " + colored(message, "cyan"))
 
     def do_GET(self) -> None:
-        r = self.headers.get("Range")
-        if r:
-            m = _range_re.match(r)
-            path = self.translate_path(self.path)
-            if m and os.path.isfile(path):
-                start = int(m.group("start"))
-                try:
-                    with open(path, "rb") as f:
-                        self._do_GET_range(f, path, start)
-                        return
-                except Exception:
-                    pass
-
-        super().do_GET()
-
-    def _do_GET_range(self, f: BinaryIO, path: str, start: int) -> None:
-        # most of this code is similar to send_headers() handling files:
-        fs = os.fstat(f.fileno())
-
-        total_size = fs[6]
-        size = total_size - start
-        if size < 0:
-            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
-            self.end_headers()
-            return
+        self._handle(True)
 
-        # Use browser cache if possible
-        if "If-Modified-Since" in self.headers and "If-None-Match" not in self.headers:
-            # compare If-Modified-Since and time of last file modification
-            try:
-                ims = email.utils.parsedate_to_datetime(
-                    self.headers["If-Modified-Since"]
-                )
-            except (TypeError, IndexError, OverflowError, ValueError):
-                # ignore ill-formed values
-                pass
-            else:
-                if ims and ims.tzinfo is None:
-                    # obsolete format with no timezone, cf.
-                    # https://tools.ietf.org/html/rfc7231#section-7.1.1.1
-                    ims = ims.replace(tzinfo=datetime.timezone.utc)
-                if ims and ims.tzinfo is datetime.timezone.utc:
-                    # compare to UTC datetime of last modification
-                    last_modif = datetime.datetime.fromtimestamp(
-                        fs.st_mtime, datetime.timezone.utc
-                    )
-                    # remove microseconds, like in If-Modified-Since
-                    last_modif = last_modif.replace(microsecond=0)
-
-                    if last_modif <= ims:
-                        self.send_response(HTTPStatus.NOT_MODIFIED)
-                        self.end_headers()
-                        return
-
-        f.seek(start)
-        end = start + size - 1
-        ctype = self.guess_type(path)
-
-        self.send_response(HTTPStatus.PARTIAL_CONTENT)
-        self.send_header("Content-type", ctype)
-        self.send_header("Content-Length", str(size))
-        self.send_header("Content-Range", f"bytes {start}-{end}/{total_size}")
-        self.send_header("Last-Modified", self.date_time_string(int(fs.st_mtime)))
-        self.end_headers()
+    def do_HEAD(self) -> None:
+        self._handle(False)
+
+    def _handle(self, send_body: bool) -> None:
+        app = self.server.app
+        started = time.monotonic()
+        app.metrics.request_started()
+        request = Request(
+            self.command, self.path, self.headers, str(self.client_address[0])
+        )
+        response = app.handle(request)
+        size = None
         try:
-            self.copyfile(f, self.wfile)  # type: ignore
-        except BrokenPipeError:
+            self.send_response_only(response.status)
+            self.send_header("Server", self.version_string())
+            self.send_header("Date", self.date_time_string())
+            for name, value in response.headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if send_body:
+                size = self._send_body(response)
+        except (BrokenPipeError, ConnectionResetError):
             self.log_error("Broken pipe, likely client closed the connection")
+        finally:
+            response.close()
+            app.request_finished(
+                self.address_string(),
+                self.requestline,
+                request,
+                response.status.value,
+                size,
+                time.monotonic() - started,
+            )
+
+    def _send_body(self, response: Response) -> int:
+        size = 0
+        for data, r in response.parts:
+            if data:
+                self.wfile.write(data)
+                size += len(data)
+            if r is not None and response.file is not None:
+                self._send_range(response.file, r, response.lease)
+                size += r.length
+        if response.stream is not None:
+            # HTTP/1.0: the end of the body is the end of the connection
+            for data in response.stream:
+                self.wfile.write(data)
+                size += len(data)
+        return size
+
+    def _send_range(
+        self,
+        f: BinaryIO,
+        r: ByteRange,
+        lease: Optional[Lease] = None,
+    ) -> None:
+        if r.length <= 0:
+            return  # empty file, sendfile() would take 0 as "until the end"
+        if lease is not None and lease.is_throttled:
+            # small chunks, each waits for the tokens of its bytes
+            for start in range(r.start, r.end + 1, THROTTLE_CHUNK_SIZE):
+                chunk = ByteRange(start, min(r.end, start + THROTTLE_CHUNK_SIZE - 1))
+                time.sleep(lease.throttle(chunk.length))
+                self._send_range(f, chunk)
+            return
+        if self.server.use_sendfile:
+            # zero copy, socket.sendfile() falls back to send() if needed
+            self.connection.sendfile(f, r.start, r.length)  # type: ignore
+            return
+
+        f.seek(r.start)
+        remaining = r.length
+        while remaining > 0:
+            data = f.read(min(_COPY_BUFSIZE, remaining))
+            if not data:
+                break
+            self.wfile.write(data)
+            remaining -= len(data)
 
 
 class Server(ThreadingHTTPServer):
-    directory: str
+    app: App
+    use_sendfile: bool
 
-    def __init__(self, directory: str, port: int) -> None:
-        self.directory = directory
+    def __init__(self, app: App, port: int, use_sendfile: bool = True) -> None:
+        self.app = app
+        self.use_sendfile = use_sendfile
         super().__init__(("", port), RequestHandler)
 
-    def finish_request(self, request: object, client_address: object) -> None:
-        self.RequestHandlerClass(
-            request, client_address, self, directory=self.directory  # type: ignore
-        )
-
 
-def serve(port: int, directory: str) -> None:
-    with Server(directory, port) as server:
+def _serve_thread(app: App, port: int, use_sendfile: bool) -> None:
+    with Server(app, port, use_sendfile) as server:
         host, port = server.socket.getsockname()[:2]
         url_host = f"[{host}]" if ":" in host else host
         _inf(
             "Serving "
-            + colored(directory, "cyan")
+            + colored(app.directory, "cyan")
             + " at: "
             + colored(f"http://{url_host}:{port}/", "cyan")
         )
-        try:
-            server.serve_forever()
-        except KeyboardInterrupt:
-            _dbg("Keyboard interrupt received, exiting.")
+        server.serve_forever()
+
+
+def check_catalog(catalog: str) -> None:
+    """Fail at startup if the search API could not use the catalog."""
+    try:
+        connect(catalog, readonly=True).close()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"{catalog}: {e}") from e
+
+
+def serve(
+    port: int,
+    directory: str,
+    catalog: Optional[str] = None,
+    use_sendfile: bool = True,
+    engine: str = "thread",
+    max_connections: int = 1024,
+    max_concurrency: int = 256,
+    keepalive_timeout: float = 15.0,
+    render: bool = False,
+    render_cache_size: int = 64 * 1024 * 1024,
+    render_cache_entries: int = 256,
+    cache_control: Mapping[str, str] = {},
+    hot_cache_size: int = 32 * 1024 * 1024,
+    hot_file_size: int = 256 * 1024,
+    metrics_path: Optional[str] = "/metrics",
+    access_log_format: str = "color",
+    access_log_sample: float = 1.0,
+    max_rate: float = 0,
+    max_client_rate: float = 0,
+    max_streams: int = 0,
+    max_client_streams: int = 0,
+) -> None:
+    if catalog is not None:
+        check_catalog(catalog)
+    renderer = None
+    if render:
+        renderer = Renderer(MemoryCache(render_cache_size, render_cache_entries))
+    limiter = None
+    if max_rate or max_client_rate or max_streams or max_client_streams:
+        limiter = Limiter(max_rate, max_client_rate, max_streams, max_client_streams)
+    hot_cache = None
+    if hot_cache_size > 0 and hot_file_size > 0:
+        # entries are small, the size is the bound
+        hot_cache = MemoryCache(hot_cache_size, hot_cache_size, hot_file_size)
+    app = App(
+        directory,
+        catalog,
+        renderer,
+        cache_control,
+        hot_cache,
+        metrics_path,
+        AccessLog(access_log_format, access_log_sample),
+        limiter,
+    )
+    try:
+        if engine == "asyncio":
+            serve_asyncio(
+                app,
+                port,
+                use_sendfile,
+                max_connections,
+                max_concurrency,
+                keepalive_timeout,
+            )
+        else:
+            _serve_thread(app, port, use_sendfile)
+    except KeyboardInterrupt:
+        _dbg("Keyboard interrupt received, exiting.")
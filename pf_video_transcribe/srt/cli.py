@@ -21,6 +21,7 @@ def handle_command(args: Namespace) -> None:
         args.file,
         args.force,
         duration_threshold=args.duration_threshold,
+        precompress=args.precompress,
     )
 
 
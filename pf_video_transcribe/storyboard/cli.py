@@ -0,0 +1,138 @@
+from argparse import _SubParsersAction
+from argparse import ArgumentParser
+from argparse import Namespace
+from argparse import RawTextHelpFormatter
+import math
+import textwrap
+
+from .. import log
+from ..types import Size
+from ..utils import check_file_exists
+from ..utils import parse_size
+
+description = """\
+Loads media files and generate storyboard sprites (JPEG) with frames
+at a fixed interval, plus a WebVTT mapping each interval to its frame
+in the sprites, used to preview the seek bar position.
+
+The HTML generated afterwards will reference the WebVTT as a
+'<track kind="metadata" label="thumbnails">'.
+
+NOTE: this converter relies on ffmpeg being installed.
+"""
+
+
+def handle_command(args: Namespace) -> None:
+    # avoid loading heavy libraries in the command line
+    from .converter import StoryboardConverter
+
+    StoryboardConverter.batch(
+        args.file,
+        args.force,
+        interval=args.interval,
+        size=args.size,
+        grid=args.grid,
+    )
+
+
+def parse_interval(s: str) -> float:
+    value = float(s)
+    if not 0 < value < math.inf:
+        raise ValueError(f"not a positive number: {s}")
+    return value
+
+
+def add_arguments(ap: ArgumentParser, add_files: bool = True) -> None:
+    ap.add_argument(
+        "--interval",
+        type=parse_interval,
+        default=10.0,
+        help=textwrap.dedent(
+            """\
+            Seconds between frames.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--size",
+        type=parse_size,
+        default=Size(160, -1),
+        help=textwrap.dedent(
+            """\
+            Specify the size of each frame.
+
+            Use format: WIDTHxHEIGHT.
+
+            If one of WIDTH or HEIGHT are -1, they will be calculated based
+            on the other dimension.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--grid",
+        type=parse_size,
+        default=Size(5, 5),
+        help=textwrap.dedent(
+            """\
+            Number of frames in each sprite.
+
+            Use format: COLUMNSxROWS.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "-f",
+        "--force",
+        default=False,
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            Force regeneration of existing files.
+
+            By default, if the generated file timestamp (mtime) is newer than the
+            source (media), then it will be skipped.
+        """
+        ),
+    )
+    if add_files:
+        ap.add_argument(
+            "file",
+            nargs="+",
+            help="media or jsonl file to be processed",
+            type=check_file_exists,
+        )
+
+
+def add_sub_parser(sub: _SubParsersAction) -> ArgumentParser:
+    ap = sub.add_parser(
+        "storyboard",
+        help="Create storyboard sprites (JPEG) and WebVTT of the given media file",
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    add_arguments(ap)
+    ap.set_defaults(handle=handle_command)
+    return ap
+
+
+def create_argument_parser() -> ArgumentParser:
+    ap = ArgumentParser(
+        description=description,
+        formatter_class=RawTextHelpFormatter,
+    )
+    log.add_arguments(ap)
+    add_arguments(ap)
+    return ap
+
+
+def main() -> None:
+    ap = create_argument_parser()
+    args = ap.parse_args()
+    log.config(args)
+    handle_command(args)
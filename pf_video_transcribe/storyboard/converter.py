@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import KW_ONLY
+import functools
+import logging
+import math
+import os
+from typing import Iterator
+from typing import Sequence
+
+import ffmpeg
+from termcolor import colored
+
+from ..converter import AbstractConverter
+from ..probe import probe
+from ..templates import get_template
+from ..thumbnail.converter import get_media_filename
+from ..types import Size
+from ..utils import replace_ext
+
+_logger = logging.getLogger(__name__.replace(".converter", ""))
+_inf = functools.partial(_logger.log, logging.INFO)
+_err = functools.partial(_logger.log, logging.ERROR)
+
+
+@dataclass
+class StoryboardTile:
+    start: float
+    end: float
+    src: str  # sprite path relative to the WebVTT
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+def get_tile_size(size: Size, video_width: int, video_height: int) -> Size:
+    """Resolve -1 dimensions, the WebVTT needs the actual tile size.
+
+    Dimensions are rounded to even numbers, as most encoders require.
+    """
+    width, height = size
+    if width < 0 and height < 0:
+        width, height = video_width, video_height
+    elif width < 0:
+        width = round(height * video_width / video_height / 2) * 2
+    elif height < 0:
+        height = round(width * video_height / video_width / 2) * 2
+    return Size(width, height)
+
+
+def iter_tiles(
+    duration: float,
+    interval: float,
+    tile_size: Size,
+    grid: Size,
+    sprites_dirname: str,
+) -> Iterator[StoryboardTile]:
+    per_sprite = grid.width * grid.height
+    for i in range(math.ceil(duration / interval)):
+        sprite, position = divmod(i, per_sprite)
+        row, column = divmod(position, grid.width)
+        yield StoryboardTile(
+            start=i * interval,
+            end=min((i + 1) * interval, duration),
+            src=f"{sprites_dirname}/{sprite + 1:04d}.jpeg",
+            x=column * tile_size.width,
+            y=row * tile_size.height,
+            width=tile_size.width,
+            height=tile_size.height,
+        )
+
+
+@dataclass
+class StoryboardConverter(AbstractConverter):
+    """Sprite sheets of frames at a fixed interval and their WebVTT.
+
+    The sprites (JPEG) are saved in the ``NAME.storyboard`` folder, each
+    with ``grid`` tiles, all of them created by a single ffmpeg run. The
+    ``NAME.storyboard.vtt`` maps each interval to its tile using media
+    fragments (``sprite.jpeg#xywh=X,Y,W,H``), to be used as seek bar previews.
+    """
+
+    ext = "storyboard.vtt"
+    logger = _inf
+
+    _: KW_ONLY
+    interval: float
+    size: Size
+    grid: Size
+    # JPEG sprites are already compressed, the WebVTT is small
+    precompress: Sequence[str] = field(default=(), init=False)
+
+    def __init__(
+        self,
+        input_filename: str,
+        force: bool,
+        interval: float,
+        size: Size,
+        grid: Size,
+    ) -> None:
+        self.interval = interval
+        self.size = size
+        self.grid = grid
+        super().__init__(get_media_filename(input_filename), force)
+
+    @classmethod
+    def create_sprites_dirname(cls, media_filename: str) -> str:
+        return replace_ext(media_filename, "storyboard")
+
+    def generate(self) -> None:
+        info = probe(self.input_filename)
+        if not info.has_video:
+            raise ValueError(f"no video stream: {self.input_filename}")
+        duration = info.duration
+        tile_size = get_tile_size(self.size, info.width, info.height)
+
+        sprites_dirname = self.create_sprites_dirname(self.input_filename)
+        self._prepare_directory(sprites_dirname)
+        self._generate_sprites(sprites_dirname, tile_size)
+
+        tiles = iter_tiles(
+            duration,
+            self.interval,
+            tile_size,
+            self.grid,
+            os.path.basename(sprites_dirname),
+        )
+        tmpl = get_template("write.storyboard.vtt.jinja2")
+        with open(self.filename, "w") as out:
+            for chunk in tmpl.generate(tiles=tiles):
+                out.write(chunk)
+
+    def _prepare_directory(self, dirname: str) -> None:
+        os.makedirs(dirname, exist_ok=True)
+        for entry in os.scandir(dirname):
+            if entry.name.endswith(".jpeg"):
+                os.unlink(entry.path)
+
+    def _generate_sprites(self, dirname: str, tile_size: Size) -> None:
+        pipeline = (
+            ffmpeg.input(self.input_filename)
+            .video.filter("fps", f"1/{self.interval}")
+            .filter("scale", *tile_size)
+            .filter("tile", str(self.grid))
+            .output(os.path.join(dirname, "%04d.jpeg"), **{"q:v": 5})
+            .overwrite_output()
+            .global_args("-v", "error")
+        )
+        try:
+            pipeline.run(capture_stdout=True, capture_stderr=True)
+        except ffmpeg.Error as e:
+            _err(
+                "Could not generate: "
+                + colored(dirname, "red")
+                + f" (from: {self.input_filename}): "
+                + colored(e.stderr.decode(), "red")
+            )
+            raise
@@ -3,12 +3,34 @@ from argparse import ArgumentParser
 from argparse import Namespace
 from argparse import RawTextHelpFormatter
 import textwrap
+from typing import Sequence
 
 from .. import log
 from ..types import Size
 from ..utils import check_file_exists
 from ..utils import parse_size
 
+# keep in sync with converter.IMAGE_MIME_TYPES, not imported to keep
+# the command line light
+VARIANT_FORMATS = ("avif", "webp")
+
+
+def parse_widths(s: str) -> Sequence[int]:
+    widths = [int(w) for w in s.split(",") if w.strip()]
+    for width in widths:
+        if width <= 0:
+            raise ValueError(f"invalid width: {width}")
+    return widths
+
+
+def parse_formats(s: str) -> Sequence[str]:
+    formats = [f.strip() for f in s.split(",") if f.strip()]
+    for fmt in formats:
+        if fmt not in VARIANT_FORMATS:
+            raise ValueError(f"unsupported format: {fmt}")
+    return formats
+
+
 description = """\
 Loads media files and generate an image thumbnail (JPEG).
 
@@ -24,6 +46,9 @@ def handle_command(args: Namespace) -> None:
         args.file,
         args.force,
         size=args.size,
+        fast_seek=args.fast_seek,
+        variant_widths=args.widths,
+        variant_formats=args.formats,
     )
 
 
@@ -45,6 +70,46 @@ def add_arguments(ap: ArgumentParser, add_files: bool = True) -> None:
         """
         ),
     )
+    ap.add_argument(
+        "--fast-seek",
+        type=int,
+        default=0,
+        metavar="CANDIDATES",
+        help=textwrap.dedent(
+            """\
+            Seek to CANDIDATES evenly spread positions and decode only their
+            keyframes, picking the sharpest and best exposed frame. This is
+            much faster than decoding and scaling from the start, specially
+            for long and high resolution media.
+
+            Default: %(default)s (disabled, decode from the start)
+        """
+        ),
+    )
+    ap.add_argument(
+        "--widths",
+        type=parse_widths,
+        default=[],
+        help=textwrap.dedent(
+            """\
+            Comma separated list of widths to save extra thumbnails for
+            responsive images (srcset), such as "160,320,640,1280". They
+            are created in the same decode, saved as "NAME.{WIDTH}w.jpeg".
+        """
+        ),
+    )
+    ap.add_argument(
+        "--formats",
+        type=parse_formats,
+        default=[],
+        help=textwrap.dedent(
+            """\
+            Comma separated list of extra formats (webp,avif) of the
+            width variants, saved as "NAME.{WIDTH}w.{FORMAT}". Note that
+            ffmpeg must be built with the matching encoder.
+        """
+        ),
+    )
     ap.add_argument(
         "-f",
         "--force",
@@ -1,18 +1,40 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
+from dataclasses import field
 from dataclasses import KW_ONLY
 import functools
 import logging
+import os
+import re
+from typing import Optional
+from typing import Sequence
 
 import ffmpeg
 from termcolor import colored
 
 from ..converter import AbstractConverter
 from ..jsonl.reader import Reader
+from ..probe import probe_or_none
 from ..types import Size
+from ..utils import needs_generate
+from ..utils import replace_ext
 
 _logger = logging.getLogger(__name__.replace(".converter", ""))
 _inf = functools.partial(_logger.log, logging.INFO)
 _err = functools.partial(_logger.log, logging.ERROR)
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+
+
+# format (extension) => MIME type, the order used in <picture> sources
+IMAGE_MIME_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+# tiny grayscale frames used to score the fast seek candidates
+SCORE_SIZE = Size(64, 36)
 
 
 def get_media_filename(f: str) -> str:
@@ -22,6 +44,98 @@ def get_media_filename(f: str) -> str:
     return f
 
 
+def get_candidate_positions(duration: float, count: int) -> list[float]:
+    """Evenly spread positions, avoiding the very beginning and end.
+
+    These are usually black or show titles/credits.
+    """
+    return [duration * (i + 1) / (count + 1) for i in range(count)]
+
+
+def score_gray_frame(pixels: bytes, width: int) -> float:
+    """Cheap quality score: sharpness weighted by exposure.
+
+    Sharpness is the mean absolute difference between neighbor pixels,
+    exposure penalizes frames that are too dark or too bright (fades).
+    """
+    if not pixels:
+        return 0.0
+    mean = sum(pixels) / len(pixels)
+    exposure = max(0.0, 1.0 - abs(mean - 128) / 112)
+    diffs = 0
+    for i in range(len(pixels) - width - 1):
+        p = pixels[i]
+        diffs += abs(p - pixels[i + 1]) + abs(p - pixels[i + width])
+    sharpness = diffs / (2 * len(pixels))
+    return sharpness * exposure
+
+
+def read_jpeg_size(filename: str) -> Optional[Size]:
+    """Read the dimensions from the JPEG frame header, without decoding."""
+    try:
+        with open(filename, "rb") as file:
+            if file.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = file.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code == 0x01 or 0xD0 <= code <= 0xD8:
+                    continue  # markers without payload
+                length_bytes = file.read(2)
+                length = int.from_bytes(length_bytes, "big")
+                if len(length_bytes) < 2 or length < 2:
+                    return None  # truncated, would seek back to the marker
+                # start of frame, except DHT, JPG and DAC that share the range
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    data = file.read(5)
+                    if len(data) < 5:
+                        return None
+                    height = int.from_bytes(data[1:3], "big")
+                    width = int.from_bytes(data[3:5], "big")
+                    return Size(width, height)
+                file.seek(length - 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def create_variant_name(filename: str, width: int, fmt: str) -> str:
+    return replace_ext(filename, f"{width}w.{fmt}")
+
+
+def find_variants(filename: str) -> dict[str, list[tuple[int, str]]]:
+    """Existing variants of the thumbnail, ``format => [(width, path)]``.
+
+    The widths are sorted in ascending order, as in ``srcset``.
+    """
+    dirname, basename = os.path.split(filename)
+    stem = os.path.splitext(basename)[0]
+    variant_re = re.compile(
+        re.escape(stem) + r"\.(\d+)w\.(" + "|".join(IMAGE_MIME_TYPES) + r")$"
+    )
+    variants: dict[str, list[tuple[int, str]]] = {}
+    try:
+        entries = list(os.scandir(dirname or "."))
+    except OSError:
+        return variants
+    for entry in entries:
+        m = variant_re.match(entry.name)
+        if m:
+            width, fmt = m.groups()
+            variants.setdefault(fmt, []).append((int(width), entry.path))
+    for items in variants.values():
+        items.sort()
+    return variants
+
+
+def _split(stream: ffmpeg.Stream, count: int) -> list[ffmpeg.Stream]:
+    if count == 1:
+        return [stream]
+    split = stream.filter_multi_output("split", count)
+    return [split[i] for i in range(count)]
+
+
 @dataclass
 class ThumbnailConverter(AbstractConverter):
     ext = "jpeg"
@@ -29,22 +143,83 @@ class ThumbnailConverter(AbstractConverter):
 
     _: KW_ONLY
     size: Size
+    fast_seek: int = 0
+    variant_widths: Sequence[int] = ()
+    variant_formats: Sequence[str] = ()
+    # JPEG is already compressed
+    precompress: Sequence[str] = field(default=(), init=False)
 
     def __init__(
         self,
         input_filename: str,
         force: bool,
         size: Size,
+        fast_seek: int = 0,
+        variant_widths: Sequence[int] = (),
+        variant_formats: Sequence[str] = (),
     ) -> None:
         self.size = size
+        self.fast_seek = fast_seek
+        self.variant_widths = variant_widths
+        self.variant_formats = variant_formats
         super().__init__(get_media_filename(input_filename), force)
 
+    def get_variants(self) -> list[tuple[Size, str]]:
+        """The extra outputs as ``(size, filename)``.
+
+        Each of ``variant_widths`` in JPEG and each of ``variant_formats``,
+        the height keeps the aspect ratio.
+        """
+        formats = dict.fromkeys(("jpeg", *self.variant_formats))
+        return [
+            (Size(width, -2), create_variant_name(self.filename, width, fmt))
+            for width in sorted(set(self.variant_widths))
+            for fmt in formats
+        ]
+
+    def _needs_generate(self) -> bool:
+        if super()._needs_generate():
+            return True
+        return any(
+            needs_generate(self.input_filename, filename)
+            for _, filename in self.get_variants()
+        )
+
     def generate(self) -> None:
+        variants = self.get_variants()
+        # the frame is selected once (at the largest size) and then split
+        # to be scaled to every output, all of them in a single decode
+        largest = self.size
+        if variants:
+            largest = Size(max(self.size.width, *self.variant_widths), -2)
+
+        position = self._find_fast_seek_position() if self.fast_seek > 0 else None
+        if position is None:
+            # decodes and scales all frames from the start, picking the most
+            # representative of every 60 frames
+            stream = ffmpeg.input(self.input_filename).filter("scale", *largest)
+            stream = stream.filter("thumbnail", 60)
+        else:
+            # only the chosen keyframe is decoded and scaled
+            stream = self._input_at(position)
+
+        by_size: dict[Size, list[str]] = {self.size: [self.filename]}
+        for size, filename in variants:
+            by_size.setdefault(size, []).append(filename)
+        # already at the output size if there is only the legacy output
+        needs_scale = position is not None or bool(variants)
+
+        output_streams = []
+        for sized, (size, filenames) in zip(
+            _split(stream, len(by_size)), by_size.items()
+        ):
+            if needs_scale:
+                sized = sized.filter("scale", *size)
+            for s, filename in zip(_split(sized, len(filenames)), filenames):
+                output_streams.append(s.output(filename, vframes=1))
+
         pipeline = (
-            ffmpeg.input(self.input_filename)
-            .filter("scale", *self.size)
-            .filter("thumbnail", 60)
-            .output(self.filename, vframes=1)
+            ffmpeg.merge_outputs(*output_streams)
             .overwrite_output()
             .global_args("-v", "error")
             .global_args("-pattern_type", "none")
@@ -59,3 +234,54 @@ class ThumbnailConverter(AbstractConverter):
                 + colored(e.stderr.decode(), "red")
             )
             raise
+
+    def _input_at(self, position: float) -> ffmpeg.Stream:
+        # seek on the input (before -i) and decode only keyframes, so the
+        # same position always yields the same frame
+        return ffmpeg.input(self.input_filename, ss=position, skip_frame="nokey").video
+
+    def _get_duration(self) -> Optional[float]:
+        info = probe_or_none(self.input_filename)
+        if info is None or not info.has_video:
+            return None
+        return info.duration
+
+    def _score_position(self, position: float) -> float:
+        width, height = SCORE_SIZE
+        pipeline = (
+            self._input_at(position)
+            .output(
+                "pipe:",
+                vframes=1,
+                format="rawvideo",
+                pix_fmt="gray",
+                s=str(SCORE_SIZE),
+            )
+            .global_args("-v", "error")
+        )
+        try:
+            pixels, _ = pipeline.run(capture_stdout=True, capture_stderr=True)
+        except ffmpeg.Error as e:
+            _dbg(f"Could not extract frame at {position:.3f}s: {e.stderr.decode()}")
+            return -1.0
+        if len(pixels) != width * height:
+            return -1.0  # no keyframe after this position
+        return score_gray_frame(pixels, width)
+
+    def _find_fast_seek_position(self) -> Optional[float]:
+        duration = self._get_duration()
+        if not duration:
+            return None
+
+        best_position = None
+        best_score = -1.0
+        for position in get_candidate_positions(duration, self.fast_seek):
+            score = self._score_position(position)
+            _dbg(f"Candidate {self.input_filename} at {position:.3f}s: {score:.2f}")
+            if score > best_score:
+                best_position = position
+                best_score = score
+
+        if best_position is None:
+            _dbg(f"No fast seek candidate for {self.input_filename}, decode from start")
+        return best_position
@@ -4,6 +4,7 @@ from argparse import Namespace
 from argparse import RawTextHelpFormatter
 import textwrap
 
+from .. import compress
 from .. import log
 from ..utils import check_file_exists
 
@@ -30,10 +31,17 @@ def handle_command(args: Namespace) -> None:
         args.merge_threshold,
         args.local,
         args.acceleration_device,
+        args.precompress,
+        args.vad_threshold,
+        args.vad_min_speech_duration,
+        args.vad_min_silence_duration,
+        args.vad_speech_pad,
+        args.min_speech,
+        args.word_timestamps,
     )
 
 
-def add_arguments(ap: ArgumentParser) -> None:
+def add_model_arguments(ap: ArgumentParser) -> None:
     ap.add_argument(
         "--acceleration-device",
         default="auto",
@@ -76,6 +84,108 @@ def add_arguments(ap: ArgumentParser) -> None:
         """
         ),
     )
+    add_vad_arguments(ap)
+
+
+def add_vad_arguments(ap: ArgumentParser) -> None:
+    ap.add_argument(
+        "--vad-threshold",
+        type=float,
+        default=0.5,
+        help=textwrap.dedent(
+            """\
+            Voice Activity Detection (VAD) finds the speech before the
+            transcription, only it is given to the model. Audio with
+            speech probability above this threshold is speech: lower it
+            to miss less speech on noisy media, raise it to transcribe
+            less noise (faster).
+
+            The speech regions are cached in the media directory
+            ('.pf-video-transcribe-speech.json'), so transcribing again
+            doesn't find them again unless the VAD options change.
+
+            Default: %(default)s
+        """
+        ),
+    )
+    ap.add_argument(
+        "--vad-min-speech-duration",
+        type=float,
+        default=0.25,
+        help=textwrap.dedent(
+            """\
+            Speech shorter than this, in seconds, is ignored.
+
+            Default: %(default)s second
+        """
+        ),
+    )
+    ap.add_argument(
+        "--vad-min-silence-duration",
+        type=float,
+        default=2.0,
+        help=textwrap.dedent(
+            """\
+            Silences shorter than this, in seconds, don't split the
+            speech regions.
+
+            Default: %(default)s seconds
+        """
+        ),
+    )
+    ap.add_argument(
+        "--vad-speech-pad",
+        type=float,
+        default=0.4,
+        help=textwrap.dedent(
+            """\
+            Seconds of audio kept before and after each speech region, so
+            the words at their edges are not cut.
+
+            Default: %(default)s second
+        """
+        ),
+    )
+    ap.add_argument(
+        "--min-speech",
+        type=float,
+        default=1.0,
+        help=textwrap.dedent(
+            """\
+            Media with less speech than this, in seconds, are written as
+            empty transcripts without running the model (which isn't
+            even loaded if no media has speech).
+
+            Default: %(default)s second
+        """
+        ),
+    )
+
+
+def add_word_timestamps_argument(ap: ArgumentParser) -> None:
+    ap.add_argument(
+        "--no-word-timestamps",
+        dest="word_timestamps",
+        default=True,
+        action="store_false",
+        help=textwrap.dedent(
+            """\
+            Transcribe the text of the segments only, faster. The timing
+            of the words is needed by the HTML to follow the video word
+            by word and to split long segments in subtitles; without it
+            the HTML follows the segments. It can be added later with
+            the 'align' command.
+
+            Segments are not merged (see '--merge-threshold') until
+            they are aligned.
+        """
+        ),
+    )
+
+
+def add_arguments(ap: ArgumentParser) -> None:
+    add_model_arguments(ap)
+    add_word_timestamps_argument(ap)
     ap.add_argument(
         "-f",
         "--force",
@@ -90,6 +200,7 @@ def add_arguments(ap: ArgumentParser) -> None:
         """
         ),
     )
+    compress.add_arguments(ap)
     ap.add_argument(
         "file",
         nargs="+",
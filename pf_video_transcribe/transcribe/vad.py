@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import functools
+import logging
+import os.path
+from typing import Any
+from typing import NamedTuple
+from typing import Optional
+
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import get_speech_timestamps
+from faster_whisper.vad import VadOptions
+import numpy as np
+from termcolor import colored
+
+from ..dircache import DirectoryCache
+from ..dircache import get_directory_cache
+from ..utils import format_timestamp
+
+_logger = logging.getLogger(__name__.replace(".vad", ""))
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_inf = functools.partial(_logger.log, logging.INFO)
+
+CACHE_NAME = "pf-video-transcribe-speech"
+CACHE_VERSION = 1
+
+SAMPLING_RATE = 16000  # of the audio given to the model and the VAD
+
+
+class SpeechMap(NamedTuple):
+    """Regions of a media with speech, in samples at ``SAMPLING_RATE``."""
+
+    duration: float  # seconds, of the whole media
+    chunks: list[dict[str, int]]  # "start" and "end", as faster_whisper
+
+    @property
+    def speech_duration(self) -> float:
+        samples = sum(chunk["end"] - chunk["start"] for chunk in self.chunks)
+        return samples / SAMPLING_RATE
+
+    def tojson(self, options: VadOptions) -> dict[str, Any]:
+        # flat list of start and end, as there may be thousands
+        return {
+            "options": list(options),
+            "duration": self.duration,
+            "chunks": [
+                x for chunk in self.chunks for x in (chunk["start"], chunk["end"])
+            ],
+        }
+
+    @classmethod
+    def fromjson(cls, data: dict[str, Any]) -> SpeechMap:
+        flat = data["chunks"]
+        return cls(
+            duration=data["duration"],
+            chunks=[{"start": s, "end": e} for s, e in zip(flat[::2], flat[1::2])],
+        )
+
+
+def create_vad_options(
+    threshold: float,
+    min_speech_duration: float,
+    min_silence_duration: float,
+    speech_pad: float,
+) -> VadOptions:
+    """VAD options from the command line, durations in seconds."""
+    return VadOptions(
+        threshold=threshold,
+        min_speech_duration_ms=int(min_speech_duration * 1000),
+        min_silence_duration_ms=int(min_silence_duration * 1000),
+        speech_pad_ms=int(speech_pad * 1000),
+    )
+
+
+def _get_cache(filename: str) -> DirectoryCache:
+    return get_directory_cache(
+        os.path.dirname(filename) or ".",
+        CACHE_NAME,
+        CACHE_VERSION,
+    )
+
+
+def load_speech_map(filename: str, options: VadOptions) -> Optional[SpeechMap]:
+    """The cached map, if the media and the options didn't change."""
+    data = _get_cache(filename).get(os.path.basename(filename))
+    if data is None or data.get("options") != list(options):
+        return None
+    try:
+        return SpeechMap.fromjson(data)
+    except (KeyError, TypeError) as e:
+        _dbg(f"Ignoring speech map of {filename}: {e}")
+        return None
+
+
+def get_speech_map(
+    filename: str,
+    options: VadOptions,
+) -> tuple[SpeechMap, Optional[np.ndarray]]:
+    """Speech regions of the media, cached per directory.
+
+    The cache is invalidated when the file size or mtime change, or the
+    options differ. Returns the decoded audio as well when it had to be
+    decoded to find the regions, so it's not decoded again.
+    """
+    speech_map = load_speech_map(filename, options)
+    if speech_map is not None:
+        _dbg("Speech map of " + colored(filename, "cyan") + " from cache")
+        return speech_map, None
+
+    _inf(colored("vad: ", "blue") + colored(filename, "cyan"))
+    st = os.stat(filename)
+    audio = decode_audio(filename, sampling_rate=SAMPLING_RATE)
+    speech_map = SpeechMap(
+        duration=audio.shape[0] / SAMPLING_RATE,
+        chunks=get_speech_timestamps(audio, options),
+    )
+    _dbg(
+        "Speech of "
+        + colored(filename, "cyan")
+        + ": "
+        + colored(format_timestamp(speech_map.speech_duration), "cyan")
+        + f" of {format_timestamp(speech_map.duration)}"
+        + f" in {len(speech_map.chunks)} regions"
+    )
+    cache = _get_cache(filename)
+    cache.set(os.path.basename(filename), speech_map.tojson(options), st)
+    cache.save()
+    return speech_map, audio
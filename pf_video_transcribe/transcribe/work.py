@@ -2,17 +2,30 @@ from __future__ import annotations
 
 import functools
 import logging
+import math
+import threading
+from typing import Callable
 from typing import Optional
 from typing import Sequence
 
 from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+from faster_whisper.transcribe import restore_speech_timestamps
 from faster_whisper.transcribe import Segment
 from faster_whisper.transcribe import TranscriptionInfo
 from faster_whisper.transcribe import Word
+from faster_whisper.vad import collect_chunks
+from faster_whisper.vad import VadOptions
 from termcolor import colored
 from tqdm import tqdm
 
+from .vad import create_vad_options
+from .vad import get_speech_map
+from .vad import SAMPLING_RATE
+from .vad import SpeechMap
+from ..compress import write_compressed
 from ..jsonl.writer import Writer
+from ..probe import probe_batch
 from ..types import HeaderInfoJson
 from ..types import SegmentPayloadJson
 from ..types import WordJson
@@ -23,6 +36,7 @@ from ..utils import needs_generate
 _logger = logging.getLogger(__name__.replace(".work", ""))
 _dbg = functools.partial(_logger.log, logging.DEBUG)
 _inf = functools.partial(_logger.log, logging.INFO)
+_wrn = functools.partial(_logger.log, logging.WARNING)
 
 
 def _word_tojson(word: Word) -> WordJson:
@@ -70,12 +84,22 @@ def _show_info(method: str, info: TranscriptionInfo, outfile: str) -> None:
 
 
 def transcribe(
-    model: WhisperModel,
+    get_model: Callable[[], WhisperModel],
     media_filename: str,
     force: bool,
     language: Optional[str],
     merge_threshold: float,
+    precompress: Sequence[str],
+    vad_options: VadOptions,
+    min_speech: float,
+    word_timestamps: bool = True,
 ) -> str:
+    """Transcribe the media to its ``.jsonl``, returns its name.
+
+    The model is only loaded (``get_model()``) if there is speech, see
+    :func:`get_speech_map`. Without ``word_timestamps``, segments are not
+    merged, so the ``align`` command can add their words later.
+    """
     jsonl_filename = Writer.create_output_name(media_filename)
     if not force and not needs_generate(media_filename, jsonl_filename):
         _inf(
@@ -83,8 +107,59 @@ def transcribe(
             + colored(jsonl_filename, "green")
             + f" (from: {media_filename})"
         )
-        return jsonl_filename
+    else:
+        _transcribe(
+            get_model,
+            media_filename,
+            language,
+            merge_threshold,
+            vad_options,
+            min_speech,
+            word_timestamps,
+        )
+
+    if precompress:
+        write_compressed(jsonl_filename, precompress)
+    return jsonl_filename
+
+
+def _write_empty(
+    media_filename: str,
+    language: Optional[str],
+    speech_map: SpeechMap,
+) -> None:
+    # without speech, the converters still have a (empty) transcript
+    info_json: HeaderInfoJson = {
+        "duration": speech_map.duration,
+        "language": language or "",
+        "language_probability": 0.0,
+        "all_language_probs": [],
+    }
+    with Writer(media_filename, info_json, 0.0) as writer:
+        _inf(
+            "No speech ("
+            + colored(format_timestamp(speech_map.speech_duration), "yellow")
+            + "), empty transcript: "
+            + colored(writer.filename, "cyan")
+            + f" (from: {media_filename})"
+        )
+
 
+def _transcribe(
+    get_model: Callable[[], WhisperModel],
+    media_filename: str,
+    language: Optional[str],
+    merge_threshold: float,
+    vad_options: VadOptions,
+    min_speech: float,
+    word_timestamps: bool,
+) -> None:
+    speech_map, audio = get_speech_map(media_filename, vad_options)
+    if not speech_map.chunks or speech_map.speech_duration < min_speech:
+        _write_empty(media_filename, language, speech_map)
+        return
+
+    model = get_model()
     _inf(
         colored("transcribe: ", "blue")
         + colored(media_filename, "cyan")
@@ -92,20 +167,33 @@ def transcribe(
         + colored(language or "auto", "cyan")
         + ", merge_threshold="
         + colored(str(merge_threshold), "cyan")
+        + ", word_timestamps="
+        + colored(str(word_timestamps), "cyan")
         + ": "
         + colored("preprocessing... it may take some time!", "yellow")
     )
 
+    if audio is None:
+        audio = decode_audio(media_filename, sampling_rate=SAMPLING_RATE)
+    # same as vad_filter=True, with the cached speech regions
     segments, info = model.transcribe(
-        media_filename,
+        collect_chunks(audio, speech_map.chunks),
         language=language,
         beam_size=5,
-        vad_filter=True,
-        word_timestamps=True,
+        vad_filter=False,
+        word_timestamps=word_timestamps,
         initial_prompt="Please, write with punctuation.",
     )
+    del audio
+    segments = restore_speech_timestamps(segments, speech_map.chunks, SAMPLING_RATE)
 
     info_json = _info_tojson(info)
+    info_json["duration"] = speech_map.duration  # not only the speech
+    info = info._replace(duration=speech_map.duration)
+    if not word_timestamps:
+        # segments fit the 30 seconds windows of the model, as required
+        # to align them, they are merged once aligned
+        merge_threshold = -math.inf
     with Writer(media_filename, info_json, merge_threshold) as writer:
         _show_info("forced" if language else "detected", info, writer.filename)
         with tqdm(segments, total=info.duration, unit="s") as pbar:
@@ -114,23 +202,43 @@ def transcribe(
                 _dbg(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
                 writer.add(_segment_tojson(segment))
 
-            jsonl_filename = writer.filename
             _inf(
                 "Saved: "
-                + colored(jsonl_filename, "cyan")
+                + colored(writer.filename, "cyan")
                 + f" (from: {media_filename})"
             )
-            return jsonl_filename
 
 
-def transcribe_batch(
-    files: Sequence[str],
-    force: bool,
-    language: str,
-    merge_threshold: float,
+def filter_transcribable(files: Sequence[str]) -> list[str]:
+    """Skip media without audio, before paying for the model.
+
+    Files that could not be probed are kept, the model will tell.
+    """
+    infos = probe_batch(files)
+    transcribable = []
+    duration = 0.0
+    for filename in files:
+        info = infos[filename]
+        if info is not None:
+            if not info.has_audio:
+                _wrn("Skipping (no audio): " + colored(filename, "yellow"))
+                continue
+            duration += info.duration
+        transcribable.append(filename)
+
+    if duration:
+        _inf(
+            f"{len(transcribable)} media files to process, total duration: "
+            + colored(format_timestamp(duration), "cyan")
+        )
+    return transcribable
+
+
+def load_model(
     local: bool,
     acceleration_device: str,
-) -> None:
+    num_workers: int = 1,
+) -> WhisperModel:
     model_size = "large-v2"
 
     download_text = "" if local else " and will download the models from the internet,"
@@ -142,11 +250,67 @@ def transcribe_batch(
         + colored(acceleration_device, "cyan")
         + colored(download_text + " it may take some time!", "yellow")
     )
-    model = WhisperModel(
+    return WhisperModel(
         model_size,
         device=acceleration_device,
         local_files_only=local,
+        num_workers=num_workers,  # threads using the model in parallel
     )
 
+
+def get_model_loader(
+    local: bool,
+    acceleration_device: str,
+    num_workers: int = 1,
+) -> Callable[[], WhisperModel]:
+    """Load the model on the first call, only if some media has speech.
+
+    The model is loaded once even if called by multiple threads at once.
+    """
+    lock = threading.Lock()
+    load = functools.cache(
+        functools.partial(load_model, local, acceleration_device, num_workers)
+    )
+
+    def get_model() -> WhisperModel:
+        with lock:
+            return load()
+
+    return get_model
+
+
+def transcribe_batch(
+    files: Sequence[str],
+    force: bool,
+    language: str,
+    merge_threshold: float,
+    local: bool,
+    acceleration_device: str,
+    precompress: Sequence[str],
+    vad_threshold: float,
+    vad_min_speech_duration: float,
+    vad_min_silence_duration: float,
+    vad_speech_pad: float,
+    min_speech: float,
+    word_timestamps: bool,
+) -> None:
+    files = filter_transcribable(files)
+    if not files:
+        return
+
+    vad_options = create_vad_options(
+        vad_threshold, vad_min_speech_duration, vad_min_silence_duration, vad_speech_pad
+    )
+    get_model = get_model_loader(local, acceleration_device)
     for filename in files:
-        transcribe(model, filename, force, language, merge_threshold)
+        transcribe(
+            get_model,
+            filename,
+            force,
+            language,
+            merge_threshold,
+            precompress,
+            vad_options,
+            min_speech,
+            word_timestamps,
+        )
@@ -4,6 +4,7 @@ import os.path
 from typing import Iterator
 from typing import Optional
 from typing import Sequence
+import uuid
 
 from termcolor import colored
 
@@ -118,9 +119,14 @@ def iter_split_segments(
 
     If segments are longer than ``duration_threshold``, then they will be
     split based on words to fit in that duration. No words will be split.
+    Segments without words (not aligned, see the 'align' command) are kept
+    as they are.
     """
     for segment in iterator:
-        if segment["end"] - segment["start"] < duration_threshold:
+        if (
+            segment["end"] - segment["start"] < duration_threshold
+            or not segment["words"]
+        ):
             yield segment
         else:
             for ms in merge_words(segment["words"], duration_threshold):
@@ -133,3 +139,22 @@ def parse_size(s: str) -> Size:
         return Size(int(width), int(height))
     except (IndexError, TypeError) as e:
         raise ValueError("invalid size") from e
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write to a temporary file in the same directory, then rename it.
+
+    Readers will either see the old or the new contents, never a partial file.
+    """
+    dirname, basename = os.path.split(path)
+    tmp_path = os.path.join(dirname, f".{basename}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "xb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from abc import ABC
+from abc import abstractmethod
+import ctypes
+import ctypes.util
+import errno
+import functools
+import logging
+import os
+import select
+import struct
+import time
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+
+from termcolor import colored
+
+_logger = logging.getLogger(__name__)
+_dbg = functools.partial(_logger.log, logging.DEBUG)
+_wrn = functools.partial(_logger.log, logging.WARNING)
+
+# see inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+)
+_event_header = struct.Struct("iIII")
+
+
+def _walk_dirs(directory: str) -> Iterator[str]:
+    for root, dirs, _ in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        yield root
+
+
+def _walk_files(directory: str) -> Iterator[str]:
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for fname in files:
+            if not fname.startswith("."):
+                yield os.path.join(root, fname)
+
+
+class Watcher(ABC):
+    """Report the paths of files changed (written, moved or removed).
+
+    Hidden files and directories are ignored. If changes may have been
+    lost (ie: event queue overflow), all files are reported.
+    """
+
+    directories: Sequence[str]
+
+    def __init__(self, directories: Sequence[str]) -> None:
+        self.directories = directories
+
+    @abstractmethod
+    def wait(self, timeout: Optional[float]) -> set[str]:
+        """Wait up to ``timeout`` seconds (forever if None) for changes."""
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+    def _all_files(self) -> set[str]:
+        return {path for d in self.directories for path in _walk_files(d)}
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify(7) using ctypes, idle costs nothing.
+
+    Note that changes done by other hosts on network file systems
+    (ie: NFS) are not reported, use :class:`PollingWatcher` instead.
+    """
+
+    _libc: ctypes.CDLL
+    _fd: int
+    _paths: dict[int, str]
+
+    def __init__(self, directories: Sequence[str]) -> None:
+        super().__init__(directories)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+        self._paths = {}
+        for directory in directories:
+            self._add_tree(directory)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_tree(self, directory: str) -> None:
+        for path in _walk_dirs(directory):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _IN_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached", path)
+                _dbg(f"Could not watch {path}: {os.strerror(err)}")
+                continue
+            self._paths[wd] = path
+
+    def wait(self, timeout: Optional[float]) -> set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed: set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                _wrn("Too many changes, some were lost. Checking all files")
+                return self._all_files()
+            if mask & _IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or not name or name.startswith("."):
+                continue
+
+            path = os.path.join(parent, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # files may be created before the directory is watched
+                    self._add_tree(path)
+                    changed.update(_walk_files(path))
+                continue
+            if mask & _IN_CREATE:
+                continue  # wait for the close after write
+            changed.add(path)
+        return changed
+
+
+class PollingWatcher(Watcher):
+    """Compare the size and mtime of all files every ``interval`` seconds."""
+
+    interval: float
+    _snapshot: dict[str, tuple[int, int]]
+
+    def __init__(self, directories: Sequence[str], interval: float) -> None:
+        super().__init__(directories)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in self._all_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> set[str]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        old = self._snapshot
+        self._snapshot = snapshot
+        changed = {p for p, key in snapshot.items() if old.get(p) != key}
+        changed.update(old.keys() - snapshot.keys())
+        return changed
+
+
+def create_watcher(
+    directories: Sequence[str],
+    poll_interval: float,
+    force_polling: bool = False,
+) -> Watcher:
+    if not force_polling:
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            # AttributeError: libc without inotify (not Linux)
+            _wrn(f"Could not use inotify ({e}), polling every {poll_interval}s")
+    return PollingWatcher(directories, poll_interval)
+
+
+def iter_changes(watcher: Watcher, debounce: float) -> Iterator[set[str]]:
+    """Forever yield the changed paths, coalescing bursts.
+
+    After a change, waits until there are no changes for ``debounce``
+    seconds (or up to 10 times that) to yield all of them at once.
+    """
+    while True:
+        changed = watcher.wait(None)
+        if not changed:
+            continue
+        deadline = time.monotonic() + debounce * 10
+        while True:
+            more = watcher.wait(min(debounce, max(0.0, deadline - time.monotonic())))
+            if not more:
+                break
+            changed.update(more)
+            if time.monotonic() >= deadline:
+                break
+        _dbg("Changed files: " + colored(str(len(changed)), "cyan"))
+        yield changed